@@ -7,6 +7,17 @@ let mainWindow = null
 let pythonProcess = null
 const pendingRequests = new Map()
 
+const DEFAULT_TIMEOUT_MS = 60000
+const CHANNEL_TIMEOUTS_MS = {
+  recomputeConnections: 30 * 60 * 1000,
+  settleLayout: 10 * 60 * 1000,
+  exportGalaxy: 10 * 60 * 1000,
+  importGalaxy: 10 * 60 * 1000,
+  setEmbeddingStorage: 10 * 60 * 1000,
+  benchmarkEmbeddingStorage: 10 * 60 * 1000,
+  processFile: 10 * 60 * 1000,
+}
+
 const isDev = process.env.NODE_ENV === 'development' || !app.isPackaged
 
 function getPythonPath() {
@@ -59,9 +70,17 @@ function startPythonBackend() {
       if (!trimmed) continue
       try {
         const message = JSON.parse(trimmed)
+        if (message.event) {
+          if (message.event === 'progress') {
+            extendTimeouts(message.data?.stage)
+          }
+          mainWindow?.webContents.send(`python:event:${message.event}`, message.data)
+          continue
+        }
         const { id, result, error } = message
         const pending = pendingRequests.get(id)
         if (pending) {
+          clearTimeout(pending.timer)
           pendingRequests.delete(id)
           if (error) {
             pending.reject(new Error(error))
@@ -82,6 +101,7 @@ function startPythonBackend() {
   pythonProcess.on('exit', (code) => {
     console.log(`Python process exited with code ${code}`)
     for (const [, pending] of pendingRequests) {
+      clearTimeout(pending.timer)
       pending.reject(new Error('Python process exited'))
     }
     pendingRequests.clear()
@@ -96,25 +116,39 @@ function invokePython(channel, data) {
     }
 
     const id = `${Date.now()}-${Math.random().toString(36).slice(2)}`
-    pendingRequests.set(id, { resolve, reject })
+    const pending = { resolve, reject, channel, timer: null }
+    pendingRequests.set(id, pending)
+    armTimeout(id, pending)
 
     const request = JSON.stringify({ id, channel, data }) + '\n'
     pythonProcess.stdin.write(request, (err) => {
       if (err) {
+        clearTimeout(pending.timer)
         pendingRequests.delete(id)
         reject(err)
       }
     })
-
-    setTimeout(() => {
-      if (pendingRequests.has(id)) {
-        pendingRequests.delete(id)
-        reject(new Error(`Python request timed out: ${channel}`))
-      }
-    }, 60000)
   })
 }
 
+function armTimeout(id, pending) {
+  clearTimeout(pending.timer)
+  pending.timer = setTimeout(() => {
+    if (pendingRequests.get(id) === pending) {
+      pendingRequests.delete(id)
+      pending.reject(new Error(`Python request timed out: ${pending.channel}`))
+    }
+  }, CHANNEL_TIMEOUTS_MS[pending.channel] || DEFAULT_TIMEOUT_MS)
+}
+
+function extendTimeouts(channel) {
+  for (const [id, pending] of pendingRequests) {
+    if (pending.channel === channel) {
+      armTimeout(id, pending)
+    }
+  }
+}
+
 function createWindow() {
   mainWindow = new BrowserWindow({
     width: 1400,
@@ -160,6 +194,14 @@ ipcMain.handle('dialog:selectFiles', async (_event, filters) => {
   return result.filePaths
 })
 
+ipcMain.handle('dialog:selectSaveFile', async (_event, defaultPath) => {
+  const result = await dialog.showSaveDialog(mainWindow, {
+    defaultPath,
+    filters: [{ name: 'Galaxy Archive', extensions: ['sgfx'] }],
+  })
+  return result.canceled ? null : result.filePath
+})
+
 ipcMain.handle('dialog:selectDirectory', async () => {
   const result = await dialog.showOpenDialog(mainWindow, {
     properties: ['openDirectory'],
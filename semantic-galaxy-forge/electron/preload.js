@@ -7,6 +7,9 @@ contextBridge.exposeInMainWorld('electronAPI', {
   selectFiles: (filters) =>
     ipcRenderer.invoke('dialog:selectFiles', filters),
 
+  selectSaveFile: (defaultPath) =>
+    ipcRenderer.invoke('dialog:selectSaveFile', defaultPath),
+
   selectDirectory: () =>
     ipcRenderer.invoke('dialog:selectDirectory'),
 
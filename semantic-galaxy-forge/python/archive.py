@@ -0,0 +1,142 @@
+import json
+import logging
+import struct
+import zlib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SGFX"
+VERSION = 1
+ALIGN = 8
+_PREAMBLE = struct.Struct("<4sHHI")
+
+STRING_COLUMNS = ("content_type", "content", "label", "metadata", "created_at")
+
+
+def write_archive(path: str, galaxy: dict, nodes: list, connections: list) -> int:
+    index = {n["id"]: i for i, n in enumerate(nodes)}
+    edges = [c for c in connections if c["source_id"] in index and c["target_id"] in index]
+
+    sections = {}
+    sections["positions"] = (np.array(
+        [[n["position_x"], n["position_y"], n["position_z"]] for n in nodes], dtype=np.float32
+    ).reshape(-1, 3).tobytes(), "float32", None)
+
+    blobs = [n.get("embedding") or b"" for n in nodes]
+    sections["embedding_dims"] = (
+        np.array([len(b) // 4 for b in blobs], dtype=np.int32).tobytes(), "int32", None
+    )
+    sections["embeddings"] = (b"".join(blobs), "float32", None)
+
+    for column in STRING_COLUMNS:
+        _put_bytes(sections, column, [(n.get(column) or "").encode("utf-8") for n in nodes], "zlib")
+    _put_bytes(sections, "thumbnail", [n.get("thumbnail") or b"" for n in nodes], None)
+
+    sections["edge_source"] = (
+        np.array([index[c["source_id"]] for c in edges], dtype=np.int64).tobytes(), "int64", None
+    )
+    sections["edge_target"] = (
+        np.array([index[c["target_id"]] for c in edges], dtype=np.int64).tobytes(), "int64", None
+    )
+    sections["edge_strength"] = (
+        np.array([c["strength"] for c in edges], dtype=np.float32).tobytes(), "float32", None
+    )
+    _put_bytes(sections, "edge_type", [(c.get("connection_type") or "semantic").encode("utf-8") for c in edges], "zlib")
+
+    table = {}
+    payload = []
+    offset = 0
+    for name, (data, dtype, codec) in sections.items():
+        if codec == "zlib":
+            data = zlib.compress(data, 1)
+        table[name] = {"offset": offset, "length": len(data), "dtype": dtype, "codec": codec}
+        payload.append(data)
+        pad = -len(data) % ALIGN
+        payload.append(b"\0" * pad)
+        offset += len(data) + pad
+
+    header = json.dumps({
+        "galaxy": {
+            "name": galaxy.get("name", ""),
+            "settings": galaxy.get("settings", "{}"),
+            "created_at": galaxy.get("created_at"),
+        },
+        "node_count": len(nodes),
+        "edge_count": len(edges),
+        "sections": table,
+    }).encode("utf-8")
+    header += b" " * (-(_PREAMBLE.size + len(header)) % ALIGN)
+
+    with open(path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, 0, len(header)))
+        f.write(header)
+        for chunk in payload:
+            f.write(chunk)
+    return _PREAMBLE.size + len(header) + offset
+
+
+def read_archive(path: str) -> dict:
+    with open(path, "rb") as f:
+        raw = f.read()
+    if len(raw) < _PREAMBLE.size:
+        raise ValueError("Not a galaxy archive")
+    magic, version, _reserved, header_len = _PREAMBLE.unpack_from(raw, 0)
+    if magic != MAGIC:
+        raise ValueError("Not a galaxy archive")
+    if version > VERSION:
+        raise ValueError(f"Unsupported galaxy archive version: {version}")
+
+    header = json.loads(raw[_PREAMBLE.size:_PREAMBLE.size + header_len].decode("utf-8"))
+    base = _PREAMBLE.size + header_len
+    view = memoryview(raw)
+
+    def section(name: str) -> bytes:
+        meta = header["sections"][name]
+        data = view[base + meta["offset"]:base + meta["offset"] + meta["length"]]
+        if meta["codec"] == "zlib":
+            return zlib.decompress(data)
+        return data
+
+    def array(name: str) -> np.ndarray:
+        return np.frombuffer(section(name), dtype=header["sections"][name]["dtype"])
+
+    n = header["node_count"]
+    dims = array("embedding_dims").astype(np.int64)
+    emb_offsets = np.concatenate([[0], np.cumsum(dims) * 4])
+    emb_blob = section("embeddings")
+
+    nodes = {
+        "positions": array("positions").reshape(n, 3),
+        "embeddings": [
+            bytes(emb_blob[emb_offsets[i]:emb_offsets[i + 1]]) if dims[i] else None for i in range(n)
+        ],
+        "thumbnail": [b if b else None for b in _get_bytes(section, "thumbnail", n)],
+    }
+    for column in STRING_COLUMNS:
+        nodes[column] = [b.decode("utf-8") for b in _get_bytes(section, column, n)]
+
+    e = header["edge_count"]
+    edges = {
+        "source": array("edge_source"),
+        "target": array("edge_target"),
+        "strength": array("edge_strength"),
+        "connection_type": [b.decode("utf-8") for b in _get_bytes(section, "edge_type", e)],
+    }
+    return {"galaxy": header["galaxy"], "node_count": n, "edge_count": e, "nodes": nodes, "edges": edges}
+
+
+def _put_bytes(sections: dict, name: str, values: list, codec) -> None:
+    lengths = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    sections[f"{name}_offsets"] = (offsets.tobytes(), "int64", None)
+    sections[name] = (b"".join(values), "uint8", codec)
+
+
+def _get_bytes(section, name: str, count: int) -> list:
+    offsets = np.frombuffer(section(f"{name}_offsets"), dtype=np.int64)
+    if offsets.size != count + 1:
+        raise ValueError(f"Corrupt galaxy archive section: {name}")
+    blob = bytes(section(name))
+    return [blob[offsets[i]:offsets[i + 1]] for i in range(count)]
@@ -0,0 +1,190 @@
+import logging
+import math
+import numpy as np
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BRANCHING = 8
+DEFAULT_TOP_LEVEL_SIZE = 12
+
+
+def build_hierarchy(
+    nodes: list,
+    embeddings: dict,
+    communities: List[List[int]],
+    connections: list,
+    branching: int = DEFAULT_BRANCHING,
+    top_level_size: int = DEFAULT_TOP_LEVEL_SIZE,
+) -> dict:
+    if not nodes:
+        return {"levels": [], "edges": [], "membership": {}}
+
+    node_map = {n["id"]: n for n in nodes}
+    degree = _weighted_degree(connections)
+
+    level_one = []
+    membership = {}
+    seen = set()
+    groups = [[nid for nid in group if nid in node_map] for group in communities]
+    groups = [g for g in groups if g]
+    grouped = {nid for g in groups for nid in g}
+    leftovers = [nid for nid in node_map if nid not in grouped]
+    if leftovers:
+        groups.append(leftovers)
+
+    for group in groups:
+        members = [nid for nid in group if nid not in seen]
+        if not members:
+            continue
+        seen.update(members)
+        idx = len(level_one)
+        for nid in members:
+            membership[nid] = idx
+        positions = np.array(
+            [[node_map[nid]["position_x"], node_map[nid]["position_y"], node_map[nid]["position_z"]] for nid in members],
+            dtype=np.float32,
+        )
+        rep_id = max(members, key=lambda nid: degree.get(nid, 0.0))
+        level_one.append({
+            "idx": idx,
+            "parent_idx": None,
+            "member_count": len(members),
+            "position": positions.mean(axis=0),
+            "centroid": _embedding_centroid([embeddings.get(nid) for nid in members]),
+            "representative_id": rep_id,
+            "label": _node_label(node_map[rep_id]),
+        })
+
+    levels = [level_one]
+    while len(levels[-1]) > top_level_size:
+        current = levels[-1]
+        k = max(1, math.ceil(len(current) / branching))
+        points = np.stack([c["position"] for c in current])
+        weights = np.array([c["member_count"] for c in current], dtype=np.float32)
+        assignment = kmeans(points, k, weights=weights)
+        parents = []
+        for parent_slot in sorted(set(assignment.tolist())):
+            children = [c for c, a in zip(current, assignment) if a == parent_slot]
+            idx = len(parents)
+            for child in children:
+                child["parent_idx"] = idx
+            counts = np.array([c["member_count"] for c in children], dtype=np.float32)
+            rep = max(children, key=lambda c: c["member_count"])
+            parents.append({
+                "idx": idx,
+                "parent_idx": None,
+                "member_count": int(counts.sum()),
+                "position": (np.stack([c["position"] for c in children]) * counts[:, None]).sum(axis=0) / counts.sum(),
+                "centroid": _embedding_centroid([c["centroid"] for c in children], counts),
+                "representative_id": rep["representative_id"],
+                "label": rep["label"],
+            })
+        if len(parents) >= len(current):
+            break
+        levels.append(parents)
+
+    edges = aggregate_edges(levels, membership, connections)
+    return {"levels": levels, "edges": edges, "membership": membership}
+
+
+def aggregate_edges(levels: list, membership: dict, connections: list) -> list:
+    edges = []
+    mapping = dict(membership)
+    for level_no, level in enumerate(levels, start=1):
+        if level_no > 1:
+            parent_of = {c["idx"]: c["parent_idx"] for c in levels[level_no - 2]}
+            mapping = {nid: parent_of[idx] for nid, idx in mapping.items()}
+        totals: dict = {}
+        for conn in connections:
+            a = mapping.get(conn["source_id"])
+            b = mapping.get(conn["target_id"])
+            if a is None or b is None or a == b:
+                continue
+            key = (min(a, b), max(a, b))
+            strength, count = totals.get(key, (0.0, 0))
+            totals[key] = (strength + float(conn["strength"]), count + 1)
+        for (a, b), (strength, count) in totals.items():
+            edges.append({
+                "level": level_no,
+                "source_idx": a,
+                "target_idx": b,
+                "strength": strength,
+                "edge_count": count,
+            })
+    return edges
+
+
+def nearest_cluster(clusters: list, embedding: Optional[np.ndarray], position: tuple) -> Optional[int]:
+    if not clusters:
+        return None
+    if embedding is not None:
+        candidates = [c for c in clusters if c["centroid"] is not None and c["centroid"].shape == embedding.shape]
+        if candidates:
+            centroids = np.stack([c["centroid"] for c in candidates])
+            norms = np.linalg.norm(centroids, axis=1) * (np.linalg.norm(embedding) or 1.0)
+            sims = centroids @ embedding / np.where(norms == 0, 1.0, norms)
+            return candidates[int(np.argmax(sims))]["idx"]
+    points = np.stack([c["position"] for c in clusters])
+    dists = np.linalg.norm(points - np.asarray(position, dtype=np.float32), axis=1)
+    return clusters[int(np.argmin(dists))]["idx"]
+
+
+def kmeans(points: np.ndarray, k: int, weights: Optional[np.ndarray] = None, iterations: int = 25) -> np.ndarray:
+    n = points.shape[0]
+    if k >= n:
+        return np.arange(n)
+    if weights is None:
+        weights = np.ones(n, dtype=np.float32)
+
+    centers = [points[int(np.argmax(weights))]]
+    dists = np.linalg.norm(points - centers[0], axis=1)
+    for _ in range(1, k):
+        nxt = int(np.argmax(dists * weights))
+        centers.append(points[nxt])
+        dists = np.minimum(dists, np.linalg.norm(points - points[nxt], axis=1))
+    centers = np.stack(centers)
+
+    assignment = np.zeros(n, dtype=np.int64)
+    for step in range(iterations):
+        d = np.linalg.norm(points[:, None, :] - centers[None, :, :], axis=2)
+        new_assignment = np.argmin(d, axis=1)
+        if step > 0 and np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        for j in range(k):
+            mask = assignment == j
+            if mask.any():
+                w = weights[mask]
+                centers[j] = (points[mask] * w[:, None]).sum(axis=0) / w.sum()
+    return assignment
+
+
+def _embedding_centroid(vectors: list, weights: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    items = [(v, 1.0 if weights is None else float(weights[i])) for i, v in enumerate(vectors) if v is not None]
+    if not items:
+        return None
+    dims: dict = {}
+    for v, w in items:
+        dims[v.shape[0]] = dims.get(v.shape[0], 0.0) + w
+    dim = max(dims, key=dims.get)
+    same = [(v, w) for v, w in items if v.shape[0] == dim]
+    stacked = np.stack([v for v, _ in same])
+    w = np.array([w for _, w in same], dtype=np.float32)
+    return ((stacked * w[:, None]).sum(axis=0) / w.sum()).astype(np.float32)
+
+
+def _weighted_degree(connections: list) -> dict:
+    degree: dict = {}
+    for conn in connections:
+        for key in ("source_id", "target_id"):
+            degree[conn[key]] = degree.get(conn[key], 0.0) + float(conn["strength"])
+    return degree
+
+
+def _node_label(node: dict) -> str:
+    label = node.get("label") or ""
+    if not label:
+        content = node.get("content") or ""
+        label = content[:40]
+    return label
@@ -1,17 +1,89 @@
 import sqlite3
 import json
 import os
+import re
+import logging
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
+SQL_VARIABLE_CHUNK = 900
+
+NODE_COLUMNS = (
+    "id", "galaxy_id", "content_type", "content", "label", "embedding",
+    "position_x", "position_y", "position_z", "thumbnail", "metadata", "created_at",
+    "embedding_model", "embedding_dim", "clip_embedding", "embedding_original",
+)
+NODE_PUBLIC_COLUMNS = tuple(
+    c for c in NODE_COLUMNS if c not in ("embedding", "clip_embedding", "embedding_original")
+)
+NODE_POSITION_COLUMNS = ("id", "position_x", "position_y", "position_z")
+
+GALAXIES_QUERY = "SELECT * FROM galaxies ORDER BY modified_at DESC"
+NODES_QUERY = "SELECT {columns} FROM nodes WHERE galaxy_id = ? ORDER BY created_at ASC, id ASC"
+CONNECTIONS_QUERY = "SELECT * FROM connections WHERE galaxy_id = ?"
+CONNECTION_IDS_QUERY = "SELECT id FROM connections WHERE galaxy_id = ?"
+EMBEDDINGS_QUERY = (
+    "SELECT id, embedding, embedding_model, clip_embedding FROM nodes WHERE galaxy_id = ? AND embedding IS NOT NULL"
+)
+EMBEDDING_MODEL_QUERY = "SELECT 1 FROM nodes WHERE galaxy_id = ? AND embedding_model = ? LIMIT 1"
+MISSING_CLIP_QUERY = """
+    SELECT id, content FROM nodes
+    WHERE galaxy_id = ? AND content_type = 'text' AND clip_embedding IS NULL AND embedding IS NOT NULL
+    LIMIT ?
+"""
+UNLABELLED_EMBEDDINGS_QUERY = """
+    SELECT id, content_type, embedding FROM nodes
+    WHERE embedding_model IS NULL AND embedding IS NOT NULL
+"""
+SIGNATURE_CANDIDATES_QUERY = " UNION ALL ".join(
+    f"SELECT node_id, signature FROM chunk_signatures WHERE galaxy_id = ? AND band{i} = ?"
+    for i in range(4)
+)
+UNSIGNED_TEXT_QUERY = """
+    SELECT n.id FROM nodes AS n
+    WHERE n.galaxy_id = ? AND n.content_type = 'text'
+      AND NOT EXISTS (SELECT 1 FROM chunk_signatures AS s WHERE s.node_id = n.id)
+"""
+FTS_WEIGHTS = "1.0, 2.0"
+_FTS_TOKEN = re.compile(r"\w+", re.UNICODE)
+TEXT_SEARCH_QUERY = """
+    SELECT n.id AS node_id, n.galaxy_id, f.rank AS bm25,
+           snippet(nodes_fts, 0, '[', ']', '...', 16) AS snippet
+    FROM nodes_fts AS f JOIN nodes AS n ON n.id = f.rowid
+    WHERE nodes_fts MATCH ?{galaxy_filter}
+    ORDER BY f.rank LIMIT ?
+"""
+LINK_SUGGESTIONS_QUERY = (
+    "SELECT * FROM link_suggestions WHERE source_galaxy_id = ? ORDER BY strength DESC LIMIT ?"
+)
+
+READ_QUERIES = {
+    "get_all_galaxies": (GALAXIES_QUERY, ()),
+    "get_nodes": (NODES_QUERY.format(columns="*"), (0,)),
+    "get_connections": (CONNECTIONS_QUERY, (0,)),
+    "get_connection_ids": (CONNECTION_IDS_QUERY, (0,)),
+    "get_embeddings": (EMBEDDINGS_QUERY, (0,)),
+    "has_embedding_model": (EMBEDDING_MODEL_QUERY, (0, "x")),
+    "get_missing_clip_embeddings": (MISSING_CLIP_QUERY, (0, 1)),
+    "get_unlabelled_embeddings": (UNLABELLED_EMBEDDINGS_QUERY, ()),
+    "find_signature_candidates": (SIGNATURE_CANDIDATES_QUERY, (0,) * 8),
+    "get_unsigned_text_node_ids": (UNSIGNED_TEXT_QUERY, (0,)),
+    "get_link_suggestions": (LINK_SUGGESTIONS_QUERY, (0, 1)),
+    "search_text": (TEXT_SEARCH_QUERY.format(galaxy_filter=" AND n.galaxy_id IN (?)"), ("x", 0, 1)),
+}
+
 
 class Database:
     def __init__(self, db_path: str):
         self.db_path = db_path
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self.conn = sqlite3.connect(db_path, check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
         self.conn.execute("PRAGMA journal_mode=WAL")
         self.conn.execute("PRAGMA foreign_keys=ON")
+        self.listeners = []
         self._migrate()
 
     def _migrate(self):
@@ -52,11 +124,175 @@ class Database:
                 UNIQUE(source_id, target_id)
             );
 
-            CREATE INDEX IF NOT EXISTS idx_nodes_galaxy ON nodes(galaxy_id);
-            CREATE INDEX IF NOT EXISTS idx_conn_source ON connections(source_id);
+            CREATE TABLE IF NOT EXISTS clusters (
+                galaxy_id INTEGER NOT NULL,
+                level INTEGER NOT NULL,
+                idx INTEGER NOT NULL,
+                parent_idx INTEGER,
+                member_count INTEGER NOT NULL DEFAULT 0,
+                label TEXT DEFAULT '',
+                representative_id INTEGER,
+                centroid BLOB,
+                position_x REAL DEFAULT 0,
+                position_y REAL DEFAULT 0,
+                position_z REAL DEFAULT 0,
+                PRIMARY KEY (galaxy_id, level, idx),
+                FOREIGN KEY (galaxy_id) REFERENCES galaxies(id) ON DELETE CASCADE
+            );
+
+            CREATE TABLE IF NOT EXISTS cluster_members (
+                node_id INTEGER PRIMARY KEY,
+                galaxy_id INTEGER NOT NULL,
+                cluster_idx INTEGER NOT NULL,
+                FOREIGN KEY (node_id) REFERENCES nodes(id) ON DELETE CASCADE,
+                FOREIGN KEY (galaxy_id) REFERENCES galaxies(id) ON DELETE CASCADE
+            );
+
+            CREATE TABLE IF NOT EXISTS cluster_edges (
+                galaxy_id INTEGER NOT NULL,
+                level INTEGER NOT NULL,
+                source_idx INTEGER NOT NULL,
+                target_idx INTEGER NOT NULL,
+                strength REAL NOT NULL DEFAULT 0,
+                edge_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (galaxy_id, level, source_idx, target_idx),
+                FOREIGN KEY (galaxy_id) REFERENCES galaxies(id) ON DELETE CASCADE
+            );
+
+            CREATE TABLE IF NOT EXISTS chunk_signatures (
+                node_id INTEGER PRIMARY KEY,
+                galaxy_id INTEGER NOT NULL,
+                signature INTEGER NOT NULL,
+                band0 INTEGER NOT NULL,
+                band1 INTEGER NOT NULL,
+                band2 INTEGER NOT NULL,
+                band3 INTEGER NOT NULL,
+                FOREIGN KEY (node_id) REFERENCES nodes(id) ON DELETE CASCADE,
+                FOREIGN KEY (galaxy_id) REFERENCES galaxies(id) ON DELETE CASCADE
+            );
+
+            CREATE TABLE IF NOT EXISTS link_suggestions (
+                source_id INTEGER NOT NULL,
+                target_id INTEGER NOT NULL,
+                source_galaxy_id INTEGER NOT NULL,
+                target_galaxy_id INTEGER NOT NULL,
+                strength REAL NOT NULL,
+                created_at TEXT DEFAULT (datetime('now')),
+                PRIMARY KEY (source_id, target_id),
+                FOREIGN KEY (source_id) REFERENCES nodes(id) ON DELETE CASCADE,
+                FOREIGN KEY (target_id) REFERENCES nodes(id) ON DELETE CASCADE
+            );
+
+            CREATE TABLE IF NOT EXISTS embedding_codebooks (
+                galaxy_id INTEGER NOT NULL,
+                dim INTEGER NOT NULL,
+                codebook BLOB NOT NULL,
+                PRIMARY KEY (galaxy_id, dim),
+                FOREIGN KEY (galaxy_id) REFERENCES galaxies(id) ON DELETE CASCADE
+            );
+
             CREATE INDEX IF NOT EXISTS idx_conn_target ON connections(target_id);
+            CREATE INDEX IF NOT EXISTS idx_link_suggestions_source ON link_suggestions(source_galaxy_id, strength);
+            CREATE INDEX IF NOT EXISTS idx_link_suggestions_target ON link_suggestions(target_id);
+            CREATE INDEX IF NOT EXISTS idx_sig_band0 ON chunk_signatures(galaxy_id, band0);
+            CREATE INDEX IF NOT EXISTS idx_sig_band1 ON chunk_signatures(galaxy_id, band1);
+            CREATE INDEX IF NOT EXISTS idx_sig_band2 ON chunk_signatures(galaxy_id, band2);
+            CREATE INDEX IF NOT EXISTS idx_sig_band3 ON chunk_signatures(galaxy_id, band3);
+        """)
+
+        added_node_count = self._ensure_column("galaxies", "node_count", "INTEGER NOT NULL DEFAULT 0")
+        added_conn_galaxy = self._ensure_column("connections", "galaxy_id", "INTEGER")
+        self._ensure_column("nodes", "embedding_model", "TEXT")
+        self._ensure_column("nodes", "embedding_dim", "INTEGER")
+        self._ensure_column("nodes", "clip_embedding", "BLOB")
+        self._ensure_column("nodes", "embedding_original", "BLOB")
+
+        self.conn.executescript("""
+            DROP INDEX IF EXISTS idx_nodes_galaxy;
+            DROP INDEX IF EXISTS idx_conn_source;
+
+            CREATE INDEX IF NOT EXISTS idx_galaxies_modified ON galaxies(modified_at);
+            CREATE INDEX IF NOT EXISTS idx_nodes_galaxy_created ON nodes(galaxy_id, created_at);
+            CREATE INDEX IF NOT EXISTS idx_conn_galaxy ON connections(galaxy_id);
+            CREATE INDEX IF NOT EXISTS idx_cluster_members_galaxy ON cluster_members(galaxy_id);
+            CREATE INDEX IF NOT EXISTS idx_nodes_galaxy_model ON nodes(galaxy_id, embedding_model);
+            CREATE INDEX IF NOT EXISTS idx_nodes_missing_clip ON nodes(galaxy_id)
+                WHERE content_type = 'text' AND clip_embedding IS NULL AND embedding IS NOT NULL;
+            CREATE INDEX IF NOT EXISTS idx_nodes_unlabelled ON nodes(id)
+                WHERE embedding_model IS NULL AND embedding IS NOT NULL;
+
+            CREATE TRIGGER IF NOT EXISTS trg_nodes_count_insert AFTER INSERT ON nodes BEGIN
+                UPDATE galaxies SET node_count = node_count + 1 WHERE id = NEW.galaxy_id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_nodes_count_delete AFTER DELETE ON nodes BEGIN
+                UPDATE galaxies SET node_count = node_count - 1 WHERE id = OLD.galaxy_id;
+            END;
         """)
+
+        if added_node_count:
+            self.conn.execute("""
+                UPDATE galaxies SET node_count =
+                    (SELECT COUNT(*) FROM nodes WHERE nodes.galaxy_id = galaxies.id)
+            """)
+        if added_conn_galaxy:
+            self.conn.execute("""
+                UPDATE connections SET galaxy_id =
+                    (SELECT galaxy_id FROM nodes WHERE nodes.id = connections.source_id)
+            """)
+        if self._ensure_fts():
+            self.conn.execute("INSERT INTO nodes_fts (nodes_fts) VALUES ('rebuild')")
         self.conn.commit()
+        self.conn.execute("PRAGMA optimize")
+
+    def _ensure_fts(self) -> bool:
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'nodes_fts'"
+        ).fetchone()
+        self.conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(
+                content, label,
+                content = 'nodes', content_rowid = 'id',
+                tokenize = "unicode61 remove_diacritics 2 tokenchars '_'"
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_nodes_fts_insert AFTER INSERT ON nodes BEGIN
+                INSERT INTO nodes_fts (rowid, content, label) VALUES (NEW.id, NEW.content, NEW.label);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_nodes_fts_delete AFTER DELETE ON nodes BEGIN
+                INSERT INTO nodes_fts (nodes_fts, rowid, content, label)
+                VALUES ('delete', OLD.id, OLD.content, OLD.label);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_nodes_fts_update AFTER UPDATE OF content, label ON nodes BEGIN
+                INSERT INTO nodes_fts (nodes_fts, rowid, content, label)
+                VALUES ('delete', OLD.id, OLD.content, OLD.label);
+                INSERT INTO nodes_fts (rowid, content, label) VALUES (NEW.id, NEW.content, NEW.label);
+            END;
+        """)
+        self.conn.execute(
+            "INSERT INTO nodes_fts (nodes_fts, rank) VALUES ('rank', ?)", (f"bm25({FTS_WEIGHTS})",)
+        )
+        return exists is None
+
+    def _ensure_column(self, table: str, column: str, decl: str) -> bool:
+        columns = {r["name"] for r in self.conn.execute(f"PRAGMA table_info({table})").fetchall()}
+        if column in columns:
+            return False
+        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        return True
+
+    def _notify(self, event: str, galaxy_ids=(), node_ids=(), connection_ids=(), payload=None):
+        for listener in self.listeners:
+            try:
+                listener(event, galaxy_ids, node_ids, connection_ids, payload)
+            except Exception as e:
+                logger.warning(f"Database listener failed on {event}: {e}")
+
+    def query_plan(self, sql: str, params: tuple = ()) -> list:
+        rows = self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [r["detail"] for r in rows]
 
     def create_galaxy(self, name: str) -> int:
         cur = self.conn.execute(
@@ -66,18 +302,49 @@ class Database:
         return cur.lastrowid
 
     def get_all_galaxies(self) -> list:
-        rows = self.conn.execute("""
-            SELECT g.*, COUNT(n.id) as node_count
-            FROM galaxies g
-            LEFT JOIN nodes n ON n.galaxy_id = g.id
-            GROUP BY g.id
-            ORDER BY g.modified_at DESC
-        """).fetchall()
+        rows = self.conn.execute(GALAXIES_QUERY).fetchall()
         return [dict(r) for r in rows]
 
+    def get_galaxy(self, galaxy_id: int) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT * FROM galaxies WHERE id = ?", (galaxy_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def import_galaxy(self, name: str, settings: str, node_rows: list, edge_rows: list) -> tuple:
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO galaxies (name, settings) VALUES (?, ?)", (name, settings)
+            )
+            galaxy_id = cur.lastrowid
+            self.conn.executemany(
+                """INSERT INTO nodes
+                   (galaxy_id, content_type, content, label, embedding,
+                    position_x, position_y, position_z, thumbnail, metadata, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, datetime('now')))""",
+                ((galaxy_id,) + tuple(row) for row in node_rows),
+            )
+            node_ids = [
+                r["id"] for r in self.conn.execute(
+                    "SELECT id FROM nodes WHERE galaxy_id = ? ORDER BY id", (galaxy_id,)
+                ).fetchall()
+            ]
+            self.conn.executemany(
+                """INSERT OR IGNORE INTO connections
+                   (source_id, target_id, strength, connection_type, galaxy_id)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (
+                    (node_ids[src], node_ids[tgt], strength, conn_type, galaxy_id)
+                    for src, tgt, strength, conn_type in edge_rows
+                ),
+            )
+        self._notify("galaxy", galaxy_ids=(galaxy_id,))
+        return galaxy_id, node_ids
+
     def delete_galaxy(self, galaxy_id: int):
         self.conn.execute("DELETE FROM galaxies WHERE id = ?", (galaxy_id,))
         self.conn.commit()
+        self._notify("galaxy", galaxy_ids=(galaxy_id,))
 
     def create_node(
         self,
@@ -91,18 +358,23 @@ class Database:
         position_z: float = 0,
         thumbnail: Optional[bytes] = None,
         metadata: dict = None,
+        embedding_model: Optional[str] = None,
+        embedding_dim: Optional[int] = None,
+        clip_embedding: Optional[bytes] = None,
+        embedding_original: Optional[bytes] = None,
     ) -> int:
         if metadata is None:
             metadata = {}
         cur = self.conn.execute(
             """INSERT INTO nodes
                (galaxy_id, content_type, content, label, embedding,
-                position_x, position_y, position_z, thumbnail, metadata)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                position_x, position_y, position_z, thumbnail, metadata,
+                embedding_model, embedding_dim, clip_embedding, embedding_original)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
             (
                 galaxy_id, content_type, content, label, embedding,
                 position_x, position_y, position_z, thumbnail,
-                json.dumps(metadata),
+                json.dumps(metadata), embedding_model, embedding_dim, clip_embedding, embedding_original,
             ),
         )
         self.conn.execute(
@@ -110,12 +382,21 @@ class Database:
             (galaxy_id,),
         )
         self.conn.commit()
+        self._notify("nodes", galaxy_ids=(galaxy_id,), node_ids=(cur.lastrowid,), payload="created")
+        if embedding is not None:
+            self._notify("embeddings", galaxy_ids=(galaxy_id,), node_ids=(cur.lastrowid,), payload="created")
         return cur.lastrowid
 
-    def get_nodes(self, galaxy_id: int) -> list:
+    def get_nodes(self, galaxy_id: int, columns: tuple = None) -> list:
+        if columns is None:
+            projection = "*"
+        else:
+            unknown = set(columns) - set(NODE_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown node columns: {sorted(unknown)}")
+            projection = ", ".join(columns)
         rows = self.conn.execute(
-            "SELECT * FROM nodes WHERE galaxy_id = ? ORDER BY created_at ASC",
-            (galaxy_id,),
+            NODES_QUERY.format(columns=projection), (galaxy_id,)
         ).fetchall()
         return [dict(r) for r in rows]
 
@@ -125,15 +406,50 @@ class Database:
         ).fetchone()
         return dict(row) if row else None
 
-    def delete_node(self, node_id: int):
-        row = self.conn.execute("SELECT galaxy_id FROM nodes WHERE id = ?", (node_id,)).fetchone()
-        self.conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
-        if row:
-            self.conn.execute(
-                "UPDATE galaxies SET modified_at = datetime('now') WHERE id = ?",
-                (row["galaxy_id"],),
-            )
-        self.conn.commit()
+    def get_nodes_by_ids(self, node_ids: list, columns: tuple = None) -> list:
+        if columns is None:
+            projection = "*"
+        else:
+            unknown = set(columns) - set(NODE_COLUMNS)
+            if unknown:
+                raise ValueError(f"Unknown node columns: {sorted(unknown)}")
+            projection = ", ".join(columns)
+        ids = list(dict.fromkeys(node_ids))
+        result = []
+        for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+            chunk = ids[i:i + SQL_VARIABLE_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT {projection} FROM nodes WHERE id IN ({placeholders})", chunk
+            ).fetchall()
+            result.extend(dict(r) for r in rows)
+        return result
+
+    def delete_node(self, node_id: int) -> bool:
+        return self.delete_nodes([node_id]) > 0
+
+    def delete_nodes(self, node_ids: list) -> int:
+        ids = list(dict.fromkeys(node_ids))
+        galaxy_ids = set()
+        deleted = 0
+        with self.conn:
+            for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+                chunk = ids[i:i + SQL_VARIABLE_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(
+                    f"SELECT DISTINCT galaxy_id FROM nodes WHERE id IN ({placeholders})", chunk
+                ).fetchall()
+                galaxy_ids.update(r["galaxy_id"] for r in rows)
+                deleted += self.conn.execute(f"DELETE FROM nodes WHERE id IN ({placeholders})", chunk).rowcount
+            for galaxy_id in galaxy_ids:
+                self.conn.execute(
+                    "UPDATE galaxies SET modified_at = datetime('now') WHERE id = ?", (galaxy_id,)
+                )
+                self._clear_clusters(galaxy_id)
+        self._notify("nodes", galaxy_ids=galaxy_ids, node_ids=ids, payload="deleted")
+        self._notify("embeddings", galaxy_ids=galaxy_ids)
+        self._notify("connections", galaxy_ids=galaxy_ids)
+        return deleted
 
     def update_node_label(self, node_id: int, label: str):
         self.conn.execute(
@@ -141,53 +457,460 @@ class Database:
         )
         self.conn.commit()
 
-    def update_node_position(self, node_id: int, x: float, y: float, z: float):
+    def update_node_labels(self, labels: list):
+        with self.conn:
+            self.conn.executemany("UPDATE nodes SET label = ? WHERE id = ?", labels)
+
+    def update_node_metadata(self, node_id: int, metadata: dict):
         self.conn.execute(
-            "UPDATE nodes SET position_x = ?, position_y = ?, position_z = ? WHERE id = ?",
-            (x, y, z, node_id),
+            "UPDATE nodes SET metadata = ? WHERE id = ?", (json.dumps(metadata), node_id)
         )
         self.conn.commit()
 
+    def update_node_position(self, node_id: int, x: float, y: float, z: float):
+        old = self.conn.execute(
+            "SELECT galaxy_id, position_x, position_y, position_z FROM nodes WHERE id = ?", (node_id,)
+        ).fetchone()
+        with self.conn:
+            self.conn.execute(
+                "UPDATE nodes SET position_x = ?, position_y = ?, position_z = ? WHERE id = ?",
+                (x, y, z, node_id),
+            )
+            if old:
+                delta = (x - old["position_x"], y - old["position_y"], z - old["position_z"])
+                self._shift_cluster_chain(old["galaxy_id"], node_id, delta)
+        self._notify("positions", node_ids=(node_id,), payload=[(x, y, z, node_id)])
+
     def update_node_positions_bulk(self, positions: list):
-        self.conn.executemany(
-            "UPDATE nodes SET position_x = ?, position_y = ?, position_z = ? WHERE id = ?",
-            positions,
-        )
-        self.conn.commit()
+        positions = list(positions)
+        galaxy_ids = self._galaxies_of("nodes", [p[3] for p in positions])
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE nodes SET position_x = ?, position_y = ?, position_z = ? WHERE id = ?",
+                positions,
+            )
+            for galaxy_id in galaxy_ids:
+                self._refresh_cluster_positions(galaxy_id)
+        self._notify("positions", node_ids=[p[3] for p in positions], payload=positions)
 
     def create_connection(
         self, source_id: int, target_id: int, strength: float, connection_type: str = "semantic"
     ) -> Optional[int]:
         try:
             cur = self.conn.execute(
-                """INSERT OR IGNORE INTO connections (source_id, target_id, strength, connection_type)
-                   VALUES (?, ?, ?, ?)""",
-                (source_id, target_id, strength, connection_type),
+                """INSERT OR IGNORE INTO connections (source_id, target_id, strength, connection_type, galaxy_id)
+                   SELECT ?, ?, ?, ?, galaxy_id FROM nodes WHERE id = ?""",
+                (source_id, target_id, strength, connection_type, source_id),
             )
             self.conn.commit()
-            return cur.lastrowid if cur.lastrowid else None
         except sqlite3.IntegrityError:
             return None
+        if not cur.rowcount:
+            return None
+        self._notify(
+            "connections", galaxy_ids=self._galaxies_of("nodes", [source_id]), node_ids=(source_id, target_id)
+        )
+        return cur.lastrowid
 
     def get_connections(self, galaxy_id: int) -> list:
+        rows = self.conn.execute(CONNECTIONS_QUERY, (galaxy_id,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_connection_ids(self, galaxy_id: int) -> list:
+        return [r["id"] for r in self.conn.execute(CONNECTION_IDS_QUERY, (galaxy_id,)).fetchall()]
+
+    def get_connections_by_ids(self, connection_ids: list) -> list:
+        ids = list(dict.fromkeys(connection_ids))
+        result = []
+        for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+            chunk = ids[i:i + SQL_VARIABLE_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT * FROM connections WHERE id IN ({placeholders})", chunk
+            ).fetchall()
+            result.extend(dict(r) for r in rows)
+        return result
+
+    def get_node_connections(self, node_id: int) -> list:
         rows = self.conn.execute(
-            """SELECT c.* FROM connections c
-               JOIN nodes n ON c.source_id = n.id
-               WHERE n.galaxy_id = ?""",
-            (galaxy_id,),
+            "SELECT * FROM connections WHERE source_id = ? OR target_id = ?",
+            (node_id, node_id),
         ).fetchall()
         return [dict(r) for r in rows]
 
-    def delete_connection(self, connection_id: int):
+    def get_semantic_edges(self, node_ids: list) -> list:
+        ids = list(dict.fromkeys(node_ids))
+        result = {}
+        for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+            chunk = ids[i:i + SQL_VARIABLE_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            for column in ("source_id", "target_id"):
+                rows = self.conn.execute(
+                    f"""SELECT * FROM connections
+                        WHERE connection_type = 'semantic' AND {column} IN ({placeholders})""",
+                    chunk,
+                ).fetchall()
+                result.update((r["id"], dict(r)) for r in rows)
+        return list(result.values())
+
+    def _galaxies_of(self, table: str, ids: list) -> set:
+        ids = list(dict.fromkeys(ids))
+        galaxy_ids = set()
+        for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+            chunk = ids[i:i + SQL_VARIABLE_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT DISTINCT galaxy_id FROM {table} WHERE id IN ({placeholders})", chunk
+            ).fetchall()
+            galaxy_ids.update(r["galaxy_id"] for r in rows)
+        return galaxy_ids
+
+    def apply_connection_diff(
+        self, created: list, deleted_ids: list, updated: list = None, connection_type: str = "semantic"
+    ):
+        changed = list(deleted_ids) + [cid for _strength, cid in (updated or [])]
+        galaxy_ids = self._galaxies_of("connections", changed)
+        galaxy_ids |= self._galaxies_of("nodes", [src for src, _tgt, _strength in created])
+        with self.conn:
+            if updated:
+                self.conn.executemany("UPDATE connections SET strength = ? WHERE id = ?", updated)
+            if deleted_ids:
+                self.conn.executemany(
+                    "DELETE FROM connections WHERE id = ?", [(cid,) for cid in deleted_ids]
+                )
+            if created:
+                self.conn.executemany(
+                    """INSERT OR IGNORE INTO connections (source_id, target_id, strength, connection_type, galaxy_id)
+                       SELECT ?, ?, ?, ?, galaxy_id FROM nodes WHERE id = ?""",
+                    [(src, tgt, strength, connection_type, src) for src, tgt, strength in created],
+                )
+        if created or deleted_ids or updated:
+            self._notify(
+                "connections",
+                galaxy_ids=galaxy_ids,
+                node_ids=[src for src, _tgt, _strength in created],
+                connection_ids=changed,
+            )
+
+    def delete_connection(self, connection_id: int) -> Optional[dict]:
+        row = self.conn.execute("SELECT * FROM connections WHERE id = ?", (connection_id,)).fetchone()
+        if row is None:
+            return None
         self.conn.execute("DELETE FROM connections WHERE id = ?", (connection_id,))
         self.conn.commit()
+        self._notify("connections", galaxy_ids=(row["galaxy_id"],), connection_ids=(connection_id,))
+        return dict(row)
 
     def get_embeddings(self, galaxy_id: int) -> list:
+        rows = self.conn.execute(EMBEDDINGS_QUERY, (galaxy_id,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def has_embedding_model(self, galaxy_id: int, model: str) -> bool:
+        return self.conn.execute(EMBEDDING_MODEL_QUERY, (galaxy_id, model)).fetchone() is not None
+
+    def get_missing_clip_embeddings(self, galaxy_id: int, limit: int) -> list:
+        rows = self.conn.execute(MISSING_CLIP_QUERY, (galaxy_id, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def set_clip_embeddings(self, galaxy_id: int, rows: list):
+        with self.conn:
+            self.conn.executemany("UPDATE nodes SET clip_embedding = ? WHERE id = ?", rows)
+        self._notify("cross_embeddings", galaxy_ids=(galaxy_id,), node_ids=[nid for _blob, nid in rows])
+
+    def get_unlabelled_embeddings(self) -> list:
+        rows = self.conn.execute(UNLABELLED_EMBEDDINGS_QUERY).fetchall()
+        return [dict(r) for r in rows]
+
+    def set_embedding_spaces(self, rows: list) -> set:
+        if not rows:
+            return set()
+        node_ids = [node_id for _model, _dim, node_id in rows]
+        with self.conn:
+            self.conn.executemany("UPDATE nodes SET embedding_model = ?, embedding_dim = ? WHERE id = ?", rows)
+            galaxy_ids = self._galaxies_of("nodes", node_ids)
+        self._notify("embeddings", galaxy_ids=galaxy_ids, node_ids=node_ids)
+        return galaxy_ids
+
+    def replace_link_suggestions(self, galaxy_id: int, rows: list):
+        with self.conn:
+            self.conn.execute("DELETE FROM link_suggestions WHERE source_galaxy_id = ?", (galaxy_id,))
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO link_suggestions
+                   (source_id, target_id, source_galaxy_id, target_galaxy_id, strength)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(src, tgt, galaxy_id, tgt_galaxy, strength) for src, tgt, tgt_galaxy, strength in rows],
+            )
+
+    def get_link_suggestions(self, galaxy_id: int, limit: int = 200) -> list:
+        rows = self.conn.execute(LINK_SUGGESTIONS_QUERY, (galaxy_id, limit)).fetchall()
+        return [dict(r) for r in rows]
+
+    def search_text(self, match: str, galaxy_ids: Optional[list] = None, limit: int = 100) -> list:
+        params = [match]
+        galaxy_filter = ""
+        if galaxy_ids is not None:
+            if not galaxy_ids:
+                return []
+            galaxy_filter = f" AND n.galaxy_id IN ({','.join('?' * len(galaxy_ids))})"
+            params.extend(galaxy_ids)
+        params.append(limit)
+        rows = self.conn.execute(TEXT_SEARCH_QUERY.format(galaxy_filter=galaxy_filter), params).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_codebooks(self, galaxy_id: int) -> dict:
         rows = self.conn.execute(
-            "SELECT id, embedding FROM nodes WHERE galaxy_id = ? AND embedding IS NOT NULL",
+            "SELECT dim, codebook FROM embedding_codebooks WHERE galaxy_id = ?", (galaxy_id,)
+        ).fetchall()
+        return {r["dim"]: r["codebook"] for r in rows}
+
+    def rewrite_embeddings(self, galaxy_id: int, rows: list, codebooks: dict, settings: str):
+        with self.conn:
+            self.conn.executemany("UPDATE nodes SET embedding = ?, embedding_original = ? WHERE id = ?", rows)
+            self.conn.execute("DELETE FROM embedding_codebooks WHERE galaxy_id = ?", (galaxy_id,))
+            self.conn.executemany(
+                "INSERT INTO embedding_codebooks (galaxy_id, dim, codebook) VALUES (?, ?, ?)",
+                [(galaxy_id, dim, blob) for dim, blob in codebooks.items()],
+            )
+            self.conn.execute(
+                "UPDATE galaxies SET settings = ?, modified_at = datetime('now') WHERE id = ?",
+                (settings, galaxy_id),
+            )
+        self._notify("embeddings", galaxy_ids=(galaxy_id,))
+
+    def get_embedding_storage(self, galaxy_id: int) -> dict:
+        row = self.conn.execute(
+            """SELECT COUNT(embedding) AS nodes, COALESCE(SUM(LENGTH(embedding)), 0) AS bytes,
+                      COUNT(embedding_original) AS originals,
+                      COALESCE(SUM(LENGTH(embedding_original)), 0) AS original_bytes
+               FROM nodes WHERE galaxy_id = ?""",
             (galaxy_id,),
+        ).fetchone()
+        return dict(row)
+
+    def get_embedding_originals(self, node_ids: list) -> dict:
+        ids = list(dict.fromkeys(node_ids))
+        result = {}
+        for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+            chunk = ids[i:i + SQL_VARIABLE_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"""SELECT id, embedding_original FROM nodes
+                    WHERE id IN ({placeholders}) AND embedding_original IS NOT NULL""",
+                chunk,
+            ).fetchall()
+            result.update((r["id"], r["embedding_original"]) for r in rows)
+        return result
+
+    def vacuum(self):
+        self.conn.execute("VACUUM")
+
+    def add_chunk_signatures(self, galaxy_id: int, rows: list):
+        with self.conn:
+            self.conn.executemany(
+                """INSERT OR REPLACE INTO chunk_signatures
+                   (node_id, galaxy_id, signature, band0, band1, band2, band3)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(node_id, galaxy_id, signature, *bands) for node_id, signature, bands in rows],
+            )
+
+    def find_signature_candidates(self, galaxy_id: int, bands: list) -> list:
+        rows = self.conn.execute(
+            SIGNATURE_CANDIDATES_QUERY,
+            [value for band in bands for value in (galaxy_id, band)],
+        ).fetchall()
+        return [(r["node_id"], r["signature"]) for r in rows]
+
+    def get_unsigned_text_node_ids(self, galaxy_id: int) -> list:
+        return [r["id"] for r in self.conn.execute(UNSIGNED_TEXT_QUERY, (galaxy_id,)).fetchall()]
+
+    def save_cluster_hierarchy(self, galaxy_id: int, levels: list, edges: list, membership: dict):
+        with self.conn:
+            self._clear_clusters(galaxy_id)
+            self.conn.executemany(
+                """INSERT INTO clusters
+                   (galaxy_id, level, idx, parent_idx, member_count, label, representative_id,
+                    centroid, position_x, position_y, position_z)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (
+                        galaxy_id, level_no, c["idx"], c["parent_idx"], c["member_count"], c["label"],
+                        c["representative_id"],
+                        c["centroid"].tobytes() if c["centroid"] is not None else None,
+                        float(c["position"][0]), float(c["position"][1]), float(c["position"][2]),
+                    )
+                    for level_no, level in enumerate(levels, start=1)
+                    for c in level
+                ],
+            )
+            self.conn.executemany(
+                "INSERT INTO cluster_members (node_id, galaxy_id, cluster_idx) VALUES (?, ?, ?)",
+                [(node_id, galaxy_id, idx) for node_id, idx in membership.items()],
+            )
+            self.conn.executemany(
+                """INSERT INTO cluster_edges
+                   (galaxy_id, level, source_idx, target_idx, strength, edge_count)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [
+                    (galaxy_id, e["level"], e["source_idx"], e["target_idx"], e["strength"], e["edge_count"])
+                    for e in edges
+                ],
+            )
+
+    def get_cluster_level_count(self, galaxy_id: int) -> int:
+        row = self.conn.execute(
+            "SELECT MAX(level) AS levels FROM clusters WHERE galaxy_id = ?", (galaxy_id,)
+        ).fetchone()
+        return row["levels"] or 0
+
+    def get_clusters(self, galaxy_id: int, level: int) -> list:
+        rows = self.conn.execute(
+            "SELECT * FROM clusters WHERE galaxy_id = ? AND level = ? ORDER BY idx",
+            (galaxy_id, level),
         ).fetchall()
         return [dict(r) for r in rows]
 
+    def get_cluster(self, galaxy_id: int, level: int, idx: int) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT * FROM clusters WHERE galaxy_id = ? AND level = ? AND idx = ?", (galaxy_id, level, idx)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_cluster_edges(self, galaxy_id: int, level: int) -> list:
+        rows = self.conn.execute(
+            "SELECT * FROM cluster_edges WHERE galaxy_id = ? AND level = ?",
+            (galaxy_id, level),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def get_node_clusters(self, node_ids: list) -> dict:
+        ids = list(dict.fromkeys(node_ids))
+        result = {}
+        for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+            chunk = ids[i:i + SQL_VARIABLE_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT node_id, cluster_idx FROM cluster_members WHERE node_id IN ({placeholders})", chunk
+            ).fetchall()
+            result.update((r["node_id"], r["cluster_idx"]) for r in rows)
+        return result
+
+    def add_node_to_cluster(
+        self, galaxy_id: int, node_id: int, chain: list, centroids: list, position: tuple
+    ):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cluster_members (node_id, galaxy_id, cluster_idx) VALUES (?, ?, ?)",
+                (node_id, galaxy_id, chain[0]),
+            )
+            for level_no, (idx, centroid) in enumerate(zip(chain, centroids), start=1):
+                self.conn.execute(
+                    """UPDATE clusters SET
+                         position_x = (position_x * member_count + ?) / (member_count + 1),
+                         position_y = (position_y * member_count + ?) / (member_count + 1),
+                         position_z = (position_z * member_count + ?) / (member_count + 1),
+                         member_count = member_count + 1,
+                         centroid = COALESCE(?, centroid)
+                       WHERE galaxy_id = ? AND level = ? AND idx = ?""",
+                    (position[0], position[1], position[2], centroid, galaxy_id, level_no, idx),
+                )
+
+    def add_cluster_edges(self, galaxy_id: int, edges: list):
+        with self.conn:
+            self.conn.executemany(
+                """INSERT INTO cluster_edges
+                   (galaxy_id, level, source_idx, target_idx, strength, edge_count)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (galaxy_id, level, source_idx, target_idx) DO UPDATE SET
+                     strength = strength + excluded.strength,
+                     edge_count = edge_count + excluded.edge_count""",
+                [
+                    (galaxy_id, e["level"], e["source_idx"], e["target_idx"], e["strength"], e["edge_count"])
+                    for e in edges
+                ],
+            )
+            self.conn.execute(
+                "DELETE FROM cluster_edges WHERE galaxy_id = ? AND edge_count <= 0", (galaxy_id,)
+            )
+
+    def _shift_cluster_chain(self, galaxy_id: int, node_id: int, delta: tuple):
+        row = self.conn.execute(
+            "SELECT cluster_idx FROM cluster_members WHERE node_id = ?", (node_id,)
+        ).fetchone()
+        idx = row["cluster_idx"] if row else None
+        level = 1
+        while idx is not None:
+            self.conn.execute(
+                """UPDATE clusters SET
+                     position_x = position_x + ? / member_count,
+                     position_y = position_y + ? / member_count,
+                     position_z = position_z + ? / member_count
+                   WHERE galaxy_id = ? AND level = ? AND idx = ? AND member_count > 0""",
+                (delta[0], delta[1], delta[2], galaxy_id, level, idx),
+            )
+            row = self.conn.execute(
+                "SELECT parent_idx FROM clusters WHERE galaxy_id = ? AND level = ? AND idx = ?",
+                (galaxy_id, level, idx),
+            ).fetchone()
+            idx = row["parent_idx"] if row else None
+            level += 1
+
+    def _refresh_cluster_positions(self, galaxy_id: int):
+        rows = self.conn.execute(
+            """SELECT m.cluster_idx AS idx, AVG(n.position_x) AS x, AVG(n.position_y) AS y, AVG(n.position_z) AS z
+               FROM cluster_members m JOIN nodes n ON n.id = m.node_id
+               WHERE m.galaxy_id = ? GROUP BY m.cluster_idx""",
+            (galaxy_id,),
+        ).fetchall()
+        level = 1
+        while rows:
+            self.conn.executemany(
+                """UPDATE clusters SET position_x = ?, position_y = ?, position_z = ?
+                   WHERE galaxy_id = ? AND level = ? AND idx = ?""",
+                [(r["x"], r["y"], r["z"], galaxy_id, level, r["idx"]) for r in rows],
+            )
+            rows = self.conn.execute(
+                """SELECT parent_idx AS idx,
+                          SUM(position_x * member_count) / SUM(member_count) AS x,
+                          SUM(position_y * member_count) / SUM(member_count) AS y,
+                          SUM(position_z * member_count) / SUM(member_count) AS z
+                   FROM clusters
+                   WHERE galaxy_id = ? AND level = ? AND parent_idx IS NOT NULL AND member_count > 0
+                   GROUP BY parent_idx""",
+                (galaxy_id, level),
+            ).fetchall()
+            level += 1
+
+    def clear_cluster_hierarchy(self, galaxy_id: int):
+        self._clear_clusters(galaxy_id)
+        self.conn.commit()
+
+    def _clear_clusters(self, galaxy_id: int):
+        self.conn.execute("DELETE FROM cluster_edges WHERE galaxy_id = ?", (galaxy_id,))
+        self.conn.execute("DELETE FROM cluster_members WHERE galaxy_id = ?", (galaxy_id,))
+        self.conn.execute("DELETE FROM clusters WHERE galaxy_id = ?", (galaxy_id,))
+
     def close(self):
         self.conn.close()
+
+
+def fts_match(text: str, require_all: bool = False) -> Optional[str]:
+    terms = [f'"{t}"' for t in _FTS_TOKEN.findall(text)]
+    if not terms:
+        return None
+    return (" AND " if require_all else " OR ").join(terms)
+
+
+def check_query_plans() -> list:
+    schema = Database(":memory:")
+    problems = []
+    try:
+        for name, (sql, params) in READ_QUERIES.items():
+            for detail in schema.query_plan(sql, params):
+                full_scan = (
+                    detail.startswith("SCAN ") and " USING " not in detail and " VIRTUAL TABLE " not in detail
+                )
+                if full_scan or "TEMP B-TREE" in detail:
+                    problems.append(f"{name}: {detail}")
+    finally:
+        schema.close()
+    return problems
@@ -0,0 +1,93 @@
+import hashlib
+import logging
+import re
+import numpy as np
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("skip", "merge", "keep")
+DEFAULT_POLICY = "keep"
+DEFAULT_MAX_DISTANCE = 3
+MIN_TOKENS = 5
+SHINGLE_SIZE = 3
+BANDS = 4
+BAND_BITS = 64 // BANDS
+MAX_SOURCES = 20
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+def simhash(text: str) -> Optional[int]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < MIN_TOKENS:
+        return None
+    shingles = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    bits = (hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    value = 0
+    for i in np.nonzero(votes > 0)[0]:
+        value |= 1 << int(i)
+    return value
+
+
+def bands(signature: int) -> list:
+    mask = (1 << BAND_BITS) - 1
+    return [(signature >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def to_signed(signature: int) -> int:
+    return signature - (1 << 64) if signature >= 1 << 63 else signature
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def make_max_distance(max_distance: Optional[int]) -> int:
+    max_distance = DEFAULT_MAX_DISTANCE if max_distance is None else int(max_distance)
+    if not 0 <= max_distance <= BANDS - 1:
+        raise ValueError(
+            f"dedup_max_distance must be between 0 and {BANDS - 1}: "
+            f"banding on {BANDS} bands only guarantees candidates up to that Hamming distance"
+        )
+    return max_distance
+
+
+def best_match(signature: int, candidates: list, max_distance: int = DEFAULT_MAX_DISTANCE) -> Optional[int]:
+    max_distance = make_max_distance(max_distance)
+    best = None
+    best_distance = max_distance + 1
+    for node_id, other in candidates:
+        distance = hamming(signature, to_unsigned(other))
+        if distance < best_distance:
+            best, best_distance = node_id, distance
+    return best
+
+
+def make_policy(policy: Optional[str]) -> str:
+    policy = policy or DEFAULT_POLICY
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown dedup policy: {policy}")
+    return policy
+
+
+def merge_metadata(metadata: dict, source: Optional[str]) -> dict:
+    merged = dict(metadata)
+    merged["duplicate_count"] = int(merged.get("duplicate_count", 0)) + 1
+    if source:
+        sources = list(merged.get("duplicate_sources", []))
+        if source not in sources and len(sources) < MAX_SOURCES:
+            sources.append(source)
+        merged["duplicate_sources"] = sources
+    return merged
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import queue
+import logging
+import argparse
+import itertools
+import subprocess
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+TEXT = "text"
+IMAGE = "image"
+CLIP_TEXT = "clip_text"
+BATCH_SIZES = {TEXT: 64, IMAGE: 16, CLIP_TEXT: 64}
+BATCH_COSTS = {TEXT: 1.0, IMAGE: 4.0, CLIP_TEXT: 1.5}
+BATCH_MODELS = {TEXT: "text", IMAGE: "clip", CLIP_TEXT: "clip"}
+MAX_DIM = 1024
+RESULT_TIMEOUT = 600
+
+
+class EmbeddingPool:
+    def __init__(self, workers: int, threads_per_worker: int = 1):
+        self.workers = max(1, int(workers))
+        self.threads_per_worker = max(1, int(threads_per_worker))
+        self.capacity = max(BATCH_SIZES.values()) * MAX_DIM
+        self._lock = threading.Lock()
+        self._results: queue.Queue = queue.Queue()
+        self._job_ids = itertools.count()
+        self.broken = False
+        self._slots = [self._start_worker(i) for i in range(self.workers)]
+        logger.info(f"Embedding pool started: {self.workers} workers x {self.threads_per_worker} threads")
+
+    def _start_worker(self, worker_id: int) -> dict:
+        shm = shared_memory.SharedMemory(create=True, size=self.capacity * 4)
+        env = dict(os.environ)
+        env["OMP_NUM_THREADS"] = str(self.threads_per_worker)
+        env["MKL_NUM_THREADS"] = str(self.threads_per_worker)
+        env["TOKENIZERS_PARALLELISM"] = "false"
+        proc = subprocess.Popen(
+            [
+                sys.executable, os.path.abspath(__file__),
+                "--shm", shm.name,
+                "--capacity", str(self.capacity),
+                "--threads", str(self.threads_per_worker),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            text=True,
+            bufsize=1,
+        )
+        reader = threading.Thread(target=self._read_results, args=(worker_id, proc), daemon=True)
+        reader.start()
+        return {
+            "id": worker_id,
+            "proc": proc,
+            "shm": shm,
+            "buffer": np.ndarray((self.capacity,), dtype=np.float32, buffer=shm.buf),
+            "busy": False,
+            "loaded": set(),
+            "cost": 0.0,
+        }
+
+    def _read_results(self, worker_id: int, proc: subprocess.Popen):
+        for line in proc.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict) or "job" not in message:
+                logger.warning(f"Embedding worker {worker_id} wrote unexpected output: {line[:200]}")
+                continue
+            self._results.put((worker_id, message))
+        self._results.put((worker_id, {"exited": True}))
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "alive": sum(1 for s in self._slots if s["proc"].poll() is None),
+            "broken": self.broken,
+            "assigned_cost": [s["cost"] for s in self._slots],
+        }
+
+    def encode(self, texts: list = None, images: list = None, clip_texts: list = None) -> dict:
+        texts = texts or []
+        images = images or []
+        clip_texts = clip_texts or []
+        outputs = {TEXT: [None] * len(texts), IMAGE: [None] * len(images), CLIP_TEXT: [None] * len(clip_texts)}
+        batches = _interleave(
+            _make_batches(TEXT, texts),
+            _make_batches(IMAGE, images),
+            _make_batches(CLIP_TEXT, clip_texts),
+        )
+        with self._lock:
+            self._run(batches, outputs)
+        return {
+            kind: np.stack(rows) if rows else np.empty((0, 0), dtype=np.float32)
+            for kind, rows in outputs.items()
+        }
+
+    def encode_texts(self, texts: list) -> np.ndarray:
+        return self.encode(texts=texts)[TEXT]
+
+    def encode_images(self, images: list) -> np.ndarray:
+        return self.encode(images=images)[IMAGE]
+
+    def encode_clip_texts(self, texts: list) -> np.ndarray:
+        return self.encode(clip_texts=texts)[CLIP_TEXT]
+
+    def _run(self, batches: list, outputs: dict):
+        pending = list(batches)
+        in_flight = {}
+        error = None
+        while (pending and error is None) or in_flight:
+            while pending and error is None:
+                slot = self._pick_worker(pending[0][0])
+                if slot is None:
+                    break
+                kind, start, items = pending.pop(0)
+                job_id = next(self._job_ids)
+                slot["busy"] = True
+                slot["loaded"].add(BATCH_MODELS[kind])
+                slot["cost"] += BATCH_COSTS[kind] * len(items)
+                in_flight[job_id] = (slot, kind, start)
+                slot["proc"].stdin.write(json.dumps({"job": job_id, "kind": kind, "items": items}) + "\n")
+                slot["proc"].stdin.flush()
+
+            try:
+                worker_id, message = self._results.get(timeout=RESULT_TIMEOUT)
+            except queue.Empty:
+                self.broken = True
+                raise RuntimeError("Embedding pool timed out waiting for workers")
+            if message.get("exited"):
+                self.broken = True
+                raise RuntimeError(f"Embedding worker {worker_id} exited unexpectedly")
+
+            slot, kind, start = in_flight.pop(message["job"])
+            slot["busy"] = False
+            if message.get("error"):
+                error = error or f"Embedding worker {worker_id} failed: {message['error']}"
+                continue
+            rows, dim = message["shape"]
+            block = slot["buffer"][:rows * dim].reshape(rows, dim)
+            for i in range(rows):
+                outputs[kind][start + i] = block[i].copy()
+
+        if error:
+            raise RuntimeError(error)
+
+    def _pick_worker(self, kind: str):
+        idle = [s for s in self._slots if not s["busy"]]
+        if not idle:
+            return None
+        warm = [s for s in idle if BATCH_MODELS[kind] in s["loaded"]]
+        cold = [s for s in idle if not s["loaded"]]
+        candidates = warm or cold or idle
+        return min(candidates, key=lambda s: s["cost"])
+
+    def close(self):
+        for slot in self._slots:
+            try:
+                slot["proc"].stdin.close()
+                slot["proc"].wait(timeout=10)
+            except Exception:
+                slot["proc"].kill()
+            slot["shm"].close()
+            slot["shm"].unlink()
+        self._slots = []
+
+
+def _make_batches(kind: str, items: list) -> list:
+    size = BATCH_SIZES[kind]
+    return [(kind, i, items[i:i + size]) for i in range(0, len(items), size)]
+
+
+def _interleave(*queues: list) -> list:
+    result = []
+    for group in itertools.zip_longest(*queues):
+        result.extend(b for b in group if b is not None)
+    return result
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _worker_main(shm_name: str, capacity: int, threads: int):
+    replies = os.fdopen(os.dup(sys.stdout.fileno()), "w", buffering=1)
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from embeddings import EmbeddingGenerator
+
+    generator = EmbeddingGenerator()
+    shm = _attach_shared_memory(shm_name)
+    buffer = np.ndarray((capacity,), dtype=np.float32, buffer=shm.buf)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        task = json.loads(line)
+        try:
+            if task["kind"] == TEXT:
+                out = generator.generate_text_embeddings(task["items"])
+            elif task["kind"] == CLIP_TEXT:
+                out = generator.generate_clip_text_embeddings(task["items"])
+            else:
+                out = generator.generate_image_embeddings(task["items"])
+            out = np.ascontiguousarray(out, dtype=np.float32).reshape(len(task["items"]), -1)
+            if out.size > capacity:
+                raise ValueError(f"Batch of {out.shape} exceeds shared buffer")
+            buffer[:out.size] = out.ravel()
+            reply = {"job": task["job"], "shape": list(out.shape)}
+        except Exception as e:
+            reply = {"job": task["job"], "error": str(e)}
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+    del buffer
+    shm.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shm", required=True)
+    parser.add_argument("--capacity", type=int, required=True)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    _worker_main(args.shm, args.capacity, args.threads)
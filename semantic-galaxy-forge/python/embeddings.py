@@ -9,6 +9,17 @@ logger = logging.getLogger(__name__)
 
 MODELS_DIR = os.environ.get("MODELS_DIR", os.path.join(os.path.dirname(__file__), "../models"))
 
+TEXT_MODEL = "all-MiniLM-L6-v2"
+CLIP_MODEL = "ViT-B/32"
+CLIP_TEXT_SPACE = f"{CLIP_MODEL}:text"
+CLIP_DIM = 512
+
+
+def infer_model(content_type: str, dim: int) -> str:
+    if content_type == "image" or dim == CLIP_DIM:
+        return CLIP_MODEL
+    return TEXT_MODEL
+
 
 class EmbeddingGenerator:
     def __init__(self):
@@ -22,7 +33,7 @@ class EmbeddingGenerator:
             return
         try:
             from sentence_transformers import SentenceTransformer
-            self._text_model = SentenceTransformer("all-MiniLM-L6-v2", cache_folder=MODELS_DIR)
+            self._text_model = SentenceTransformer(TEXT_MODEL, cache_folder=MODELS_DIR)
             self._models_loaded["text"] = True
             logger.info("Text model loaded")
         except Exception as e:
@@ -34,7 +45,7 @@ class EmbeddingGenerator:
             return
         try:
             import clip
-            self._clip_model, self._clip_processor = clip.load("ViT-B/32", download_root=MODELS_DIR)
+            self._clip_model, self._clip_processor = clip.load(CLIP_MODEL, download_root=MODELS_DIR)
             self._clip_model.eval()
             self._models_loaded["clip"] = True
             logger.info("CLIP model loaded")
@@ -71,6 +82,28 @@ class EmbeddingGenerator:
         )
         return embedding.astype(np.float32)
 
+    def generate_text_embeddings(self, texts: list, batch_size: int = 32) -> np.ndarray:
+        self._load_text_model()
+        embeddings = self._text_model.encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return embeddings.astype(np.float32)
+
+    def text_token_budget(self) -> Optional[int]:
+        self._load_text_model()
+        max_len = getattr(self._text_model, "max_seq_length", None)
+        if not max_len:
+            return None
+        return max_len - 2
+
+    def count_text_tokens(self, text: str) -> int:
+        self._load_text_model()
+        return len(self._text_model.tokenizer(text, add_special_tokens=False)["input_ids"])
+
     def generate_image_embedding(self, image_source: str) -> np.ndarray:
         self._load_clip_model()
         import torch
@@ -90,6 +123,35 @@ class EmbeddingGenerator:
             features = features / features.norm(dim=-1, keepdim=True)
         return features.squeeze().cpu().numpy().astype(np.float32)
 
+    def generate_image_embeddings(self, image_sources: list) -> np.ndarray:
+        self._load_clip_model()
+        import torch
+        from PIL import Image as PILImage
+
+        inputs = []
+        for source in image_sources:
+            if source.startswith("data:"):
+                header, data = source.split(",", 1)
+                image = PILImage.open(io.BytesIO(base64.b64decode(data))).convert("RGB")
+            else:
+                image = PILImage.open(source).convert("RGB")
+            inputs.append(self._clip_processor(image))
+        with torch.no_grad():
+            features = self._clip_model.encode_image(torch.stack(inputs))
+            features = features / features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy().astype(np.float32)
+
+    def generate_clip_text_embeddings(self, texts: list) -> np.ndarray:
+        self._load_clip_model()
+        import torch
+        import clip
+
+        tokens = clip.tokenize(texts, truncate=True)
+        with torch.no_grad():
+            features = self._clip_model.encode_text(tokens)
+            features = features / features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy().astype(np.float32)
+
     def generate_thumbnail(self, image_source: str, size: tuple = (128, 128)) -> Optional[bytes]:
         try:
             from PIL import Image as PILImage
@@ -1,10 +1,20 @@
 import os
+import re
 import logging
 import tempfile
-from typing import List, Tuple, Optional
+from collections import deque
+from typing import Callable, Iterable, Iterator, List, Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
+READ_BLOCK_SIZE = 1 << 16
+LONG_SENTENCE_LENGTH = 800
+LONG_SENTENCE_PIECE = 600
+LONG_SENTENCE_STEP = 550
+LONG_RUN_LIMIT = 4 * LONG_SENTENCE_LENGTH
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
 
 def extract_text_from_pdf(pdf_path: str) -> str:
     try:
@@ -90,51 +100,142 @@ def transcribe_audio(audio_path: str) -> Tuple[str, float]:
 def split_text(text: str, max_length: int = 600, overlap: int = 50) -> List[str]:
     if len(text) <= max_length:
         return [text] if text.strip() else []
+    return list(iter_text_chunks([text], max_length, overlap))
+
+
+def iter_file_chunks(
+    file_path: str,
+    max_length: int = 600,
+    overlap: int = 50,
+    token_budget: Optional[int] = None,
+    count_tokens: Optional[Callable[[str], int]] = None,
+    block_size: int = READ_BLOCK_SIZE,
+) -> Iterator[str]:
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        blocks = iter(lambda: f.read(block_size), "")
+        yield from iter_text_chunks(blocks, max_length, overlap, token_budget, count_tokens)
+
 
-    chunks = []
-    sentences = _split_sentences(text)
-    current_chunk = []
+def iter_text_chunks(
+    blocks: Iterable[str],
+    max_length: int = 600,
+    overlap: int = 50,
+    token_budget: Optional[int] = None,
+    count_tokens: Optional[Callable[[str], int]] = None,
+) -> Iterator[str]:
+    use_tokens = token_budget is not None and count_tokens is not None
+    current: deque = deque()
     current_len = 0
+    current_tokens = 0
 
-    for sentence in sentences:
-        sentence_len = len(sentence)
-        if current_len + sentence_len > max_length and current_chunk:
-            chunk_text = " ".join(current_chunk).strip()
-            if chunk_text:
-                chunks.append(chunk_text)
-            overlap_tokens = []
-            overlap_len = 0
-            for s in reversed(current_chunk):
-                if overlap_len + len(s) > overlap:
-                    break
-                overlap_tokens.insert(0, s)
-                overlap_len += len(s)
-            current_chunk = overlap_tokens
-            current_len = overlap_len
-
-        current_chunk.append(sentence)
-        current_len += sentence_len
-
-    if current_chunk:
-        chunk_text = " ".join(current_chunk).strip()
+    for sentence in _iter_sentences(blocks):
+        for piece, tokens in _fit_pieces(sentence, max_length, overlap, token_budget, count_tokens):
+            too_long = current_len + len(current) + len(piece) > max_length
+            too_many = use_tokens and current_tokens + tokens > token_budget
+            if (too_long or too_many) and current:
+                chunk_text = " ".join(s for s, _ in current).strip()
+                if chunk_text:
+                    yield chunk_text
+                kept: deque = deque()
+                kept_len = 0
+                kept_tokens = 0
+                for s, t in reversed(current):
+                    if kept_len + len(s) > overlap:
+                        break
+                    kept.appendleft((s, t))
+                    kept_len += len(s)
+                    kept_tokens += t
+                while kept and (
+                    kept_len + len(kept) + len(piece) > max_length
+                    or (use_tokens and kept_tokens + tokens > token_budget)
+                ):
+                    s, t = kept.popleft()
+                    kept_len -= len(s)
+                    kept_tokens -= t
+                current = kept
+                current_len = kept_len
+                current_tokens = kept_tokens
+
+            current.append((piece, tokens))
+            current_len += len(piece)
+            current_tokens += tokens
+
+    if current:
+        chunk_text = " ".join(s for s, _ in current).strip()
         if chunk_text:
-            chunks.append(chunk_text)
-
-    return chunks
-
-
-def _split_sentences(text: str) -> List[str]:
-    import re
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    result = []
-    for s in sentences:
-        s = s.strip()
-        if len(s) > 800:
-            parts = [s[i:i+600] for i in range(0, len(s), 550)]
-            result.extend(parts)
-        elif s:
-            result.append(s)
-    return result
+            yield chunk_text
+
+
+def _iter_sentences(blocks: Iterable[str]) -> Iterator[str]:
+    pending = ""
+    for block in blocks:
+        pending += block
+        last = 0
+        for match in _SENTENCE_BOUNDARY.finditer(pending):
+            if match.end() == len(pending):
+                break
+            yield from _emit_sentence(pending[last:match.start()])
+            last = match.end()
+        pending = pending[last:]
+        if len(pending) > LONG_RUN_LIMIT:
+            cut = len(pending) - LONG_SENTENCE_LENGTH
+            cut -= cut % LONG_SENTENCE_STEP
+            for i in range(0, cut, LONG_SENTENCE_STEP):
+                piece = pending[i:i + LONG_SENTENCE_PIECE].strip()
+                if piece:
+                    yield piece
+            pending = pending[cut:]
+    if pending:
+        yield from _emit_sentence(pending)
+
+
+def _emit_sentence(sentence: str) -> Iterator[str]:
+    s = sentence.strip()
+    if len(s) > LONG_SENTENCE_LENGTH:
+        for i in range(0, len(s), LONG_SENTENCE_STEP):
+            yield s[i:i + LONG_SENTENCE_PIECE]
+    elif s:
+        yield s
+
+
+def _fit_pieces(
+    sentence: str,
+    max_length: int,
+    overlap: int,
+    token_budget: Optional[int],
+    count_tokens: Optional[Callable[[str], int]],
+) -> Iterator[Tuple[str, int]]:
+    for part in _fit_length(sentence, max_length, overlap):
+        yield from _fit_token_budget(part, token_budget, count_tokens)
+
+
+def _fit_length(sentence: str, max_length: int, overlap: int) -> Iterator[str]:
+    if len(sentence) <= max_length:
+        yield sentence
+        return
+    step = max_length - overlap if 0 <= overlap < max_length else max_length
+    for i in range(0, len(sentence), step):
+        piece = sentence[i:i + max_length].strip()
+        if piece:
+            yield piece
+        if i + max_length >= len(sentence):
+            break
+
+
+def _fit_token_budget(
+    sentence: str, token_budget: Optional[int], count_tokens: Optional[Callable[[str], int]]
+) -> Iterator[Tuple[str, int]]:
+    if token_budget is None or count_tokens is None:
+        yield sentence, 0
+        return
+    tokens = count_tokens(sentence)
+    if tokens <= token_budget or len(sentence) <= 1:
+        yield sentence, tokens
+        return
+    pieces = -(-tokens // token_budget)
+    step = -(-len(sentence) // pieces)
+    for i in range(0, len(sentence), step):
+        yield from _fit_token_budget(sentence[i:i + step], token_budget, count_tokens)
 
 
 def detect_content_type(file_path: str) -> Optional[str]:
@@ -0,0 +1,149 @@
+import logging
+import math
+import numpy as np
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARAMS = {
+    "attraction_strength": 0.15,
+    "repulsion_strength": 60.0,
+    "damping": 0.08,
+    "max_velocity": 15.0,
+    "center_gravity": 0.005,
+    "time_step": 0.05,
+    "exact_limit": 1500,
+    "cell_occupancy": 32,
+    "max_grid": 12,
+    "block_size": 1024,
+}
+
+
+def make_params(params: Optional[dict] = None) -> dict:
+    merged = dict(DEFAULT_PARAMS)
+    if params:
+        merged.update({k: v for k, v in params.items() if k in DEFAULT_PARAMS and v is not None})
+    return merged
+
+
+def settle(
+    positions: np.ndarray,
+    sources: np.ndarray,
+    targets: np.ndarray,
+    strengths: np.ndarray,
+    iterations: int,
+    params: Optional[dict] = None,
+    pinned: Optional[np.ndarray] = None,
+    on_step=None,
+    should_stop=None,
+) -> np.ndarray:
+    params = make_params(params)
+    pos = np.array(positions, dtype=np.float64, copy=True)
+    vel = np.zeros_like(pos)
+    if pos.shape[0] < 2:
+        return pos.astype(np.float32)
+
+    free = np.ones(pos.shape[0], dtype=bool)
+    if pinned is not None:
+        free[pinned] = False
+
+    dt = params["time_step"]
+    keep = 1.0 - params["damping"]
+    max_vel = params["max_velocity"]
+
+    for step in range(iterations):
+        if should_stop and should_stop():
+            break
+        force = repulsion(pos, params)
+        force += spring_forces(pos, sources, targets, strengths, params["attraction_strength"])
+        force -= pos * params["center_gravity"]
+
+        vel += force * dt
+        vel *= keep
+        speed = np.linalg.norm(vel, axis=1, keepdims=True)
+        vel *= np.where(speed > max_vel, max_vel / np.maximum(speed, 1e-12), 1.0)
+        vel[~free] = 0.0
+        pos += vel * dt
+
+        if on_step:
+            on_step(step + 1, pos, float((vel ** 2).sum()))
+
+    return pos.astype(np.float32)
+
+
+def repulsion(pos: np.ndarray, params: dict) -> np.ndarray:
+    if pos.shape[0] <= params["exact_limit"]:
+        return _exact_repulsion(pos, params["repulsion_strength"], params["block_size"])
+    return _grid_repulsion(pos, params)
+
+
+def spring_forces(
+    pos: np.ndarray, sources: np.ndarray, targets: np.ndarray, strengths: np.ndarray, k: float
+) -> np.ndarray:
+    force = np.zeros_like(pos)
+    if sources.size == 0:
+        return force
+    diff = pos[targets] - pos[sources]
+    dist = np.linalg.norm(diff, axis=1)
+    valid = dist >= 1e-4
+    ideal = 8.0 / (strengths + 0.1)
+    mag = np.where(valid, (dist - ideal) * k * strengths / np.where(valid, dist, 1.0), 0.0)
+    pull = diff * mag[:, None]
+    n = pos.shape[0]
+    for axis in range(3):
+        force[:, axis] += np.bincount(sources, weights=pull[:, axis], minlength=n)
+        force[:, axis] -= np.bincount(targets, weights=pull[:, axis], minlength=n)
+    return force
+
+
+def _pairwise_push(a: np.ndarray, b: np.ndarray, k: float, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    dist_sq = (a ** 2).sum(axis=1)[:, None] + (b ** 2).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+    valid = dist_sq >= 1e-4
+    safe = np.where(valid, dist_sq, 1.0)
+    mag = np.where(valid, k / (safe * np.sqrt(safe)), 0.0)
+    if weights is not None:
+        mag *= weights
+    return a * mag.sum(axis=1)[:, None] - mag @ b
+
+
+def _exact_repulsion(pos: np.ndarray, k: float, block_size: int) -> np.ndarray:
+    force = np.empty_like(pos)
+    for i0 in range(0, pos.shape[0], block_size):
+        i1 = min(pos.shape[0], i0 + block_size)
+        force[i0:i1] = _pairwise_push(pos[i0:i1], pos, k)
+    return force
+
+
+def _grid_repulsion(pos: np.ndarray, params: dict) -> np.ndarray:
+    n = pos.shape[0]
+    k = params["repulsion_strength"]
+    block_size = params["block_size"]
+    res = int(min(params["max_grid"], max(1, math.ceil((n / params["cell_occupancy"]) ** (1 / 3)))))
+
+    lo = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - lo, 1e-6)
+    coords = np.minimum(((pos - lo) / span * res).astype(np.int64), res - 1)
+    cell = (coords[:, 0] * res + coords[:, 1]) * res + coords[:, 2]
+
+    occupied, cell_slot, counts = np.unique(cell, return_inverse=True, return_counts=True)
+    centers = np.zeros((occupied.size, 3))
+    for axis in range(3):
+        centers[:, axis] = np.bincount(cell_slot, weights=pos[:, axis], minlength=occupied.size) / counts
+
+    force = np.empty_like(pos)
+    for i0 in range(0, n, block_size):
+        i1 = min(n, i0 + block_size)
+        weights = np.broadcast_to(counts.astype(np.float64), (i1 - i0, occupied.size)).copy()
+        weights[np.arange(i1 - i0), cell_slot[i0:i1]] = 0.0
+        force[i0:i1] = _pairwise_push(pos[i0:i1], centers, k, weights)
+
+    order = np.argsort(cell_slot, kind="stable")
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    for slot in range(occupied.size):
+        members = order[bounds[slot]:bounds[slot + 1]]
+        if members.size < 2:
+            continue
+        for j0 in range(0, members.size, block_size):
+            rows = members[j0:j0 + block_size]
+            force[rows] += _pairwise_push(pos[rows], pos[members], k)
+    return force
@@ -0,0 +1,341 @@
+import logging
+import numpy as np
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MODES = ("threshold", "knn", "hybrid")
+DEFAULT_MEMORY_BUDGET_MB = 256
+TOPK_CELL_BYTES = 4 + 8 + 1
+THRESHOLD_CELL_BYTES = 4 + 1 + 1 + 8 + 8 + 4
+TOP_BYTES = 8 + 4
+EDGE_BYTES = 128
+
+DEFAULT_POLICY = {
+    "mode": "threshold",
+    "threshold": 0.5,
+    "k": 10,
+    "mutual": False,
+    "max_degree": None,
+    "cross_modal_threshold": 0.25,
+}
+
+
+def make_policy(threshold: float = 0.5, options: Optional[dict] = None) -> dict:
+    policy = dict(DEFAULT_POLICY)
+    policy["threshold"] = threshold
+    if options:
+        policy.update({k: v for k, v in options.items() if k in DEFAULT_POLICY and v is not None})
+    if policy["mode"] not in MODES:
+        raise ValueError(f"Unknown connection mode: {policy['mode']}")
+    policy["k"] = max(1, int(policy["k"]))
+    return policy
+
+
+def cross_modal_policy(policy: dict) -> dict:
+    cross = dict(policy)
+    cross["threshold"] = policy["cross_modal_threshold"]
+    cross["mutual"] = False
+    return cross
+
+
+def needs_mutual_check(policy: dict) -> bool:
+    return bool(policy.get("mutual")) and policy["mode"] != "threshold"
+
+
+def degree_cap(policy: dict) -> Optional[int]:
+    if policy.get("max_degree"):
+        return int(policy["max_degree"])
+    if policy["mode"] != "threshold":
+        return policy["k"]
+    return None
+
+
+def cosine_similarities(embedding: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    if matrix.shape[0] == 0:
+        return np.empty(0, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)
+    return (matrix @ embedding) / np.where(norms == 0, 1.0, norms)
+
+
+def select_candidates(sims: np.ndarray, policy: dict) -> np.ndarray:
+    mode = policy["mode"]
+    if mode == "threshold":
+        idx = np.nonzero(sims >= policy["threshold"])[0]
+        return idx[np.argsort(-sims[idx], kind="stable")]
+
+    if mode == "hybrid":
+        idx = np.nonzero(sims >= policy["threshold"])[0]
+    else:
+        idx = np.nonzero(sims > 0)[0]
+    k = policy["k"]
+    if idx.size > k:
+        top = np.argpartition(-sims[idx], k - 1)[:k]
+        idx = idx[top]
+    return idx[np.argsort(-sims[idx], kind="stable")]
+
+
+def kth_similarity(sims: np.ndarray, policy: dict) -> float:
+    valid = sims[sims >= policy["threshold"]] if policy["mode"] == "hybrid" else sims[sims > 0]
+    k = policy["k"]
+    if valid.size < k:
+        return -np.inf
+    return float(np.partition(valid, valid.size - k)[valid.size - k])
+
+
+def plan_edges(
+    new_id: int, candidate_ids: list, candidate_sims: list, stats: dict, policy: dict, kth: Optional[dict] = None
+) -> tuple:
+    if needs_mutual_check(policy):
+        kth = kth or {}
+        pairs = [(nid, sim) for nid, sim in zip(candidate_ids, candidate_sims) if sim >= kth.get(nid, -np.inf)]
+        candidate_ids = [nid for nid, _ in pairs]
+        candidate_sims = [sim for _, sim in pairs]
+
+    cap = degree_cap(policy)
+    if cap is None:
+        return [(new_id, nid, float(sim)) for nid, sim in zip(candidate_ids, candidate_sims)], []
+
+    to_create = []
+    to_evict = []
+    for nid, sim in zip(candidate_ids, candidate_sims):
+        if len(to_create) >= cap:
+            break
+        node_stats = stats.get(nid)
+        if node_stats is None or node_stats["degree"] < cap:
+            to_create.append((new_id, nid, float(sim)))
+            continue
+        weakest = node_stats["edges"][0]
+        if sim <= weakest["strength"]:
+            continue
+        to_create.append((new_id, nid, float(sim)))
+        to_evict.append(weakest)
+    return to_create, _unique_edges(to_evict)
+
+
+def _unique_edges(edges: list) -> list:
+    seen = set()
+    result = []
+    for edge in edges:
+        if edge["id"] in seen:
+            continue
+        seen.add(edge["id"])
+        result.append(edge)
+    return result
+
+
+def blocked_edges(
+    matrix: np.ndarray,
+    policy: dict,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+    progress=None,
+) -> tuple:
+    n = matrix.shape[0]
+    if n < 2:
+        return _empty_edges()
+
+    x, inv = _unit_scale(matrix)
+    budget = _budget_bytes(memory_budget_mb)
+    if policy["mode"] == "threshold":
+        max_edges = max(1, budget // 2 // EDGE_BYTES)
+        block = _block_rows(n, n, budget - max_edges * EDGE_BYTES, THRESHOLD_CELL_BYTES)
+        src, tgt, val = _scan_threshold(x, inv, x, inv, policy["threshold"], block, max_edges, progress, True)
+    else:
+        k = min(policy["k"], n - 1)
+        block = _block_rows(n, n, budget - n * k * TOP_BYTES, TOPK_CELL_BYTES)
+        top_idx, top_val = _scan_topk(x, inv, x, inv, k, policy, block, progress, True)
+        src, tgt, val = _topk_edges(top_idx, top_val)
+        del top_idx, top_val
+        if needs_mutual_check(policy):
+            keep = np.isin(tgt * n + src, src * n + tgt)
+            src, tgt, val = src[keep], tgt[keep], val[keep]
+        a = np.minimum(src, tgt)
+        b = np.maximum(src, tgt)
+        _, first = np.unique(a * n + b, return_index=True)
+        src, tgt, val = a[first], b[first], val[first]
+
+    cap = degree_cap(policy)
+    if cap is not None and src.size:
+        src, tgt, val = _cap_degree(src, tgt, val, n, cap)
+    return src, tgt, val
+
+
+def blocked_cross_edges(
+    left: np.ndarray,
+    right: np.ndarray,
+    policy: dict,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+    progress=None,
+) -> tuple:
+    n, m = left.shape[0], right.shape[0]
+    if n == 0 or m == 0:
+        return _empty_edges()
+
+    a, inv_a = _unit_scale(left)
+    b, inv_b = _unit_scale(right)
+    budget = _budget_bytes(memory_budget_mb)
+    if policy["mode"] == "threshold":
+        max_edges = max(1, budget // 2 // EDGE_BYTES)
+        block = _block_rows(n, m, budget - max_edges * EDGE_BYTES, THRESHOLD_CELL_BYTES)
+        src, tgt, val = _scan_threshold(a, inv_a, b, inv_b, policy["threshold"], block, max_edges, progress)
+    else:
+        k = min(policy["k"], m)
+        block = _block_rows(n, m, budget - n * k * TOP_BYTES, TOPK_CELL_BYTES)
+        src, tgt, val = _topk_edges(*_scan_topk(a, inv_a, b, inv_b, k, policy, block, progress))
+
+    cap = degree_cap(policy)
+    if cap is not None and src.size:
+        src, tgt, val = _cap_degree(src, tgt + n, val, n + m, cap)
+        tgt = tgt - n
+    return src, tgt, val
+
+
+def _empty_edges() -> tuple:
+    return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+
+def _budget_bytes(memory_budget_mb: float) -> int:
+    return max(1, int(memory_budget_mb * 1024 * 1024))
+
+
+def _block_rows(rows: int, cols: int, available: int, cell_bytes: int) -> int:
+    return max(1, min(rows, available // (cols * cell_bytes)))
+
+
+def _unit_scale(matrix: np.ndarray) -> tuple:
+    x = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=1)
+    return x, (1.0 / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+
+
+def _similarity_block(a: np.ndarray, inv_a: np.ndarray, b: np.ndarray, inv_b: np.ndarray) -> np.ndarray:
+    sims = a @ b.T
+    sims *= inv_a[:, None]
+    sims *= inv_b[None, :]
+    return sims
+
+
+def _scan_threshold(
+    a: np.ndarray,
+    inv_a: np.ndarray,
+    b: np.ndarray,
+    inv_b: np.ndarray,
+    threshold: float,
+    block: int,
+    max_edges: int,
+    progress,
+    upper: bool = False,
+) -> tuple:
+    n = a.shape[0]
+    floor = threshold
+    parts = []
+    held = 0
+    for i0 in range(0, n, block):
+        i1 = min(n, i0 + block)
+        offset = i0 if upper else 0
+        sims = _similarity_block(a[i0:i1], inv_a[i0:i1], b[offset:], inv_b[offset:])
+        if upper:
+            sims[:, :i1 - i0][np.tri(i1 - i0, dtype=bool)] = -np.inf
+        rows, cols = np.nonzero(sims >= floor)
+        parts.append((rows + i0, cols + offset, sims[rows, cols]))
+        del sims
+        held += rows.size
+        if held > max_edges:
+            parts, floor = _strongest(parts, max_edges)
+            held = max_edges
+        if progress:
+            progress(i1, n)
+    if floor > threshold:
+        logger.warning(
+            f"Kept the {max_edges} strongest edges to stay within the memory budget; "
+            f"similarity floor raised from {threshold:.3f} to {floor:.3f}"
+        )
+    return _concat(parts)
+
+
+def _strongest(parts: list, count: int) -> tuple:
+    src, tgt, val = _concat(parts)
+    keep = np.argpartition(val, val.size - count)[val.size - count:]
+    return [(src[keep], tgt[keep], val[keep])], float(val[keep].min())
+
+
+def _scan_topk(
+    a: np.ndarray,
+    inv_a: np.ndarray,
+    b: np.ndarray,
+    inv_b: np.ndarray,
+    k: int,
+    policy: dict,
+    block: int,
+    progress,
+    exclude_self: bool = False,
+) -> tuple:
+    n, m = a.shape[0], b.shape[0]
+    top_idx = np.empty((n, k), dtype=np.int64)
+    top_val = np.empty((n, k), dtype=np.float32)
+    for i0 in range(0, n, block):
+        i1 = min(n, i0 + block)
+        sims = _similarity_block(a[i0:i1], inv_a[i0:i1], b, inv_b)
+        if exclude_self:
+            rows = np.arange(i1 - i0)
+            sims[rows, rows + i0] = -np.inf
+        if policy["mode"] == "hybrid":
+            sims[sims < policy["threshold"]] = -np.inf
+        else:
+            sims[sims <= 0] = -np.inf
+        part = np.argpartition(sims, m - k, axis=1)[:, m - k:]
+        top_idx[i0:i1] = part
+        top_val[i0:i1] = np.take_along_axis(sims, part, axis=1)
+        del sims, part
+        if progress:
+            progress(i1, n)
+    return top_idx, top_val
+
+
+def _topk_edges(top_idx: np.ndarray, top_val: np.ndarray) -> tuple:
+    valid = np.isfinite(top_val)
+    src = np.nonzero(valid)[0]
+    return src, top_idx[valid], top_val[valid]
+
+
+def _cap_degree(src: np.ndarray, tgt: np.ndarray, val: np.ndarray, n: int, cap: int) -> tuple:
+    order = np.argsort(-val, kind="stable")
+    ends = np.empty(2 * order.size, dtype=np.int64)
+    ends[0::2] = src[order]
+    ends[1::2] = tgt[order]
+    slots = np.argsort(ends, kind="stable")
+    remaining = np.full(n, cap, dtype=np.int64)
+    keep = np.zeros(order.size, dtype=bool)
+    while slots.size:
+        nodes = ends[slots]
+        rank = np.arange(slots.size)
+        rank -= np.searchsorted(nodes, nodes)
+        refused = slots[rank >= remaining[nodes]] // 2
+        del rank, nodes
+        accepted = np.zeros(order.size, dtype=bool)
+        accepted[slots // 2] = True
+        accepted[refused] = False
+        del refused
+        if not accepted.any():
+            break
+        keep |= accepted
+        remaining -= np.bincount(ends.reshape(-1, 2)[accepted].ravel(), minlength=n)
+        del accepted
+        edges = slots // 2
+        open_slots = ~keep[edges]
+        open_slots &= remaining[ends[edges * 2]] > 0
+        open_slots &= remaining[ends[edges * 2 + 1]] > 0
+        del edges
+        slots = slots[open_slots]
+    kept = np.sort(order[keep])
+    return src[kept], tgt[kept], val[kept]
+
+
+def _concat(parts: list) -> tuple:
+    if not parts:
+        return _empty_edges()
+    return (
+        np.concatenate([p[0] for p in parts]).astype(np.int64),
+        np.concatenate([p[1] for p in parts]).astype(np.int64),
+        np.concatenate([p[2] for p in parts]).astype(np.float32),
+    )
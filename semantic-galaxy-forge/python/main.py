@@ -4,7 +4,9 @@ import json
 import os
 import logging
 import tempfile
+import threading
 import numpy as np
+from typing import Optional
 
 logging.basicConfig(
     filename=os.path.join(os.environ.get("DATA_DIR", tempfile.gettempdir()), "sgf-backend.log"),
@@ -18,19 +20,291 @@ MODELS_DIR = os.environ.get("MODELS_DIR", os.path.join(os.path.dirname(__file__)
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
-from database import Database
-from embeddings import EmbeddingGenerator
+from database import Database, NODE_PUBLIC_COLUMNS, NODE_POSITION_COLUMNS, SQL_VARIABLE_CHUNK, fts_match
+from embeddings import EmbeddingGenerator, TEXT_MODEL, CLIP_MODEL, CLIP_TEXT_SPACE, infer_model
 import projection as proj
 import community as comm
+import clusters as clus
+import linking
+import layout
+import archive
+import dedup
+import quantize
+from embedding_pool import EmbeddingPool
+from vector_index import VectorIndex
+from working_set import WorkingSet, DEFAULT_BUDGET_MB
+from scheduler import IdleScheduler, Task, DEFAULT_IDLE_SECONDS
 import file_processors as fp
 
 db = Database(os.path.join(DATA_DIR, "galaxies.db"))
 embedder = EmbeddingGenerator()
+_stdout_lock = threading.Lock()
+_backend_lock = threading.RLock()
+_layout_jobs = {}
+_link_jobs = {}
+embedding_pool = None
+INGEST_BATCH_SIZE = 64
+RRF_K = 60
+SCHEDULER_WARM_GALAXIES = 1
+SPACE_ORDER = (TEXT_MODEL, CLIP_MODEL)
+SPACE_SPACING = 40.0
+CROSS_MODAL_BATCH = 256
+CROSS_EMBEDDING_CODEC = "float16"
+INDEX_PARTS = ("nodes", "adjacency", "embeddings", "index")
+EMBEDDING_COLUMNS = ("content_type", "embedding", "embedding_model", "clip_embedding")
+
+
+_codebooks = {}
+EMBEDDING_CODEC = quantize.make_codec(os.environ.get("EMBEDDING_CODEC"))
+PQ_MIN_TRAIN = 1024
+
+
+def galaxy_codebooks(galaxy_id: int) -> dict:
+    books = _codebooks.get(galaxy_id)
+    if books is None:
+        books = {dim: quantize.codebook_from_bytes(blob) for dim, blob in db.get_codebooks(galaxy_id).items()}
+        _codebooks[galaxy_id] = books
+    return books
+
+
+def galaxy_settings(galaxy_id: int) -> dict:
+    galaxy = db.get_galaxy(galaxy_id)
+    return serialize_galaxy(galaxy)["settings"] if galaxy else {}
+
+
+def space_codec(settings: dict, space: Optional[str] = None) -> str:
+    codecs = settings.get("embedding_codecs") or {}
+    return codecs.get(space) or settings.get("embedding_codec") or EMBEDDING_CODEC
+
+
+def encode_embedding(galaxy_id: int, embedding: Optional[np.ndarray], space: str) -> tuple:
+    if embedding is None:
+        return None, None
+    settings = galaxy_settings(galaxy_id)
+    codec = space_codec(settings, space)
+    codebook = galaxy_codebooks(galaxy_id).get(embedding.shape[0]) if codec == "pq" else None
+    if codec == "pq" and codebook is None:
+        codec = "int8"
+    original = None
+    if codec != "float32" and settings.get("keep_originals"):
+        original = np.asarray(embedding, dtype=np.float32).tobytes()
+    return quantize.encode(embedding, codec, codebook), original
+
+
+def decode_embedding(galaxy_id: int, blob: Optional[bytes]) -> Optional[np.ndarray]:
+    if not blob:
+        return None
+    codec, dim, _m = quantize.blob_info(blob)
+    return quantize.decode(blob, galaxy_codebooks(galaxy_id).get(dim) if codec == "pq" else None)
+
+
+def embedding_space(row: dict, blob: bytes) -> str:
+    return row.get("embedding_model") or infer_model(row.get("content_type"), quantize.blob_info(blob)[1])
+
+
+def _space_blobs(row: dict):
+    if row["embedding"]:
+        yield embedding_space(row, row["embedding"]), row["embedding"]
+    if row.get("clip_embedding"):
+        yield CLIP_TEXT_SPACE, row["clip_embedding"]
+
+
+def backfill_embedding_spaces() -> int:
+    rows = []
+    for row in db.get_unlabelled_embeddings():
+        dim = quantize.blob_info(row["embedding"])[1]
+        rows.append((infer_model(row["content_type"], dim), dim, row["id"]))
+    for galaxy_id in db.set_embedding_spaces(rows):
+        vector_index.drop_galaxy(galaxy_id)
+    return len(rows)
+
+
+def primary_spaces(groups: dict) -> list:
+    return sorted(
+        (space for space in groups if space != CLIP_TEXT_SPACE),
+        key=lambda space: (SPACE_ORDER.index(space) if space in SPACE_ORDER else len(SPACE_ORDER), space),
+    )
+
+
+def galaxy_embeddings(galaxy_id: int) -> dict:
+    return embedding_groups(galaxy_id, db.get_embeddings(galaxy_id), galaxy_codebooks(galaxy_id))
+
+
+def embedding_groups(galaxy_id: int, rows: list, codebooks: dict) -> dict:
+    groups = {}
+    for row in rows:
+        for space, blob in _space_blobs(row):
+            codec, dim, _m = quantize.blob_info(blob)
+            ids, blobs = groups.setdefault((space, codec, dim, len(blob)), ([], []))
+            ids.append(row["id"])
+            blobs.append(blob)
+
+    by_space = {}
+    for (space, codec, dim, _size), (ids, blobs) in groups.items():
+        if codec == "pq" and dim not in codebooks:
+            logger.warning(f"Galaxy {galaxy_id}: {len(ids)} {space} embeddings have no codebook, skipping")
+            continue
+        by_space.setdefault((space, dim), []).append((ids, quantize.decode_blobs(blobs, codebooks.get(dim))))
+
+    result = {}
+    for (space, dim), parts in sorted(by_space.items(), key=lambda item: -sum(len(ids) for ids, _ in item[1])):
+        if space in result:
+            logger.warning(f"Galaxy {galaxy_id}: ignoring {space} embeddings of mismatched dimension {dim}")
+            continue
+        result[space] = ([nid for ids, _ in parts for nid in ids], np.concatenate([m for _, m in parts]))
+    return result
+
+
+def append_embeddings(galaxy_id: int, groups: dict, node_ids: list) -> Optional[dict]:
+    codebooks = galaxy_codebooks(galaxy_id)
+    result = dict(groups)
+    rows = db.get_nodes_by_ids(node_ids, ("id", "content_type", "embedding", "embedding_model", "clip_embedding"))
+    for row in rows:
+        for space, blob in _space_blobs(row):
+            codec, dim, _m = quantize.blob_info(blob)
+            if codec == "pq" and dim not in codebooks:
+                return None
+            vector = quantize.decode_blobs([blob], codebooks.get(dim))
+            ids, matrix = result.get(space, ([], vector[:0]))
+            if matrix.shape[1] != vector.shape[1]:
+                return None
+            result[space] = (ids + [row["id"]], np.concatenate([matrix, vector]))
+    return result
+
+
+def index_entries(rows: list):
+    for row in rows:
+        for space, blob in _space_blobs(row):
+            yield row["id"], space, blob
+
+
+def load_index_vectors(galaxy_id: int):
+    return index_entries(db.get_embeddings(galaxy_id))
+
+
+def load_originals(space: str, node_ids: list) -> dict:
+    if space == CLIP_TEXT_SPACE:
+        return {}
+    return {
+        node_id: np.frombuffer(blob, dtype=np.float32)
+        for node_id, blob in db.get_embedding_originals(node_ids).items()
+    }
+
+
+vector_index = VectorIndex(load_index_vectors, galaxy_codebooks, load_originals)
+
+
+def load_nodes_part(galaxy_id: int) -> dict:
+    return nodes_part(db.get_nodes(galaxy_id, NODE_POSITION_COLUMNS))
+
+
+def nodes_part(nodes: list) -> dict:
+    ids = np.array([n["id"] for n in nodes], dtype=np.int64)
+    return {
+        "ids": ids,
+        "index": {nid: i for i, nid in enumerate(ids.tolist())},
+        "positions": np.array(
+            [[n["position_x"], n["position_y"], n["position_z"]] for n in nodes], dtype=np.float64
+        ).reshape(-1, 3),
+    }
+
+
+def load_adjacency_part(galaxy_id: int) -> dict:
+    return adjacency_part(db.get_connections(galaxy_id))
+
+
+def adjacency_part(connections: list) -> dict:
+    return {
+        "ids": np.array([c["id"] for c in connections], dtype=np.int64),
+        "source": np.array([c["source_id"] for c in connections], dtype=np.int64),
+        "target": np.array([c["target_id"] for c in connections], dtype=np.int64),
+        "strength": np.array([c["strength"] for c in connections], dtype=np.float64),
+        "types": [c["connection_type"] for c in connections],
+    }
+
+
+def adjacency_rows(adjacency: dict) -> list:
+    return [
+        {"id": cid, "source_id": src, "target_id": tgt, "strength": strength, "connection_type": kind}
+        for cid, src, tgt, strength, kind in zip(
+            adjacency["ids"].tolist(), adjacency["source"].tolist(), adjacency["target"].tolist(),
+            adjacency["strength"].tolist(), adjacency["types"],
+        )
+    ]
+
+
+def _community_inputs(nodes: dict, adjacency: dict) -> tuple:
+    return [{"id": nid} for nid in nodes["ids"].tolist()], adjacency_rows(adjacency)
+
+
+def load_communities_part(galaxy_id: int) -> list:
+    nodes = working_set.get(galaxy_id, "nodes")
+    return comm.detect_communities(*_community_inputs(nodes, working_set.get(galaxy_id, "adjacency")))
+
+
+def space_offsets(spaces: list) -> dict:
+    middle = (len(spaces) - 1) / 2
+    return {space: np.array([(i - middle) * SPACE_SPACING, 0.0, 0.0]) for i, space in enumerate(spaces)}
+
+
+def _projection_inputs(groups: dict) -> list:
+    return [(space, groups[space][0], groups[space][1]) for space in primary_spaces(groups)]
+
+
+def project_galaxy(partitions: list, params: Optional[dict] = None) -> Optional[dict]:
+    if sum(len(ids) for _space, ids, _matrix in partitions) < 2:
+        return None
+    offsets = space_offsets([space for space, _ids, _matrix in partitions])
+    return {
+        "ids": np.concatenate([np.asarray(ids, dtype=np.int64) for _space, ids, _matrix in partitions]),
+        "positions": np.concatenate([
+            proj.project_embeddings(matrix, params) + offsets[space] for space, _ids, matrix in partitions
+        ]),
+    }
+
+
+def load_projection_part(galaxy_id: int) -> Optional[dict]:
+    return project_galaxy(_projection_inputs(working_set.get(galaxy_id, "embeddings")))
+
+
+working_set = WorkingSet(
+    {
+        "nodes": load_nodes_part,
+        "embeddings": galaxy_embeddings,
+        "adjacency": load_adjacency_part,
+        "communities": load_communities_part,
+        "projection": load_projection_part,
+        "index": vector_index.build,
+    },
+    float(os.environ.get("WORKING_SET_MB", DEFAULT_BUDGET_MB)),
+    appenders={"embeddings": append_embeddings},
+    maintained=("index",),
+)
+vector_index.attach(working_set)
+db.listeners.append(working_set.on_change)
+
+
+def write_message(message: dict):
+    with _stdout_lock:
+        print(json.dumps(message), flush=True)
+
+
+def emit_event(channel: str, data: dict):
+    write_message({"event": channel, "data": data})
+
+
+def emit_progress(stage: str, progress: float, message: str = ""):
+    emit_event("progress", {"stage": stage, "progress": progress, "message": message})
+
+
+CLUSTER_NODE_COLUMNS = NODE_POSITION_COLUMNS + ("label", "content")
 
 
 def serialize_node(row: dict) -> dict:
     node = dict(row)
     node.pop("embedding", None)
+    node.pop("clip_embedding", None)
+    node.pop("embedding_original", None)
     if node.get("thumbnail") and isinstance(node["thumbnail"], (bytes, bytearray)):
         import base64
         node["thumbnail"] = base64.b64encode(node["thumbnail"]).decode()
@@ -55,9 +329,10 @@ def serialize_galaxy(row: dict) -> dict:
     return g
 
 
-def get_initial_position(galaxy_id: int, embedding: np.ndarray) -> tuple:
-    existing = db.get_embeddings(galaxy_id)
-    if len(existing) < 2:
+def get_initial_position(galaxy_id: int, embedding: np.ndarray, space: str) -> tuple:
+    groups = working_set.get(galaxy_id, "embeddings")
+    group = groups.get(space)
+    if group is None or len(group[0]) < 2 or group[1].shape[1] != embedding.shape[0]:
         import random
         r = 8.0
         return (
@@ -66,33 +341,505 @@ def get_initial_position(galaxy_id: int, embedding: np.ndarray) -> tuple:
             random.uniform(-r, r),
         )
 
-    embeddings_list = []
-    for row in existing:
-        arr = embedder.bytes_to_array(row["embedding"])
-        if arr is not None:
-            embeddings_list.append(arr)
-
-    if len(embeddings_list) < 2:
-        import random
-        r = 8.0
-        return (random.uniform(-r, r), random.uniform(-r, r), random.uniform(-r, r))
-
-    all_embeddings = np.stack(embeddings_list + [embedding])
+    all_embeddings = np.vstack([group[1], embedding[None, :]])
     positions = proj.project_embeddings(all_embeddings)
-    return tuple(float(v) for v in positions[-1])
+    offset = space_offsets(primary_spaces(groups))[space]
+    return tuple(float(v) for v in positions[-1] + offset)
+
+
+def _plan_node_edges(galaxy_id: int, new_node_id: int, query: np.ndarray, space: str, policy: dict) -> tuple:
+    ids, sims = vector_index.similarities(galaxy_id, query, space)
+    keep = ids != new_node_id
+    ids, sims = ids[keep].tolist(), sims[keep]
+    if not ids:
+        return [], []
+
+    picked = linking.select_candidates(sims, policy)
+    candidate_ids = [ids[i] for i in picked]
+    candidate_sims = [float(sims[i]) for i in picked]
+
+    stats = {}
+    if linking.degree_cap(policy) is not None:
+        candidates = set(candidate_ids)
+        for edge in sorted(db.get_semantic_edges(candidate_ids), key=lambda e: e["strength"]):
+            for nid in (edge["source_id"], edge["target_id"]):
+                if nid in candidates:
+                    entry = stats.setdefault(nid, {"degree": 0, "edges": []})
+                    entry["degree"] += 1
+                    entry["edges"].append(edge)
+
+    kth = {}
+    if linking.needs_mutual_check(policy):
+        for nid, vector in vector_index.lookup(galaxy_id, space, candidate_ids).items():
+            other_ids, other_sims = vector_index.similarities(galaxy_id, vector, space)
+            kth[nid] = linking.kth_similarity(other_sims[(other_ids != nid) & (other_ids != new_node_id)], policy)
+
+    return linking.plan_edges(new_node_id, candidate_ids, candidate_sims, stats, policy, kth)
+
+
+def create_connections_for_node(
+    galaxy_id: int, new_node_id: int, new_embedding: np.ndarray, threshold: float, policy_options: dict = None,
+    space: str = TEXT_MODEL, clip_embedding: Optional[np.ndarray] = None,
+) -> list:
+    policy = linking.make_policy(threshold, policy_options)
+    legs = [(space, new_embedding, policy)]
+    if space == CLIP_MODEL:
+        legs.append((CLIP_TEXT_SPACE, new_embedding, linking.cross_modal_policy(policy)))
+    elif clip_embedding is not None:
+        legs.append((CLIP_MODEL, clip_embedding, linking.cross_modal_policy(policy)))
+
+    to_create = []
+    to_evict = {}
+    for leg_space, query, leg_policy in legs:
+        created, evicted = _plan_node_edges(galaxy_id, new_node_id, query, leg_space, leg_policy)
+        to_create.extend(created)
+        to_evict.update((e["id"], e) for e in evicted)
+    db.apply_connection_diff(to_create, list(to_evict))
+    return list(to_evict.values())
+
+
+def serialize_cluster(row: dict) -> dict:
+    cluster = dict(row)
+    cluster.pop("centroid", None)
+    return cluster
+
+
+def _cluster_inputs(nodes: list, adjacency: dict, communities: list, groups: dict) -> tuple:
+    embeddings = {}
+    for space in primary_spaces(groups):
+        embeddings.update(zip(*groups[space]))
+    return nodes, embeddings, communities, adjacency_rows(adjacency)
+
+
+def save_cluster_hierarchy(galaxy_id: int, hierarchy: dict) -> int:
+    db.save_cluster_hierarchy(galaxy_id, hierarchy["levels"], hierarchy["edges"], hierarchy["membership"])
+    return len(hierarchy["levels"])
+
+
+def build_cluster_hierarchy(galaxy_id: int, communities: list = None) -> int:
+    nodes = db.get_nodes(galaxy_id, CLUSTER_NODE_COLUMNS)
+    adjacency = working_set.get(galaxy_id, "adjacency")
+    if communities is None:
+        communities = working_set.get(galaxy_id, "communities")
+    inputs = _cluster_inputs(nodes, adjacency, communities, working_set.get(galaxy_id, "embeddings"))
+    return save_cluster_hierarchy(galaxy_id, clus.build_hierarchy(*inputs))
+
+
+def _cluster_parent_maps(galaxy_id: int, level_count: int) -> list:
+    return [
+        {c["idx"]: c["parent_idx"] for c in db.get_clusters(galaxy_id, level)}
+        for level in range(1, level_count)
+    ]
 
 
-def create_connections_for_node(galaxy_id: int, new_node_id: int, new_embedding: np.ndarray, threshold: float):
-    all_nodes = db.get_nodes(galaxy_id)
-    for node in all_nodes:
-        if node["id"] == new_node_id:
+def _cluster_chain(idx: int, parent_maps: list) -> list:
+    chain = [idx]
+    for parents in parent_maps:
+        chain.append(parents.get(chain[-1]))
+    return chain
+
+
+def add_connections_to_clusters(galaxy_id: int, connections: list, sign: int = 1):
+    level_count = db.get_cluster_level_count(galaxy_id)
+    if level_count == 0 or not connections:
+        return
+    parent_maps = _cluster_parent_maps(galaxy_id, level_count)
+    node_ids = {c["source_id"] for c in connections} | {c["target_id"] for c in connections}
+    chains = {nid: _cluster_chain(idx, parent_maps) for nid, idx in db.get_node_clusters(list(node_ids)).items()}
+    edges = []
+    for conn in connections:
+        a = chains.get(conn["source_id"])
+        b = chains.get(conn["target_id"])
+        if a is None or b is None:
             continue
-        existing_emb = embedder.bytes_to_array(node.get("embedding"))
-        if existing_emb is None:
-            continue
-        sim = embedder.cosine_similarity(new_embedding, existing_emb)
-        if sim >= threshold:
-            db.create_connection(new_node_id, node["id"], float(sim))
+        for level_no, (ia, ib) in enumerate(zip(a, b), start=1):
+            if ia is None or ib is None or ia == ib:
+                continue
+            edges.append({
+                "level": level_no,
+                "source_idx": min(ia, ib),
+                "target_idx": max(ia, ib),
+                "strength": sign * float(conn["strength"]),
+                "edge_count": sign,
+            })
+    db.add_cluster_edges(galaxy_id, edges)
+
+
+def update_clusters_for_node(galaxy_id: int, node_id: int, embedding: np.ndarray, pos: tuple):
+    level_count = db.get_cluster_level_count(galaxy_id)
+    if level_count == 0:
+        return
+    level_one = []
+    for row in db.get_clusters(galaxy_id, 1):
+        level_one.append({
+            "idx": row["idx"],
+            "member_count": row["member_count"],
+            "centroid": embedder.bytes_to_array(row["centroid"]),
+            "position": np.array([row["position_x"], row["position_y"], row["position_z"]], dtype=np.float32),
+        })
+    idx = clus.nearest_cluster(level_one, embedding, pos)
+    if idx is None:
+        return
+    chain = _cluster_chain(idx, _cluster_parent_maps(galaxy_id, level_count))
+
+    centroids = []
+    for level_no, cluster_idx in enumerate(chain, start=1):
+        row = db.get_cluster(galaxy_id, level_no, cluster_idx) if cluster_idx is not None else None
+        centroid = None
+        if embedding is not None and row is not None:
+            old = embedder.bytes_to_array(row["centroid"])
+            if old is None:
+                centroid = embedding.astype(np.float32).tobytes()
+            elif old.shape == embedding.shape:
+                count = row["member_count"]
+                centroid = ((old * count + embedding) / (count + 1)).astype(np.float32).tobytes()
+        centroids.append(centroid)
+
+    db.add_node_to_cluster(galaxy_id, node_id, chain, centroids, pos)
+    add_connections_to_clusters(galaxy_id, db.get_node_connections(node_id))
+
+
+def record_signature(galaxy_id: int, node_id: int, content: str):
+    signature = dedup.simhash(content)
+    if signature is not None:
+        db.add_chunk_signatures(galaxy_id, [(node_id, dedup.to_signed(signature), dedup.bands(signature))])
+
+
+def signature_rows(nodes: list) -> list:
+    rows = []
+    for node in nodes:
+        signature = dedup.simhash(node["content"])
+        if signature is not None:
+            rows.append((node["id"], dedup.to_signed(signature), dedup.bands(signature)))
+    return rows
+
+
+def ensure_signatures(galaxy_id: int):
+    nodes = db.get_nodes_by_ids(db.get_unsigned_text_node_ids(galaxy_id), ("id", "content"))
+    db.add_chunk_signatures(galaxy_id, signature_rows(nodes))
+
+
+def _resident(galaxy_id: int, parts: tuple) -> Optional[tuple]:
+    values = tuple(working_set.peek(galaxy_id, part) for part in parts)
+    return None if any(value is None for value in values) else values
+
+
+def _read_in_chunks(ids: list, read) -> list:
+    rows = {}
+    for i in range(0, len(ids), SQL_VARIABLE_CHUNK):
+        with scheduler.idle_lock():
+            rows.update((row["id"], row) for row in read(ids[i:i + SQL_VARIABLE_CHUNK]))
+    return [rows[row_id] for row_id in ids if row_id in rows]
+
+
+def prepare_indexes(galaxy_id: int) -> Optional[tuple]:
+    if not db.get_galaxy(galaxy_id):
+        return None
+    generations = {
+        part: working_set.generation(galaxy_id, part)
+        for part in INDEX_PARTS if not working_set.contains(galaxy_id, part)
+    }
+    unsigned_ids = db.get_unsigned_text_node_ids(galaxy_id)
+    if not generations and not unsigned_ids:
+        return None
+    node_ids = [n["id"] for n in db.get_nodes(galaxy_id, ("id",))] if set(generations) - {"adjacency"} else []
+    connection_ids = db.get_connection_ids(galaxy_id) if "adjacency" in generations else []
+    return generations, galaxy_id, node_ids, connection_ids, unsigned_ids, galaxy_codebooks(galaxy_id)
+
+
+def compute_indexes(job: tuple) -> tuple:
+    generations, galaxy_id, node_ids, connection_ids, unsigned_ids, codebooks = job
+    columns = NODE_POSITION_COLUMNS if "nodes" in generations else ("id",)
+    if "embeddings" in generations or "index" in generations:
+        columns += EMBEDDING_COLUMNS
+    rows = _read_in_chunks(node_ids, lambda chunk: db.get_nodes_by_ids(chunk, columns))
+    embedded = [row for row in rows if row.get("embedding")]
+    values = {}
+    if "nodes" in generations:
+        values["nodes"] = nodes_part(rows)
+    if "adjacency" in generations:
+        values["adjacency"] = adjacency_part(_read_in_chunks(connection_ids, db.get_connections_by_ids))
+    if "embeddings" in generations:
+        values["embeddings"] = embedding_groups(galaxy_id, embedded, codebooks)
+    if "index" in generations:
+        values["index"] = vector_index.build_from(galaxy_id, index_entries(embedded), codebooks)
+    texts = _read_in_chunks(unsigned_ids, lambda chunk: db.get_nodes_by_ids(chunk, ("id", "content")))
+    return values, signature_rows(texts)
+
+
+def commit_indexes(galaxy_id: int, job: tuple, result: tuple) -> bool:
+    values, signatures = result
+    with _backend_lock:
+        if not db.get_galaxy(galaxy_id):
+            return False
+        for part, value in values.items():
+            working_set.put(galaxy_id, part, value, job[0][part])
+        alive = {n["id"] for n in db.get_nodes_by_ids([row[0] for row in signatures], ("id",))}
+        db.add_chunk_signatures(galaxy_id, [row for row in signatures if row[0] in alive])
+        return True
+
+
+def prepare_communities(galaxy_id: int) -> Optional[tuple]:
+    if not db.get_galaxy(galaxy_id) or working_set.contains(galaxy_id, "communities"):
+        return None
+    parts = _resident(galaxy_id, ("nodes", "adjacency"))
+    if parts is None:
+        return None
+    return working_set.generation(galaxy_id, "communities"), parts
+
+
+def prepare_clusters(galaxy_id: int) -> Optional[tuple]:
+    if not db.get_galaxy(galaxy_id) or db.get_cluster_level_count(galaxy_id) > 0:
+        return None
+    parts = _resident(galaxy_id, ("nodes", "adjacency", "communities", "embeddings"))
+    if parts is None:
+        return None
+    return working_set.generation(galaxy_id, "communities"), parts
+
+
+def compute_clusters(job: tuple) -> dict:
+    nodes, adjacency, communities, groups = job[1]
+    rows = _read_in_chunks(nodes["ids"].tolist(), lambda chunk: db.get_nodes_by_ids(chunk, CLUSTER_NODE_COLUMNS))
+    return clus.build_hierarchy(*_cluster_inputs(rows, adjacency, communities, groups))
+
+
+def commit_clusters(galaxy_id: int, job: tuple, hierarchy: dict) -> bool:
+    with _backend_lock:
+        if working_set.generation(galaxy_id, "communities") != job[0]:
+            return False
+        if not db.get_galaxy(galaxy_id) or db.get_cluster_level_count(galaxy_id) > 0:
+            return False
+        save_cluster_hierarchy(galaxy_id, hierarchy)
+        return True
+
+
+def prepare_projection(galaxy_id: int) -> Optional[tuple]:
+    if not db.get_galaxy(galaxy_id) or working_set.contains(galaxy_id, "projection"):
+        return None
+    groups = working_set.peek(galaxy_id, "embeddings")
+    if groups is None:
+        return None
+    return working_set.generation(galaxy_id, "projection"), _projection_inputs(groups)
+
+
+def prepare_cross_modal(galaxy_id: int) -> Optional[list]:
+    if not db.get_galaxy(galaxy_id) or not db.has_embedding_model(galaxy_id, CLIP_MODEL):
+        return None
+    if not embedder.check_models()["clip"]:
+        return None
+    return db.get_missing_clip_embeddings(galaxy_id, CROSS_MODAL_BATCH) or None
+
+
+def commit_cross_modal(galaxy_id: int, rows: list, vectors: np.ndarray) -> bool:
+    with _backend_lock:
+        if not db.get_galaxy(galaxy_id):
+            return False
+        alive = {n["id"] for n in db.get_nodes_by_ids([r["id"] for r in rows], ("id",))}
+        store_clip_embeddings(galaxy_id, [(r["id"], v) for r, v in zip(rows, vectors) if r["id"] in alive])
+        return True
+
+
+def _commit_part(part: str):
+    def commit(galaxy_id: int, job: tuple, value) -> bool:
+        return working_set.put(galaxy_id, part, value, job[0])
+    return commit
+
+
+def _on_precomputed(galaxy_id: int, task: str):
+    emit_event("precomputed", {"galaxy_id": galaxy_id, "task": task})
+
+
+scheduler = IdleScheduler(
+    _backend_lock,
+    [
+        Task(
+            "indexes", ("galaxy", "nodes", "embeddings", "cross_embeddings", "connections"), prepare_indexes,
+            compute_indexes, commit_indexes,
+        ),
+        Task(
+            "cross_modal", ("galaxy", "nodes", "embeddings", "cross_embeddings"), prepare_cross_modal,
+            lambda rows: embedder.generate_clip_text_embeddings([r["content"] for r in rows]), commit_cross_modal,
+        ),
+        Task(
+            "communities", ("galaxy", "nodes", "connections"), prepare_communities,
+            lambda job: comm.detect_communities(*_community_inputs(*job[1])), _commit_part("communities"),
+        ),
+        Task(
+            "clusters", ("galaxy", "nodes", "connections"), prepare_clusters, compute_clusters, commit_clusters,
+        ),
+        Task(
+            "layout", ("galaxy", "nodes", "embeddings"), prepare_projection,
+            lambda job: project_galaxy(job[1]), _commit_part("projection"),
+        ),
+    ],
+    float(os.environ.get("IDLE_SECONDS", DEFAULT_IDLE_SECONDS)),
+    on_complete=_on_precomputed,
+)
+db.listeners.append(scheduler.on_change)
+
+
+def text_token_budget() -> tuple:
+    try:
+        return embedder.text_token_budget(), embedder.count_text_tokens
+    except Exception as e:
+        logger.warning(f"Token budget unavailable: {e}")
+        return None, None
+
+
+def configure_embedding_pool(workers: int, threads_per_worker: int = 1) -> dict:
+    global embedding_pool
+    if embedding_pool is not None:
+        embedding_pool.close()
+        embedding_pool = None
+    if workers > 0:
+        embedding_pool = EmbeddingPool(workers, threads_per_worker)
+        return embedding_pool.status()
+    return {"workers": 0, "threads_per_worker": 0, "alive": 0}
+
+
+def embed_texts(texts: list) -> list:
+    if not texts:
+        return []
+    if embedding_pool is not None and not embedding_pool.broken:
+        try:
+            return list(embedding_pool.encode_texts(texts))
+        except Exception as e:
+            logger.warning(f"Embedding pool failed: {e}, falling back to in-process encoding")
+    try:
+        return list(embedder.generate_text_embeddings(texts))
+    except Exception as e:
+        logger.warning(f"Embedding failed: {e}, creating nodes without embeddings")
+        return [None] * len(texts)
+
+
+def embed_images(paths: list) -> list:
+    if not paths:
+        return []
+    if embedding_pool is not None and not embedding_pool.broken:
+        try:
+            return list(embedding_pool.encode_images(paths))
+        except Exception as e:
+            logger.warning(f"Embedding pool failed: {e}, falling back to in-process encoding")
+    return [embedder.generate_image_embedding(p) for p in paths]
+
+
+def embed_clip_texts(texts: list) -> list:
+    if not texts:
+        return []
+    if embedding_pool is not None and not embedding_pool.broken:
+        try:
+            return list(embedding_pool.encode_clip_texts(texts))
+        except Exception as e:
+            logger.warning(f"Embedding pool failed: {e}, falling back to in-process encoding")
+    try:
+        return list(embedder.generate_clip_text_embeddings(texts))
+    except Exception as e:
+        logger.warning(f"CLIP text embedding failed: {e}, skipping cross-modal links")
+        return [None] * len(texts)
+
+
+def cross_modal_embeddings(galaxy_id: int, texts: list) -> list:
+    if texts and db.has_embedding_model(galaxy_id, CLIP_MODEL):
+        return embed_clip_texts(texts)
+    return [None] * len(texts)
+
+
+def store_clip_embeddings(galaxy_id: int, pairs: list):
+    rows = [(quantize.encode(vector, CROSS_EMBEDDING_CODEC), node_id) for node_id, vector in pairs]
+    db.set_clip_embeddings(galaxy_id, rows)
+    for blob, node_id in rows:
+        vector_index.add(galaxy_id, node_id, blob, CLIP_TEXT_SPACE)
+
+    galaxy = db.get_galaxy(galaxy_id)
+    settings = serialize_galaxy(galaxy)["settings"] if galaxy else {}
+    policy = linking.cross_modal_policy(linking.make_policy(options=settings.get("connection_policy")))
+    to_create = []
+    to_evict = {}
+    for node_id, vector in pairs:
+        created, evicted = _plan_node_edges(galaxy_id, node_id, vector, CLIP_MODEL, policy)
+        to_create.extend(created)
+        to_evict.update((e["id"], e) for e in evicted)
+    db.apply_connection_diff(to_create, list(to_evict))
+    try:
+        add_connections_to_clusters(galaxy_id, list(to_evict.values()), sign=-1)
+        add_connections_to_clusters(galaxy_id, [
+            {"source_id": src, "target_id": tgt, "strength": strength} for src, tgt, strength in to_create
+        ])
+    except Exception as e:
+        logger.warning(f"Cluster edge update failed: {e}")
+
+
+def ingest_text_chunks(galaxy_id: int, chunks, metadata: dict, options: dict, total_chars: int = 0) -> tuple:
+    created = []
+    duplicates = 0
+    batch = []
+    processed = 0
+    consumed = 0
+    for chunk in chunks:
+        batch.append(chunk)
+        consumed += len(chunk)
+        if len(batch) >= INGEST_BATCH_SIZE:
+            duplicates += _ingest_batch(galaxy_id, batch, metadata, options, created)
+            processed += len(batch)
+            batch = []
+            emit_progress(
+                "processFile", min(0.99, consumed / total_chars) if total_chars else 0.0,
+                f"Processed {processed} chunks",
+            )
+    if batch:
+        duplicates += _ingest_batch(galaxy_id, batch, metadata, options, created)
+    return created, duplicates
+
+
+def _ingest_batch(galaxy_id: int, chunks: list, metadata: dict, options: dict, created: list) -> int:
+    accepted = []
+    local = []
+    merges = {}
+    duplicates = 0
+    for content in chunks:
+        if options["dedup_policy"] != "keep":
+            signature = dedup.simhash(content)
+            if signature is not None:
+                match = dedup.best_match(
+                    signature, db.find_signature_candidates(galaxy_id, dedup.bands(signature)),
+                    options["dedup_max_distance"],
+                )
+                local_match = dedup.best_match(
+                    signature, [(("batch", i), dedup.to_signed(sig)) for i, sig in local],
+                    options["dedup_max_distance"],
+                )
+                if match is not None or local_match is not None:
+                    duplicates += 1
+                    if options["dedup_policy"] == "merge":
+                        key = match if match is not None else local_match
+                        merges[key] = merges.get(key, 0) + 1
+                    continue
+                local.append((len(accepted), signature))
+        accepted.append(content)
+
+    node_ids = []
+    clip_embeddings = cross_modal_embeddings(galaxy_id, accepted)
+    for content, embedding, clip_embedding in zip(accepted, embed_texts(accepted), clip_embeddings):
+        result = create_text_node(
+            galaxy_id, content, metadata, options["similarity_threshold"], options["connection_policy"], embedding,
+            clip_embedding,
+        )
+        node_ids.append(result["node_id"])
+
+    for key, count in merges.items():
+        node_id = node_ids[key[1]] if isinstance(key, tuple) else key
+        existing = db.get_node(node_id)
+        if existing:
+            merged = serialize_node(existing)["metadata"]
+            for _ in range(count):
+                merged = dedup.merge_metadata(merged, metadata.get("source"))
+            db.update_node_metadata(node_id, merged)
+
+    for node_id in node_ids:
+        node = db.get_node(node_id)
+        if node:
+            created.append(serialize_node(node))
+    return duplicates
 
 
 def handle_get_galaxies(_data: dict) -> dict:
@@ -108,11 +855,54 @@ def handle_create_galaxy(data: dict) -> dict:
 
 def handle_delete_galaxy(data: dict) -> dict:
     db.delete_galaxy(data["galaxy_id"])
+    vector_index.drop_galaxy(data["galaxy_id"])
     return {"success": True}
 
 
+def handle_export_galaxy(data: dict) -> dict:
+    galaxy_id = data["galaxy_id"]
+    file_path = data["file_path"]
+    galaxy = db.get_galaxy(galaxy_id)
+    if not galaxy:
+        raise ValueError(f"Galaxy not found: {galaxy_id}")
+    nodes = db.get_nodes(galaxy_id)
+    for node in nodes:
+        original = node.pop("embedding_original", None)
+        arr = decode_embedding(galaxy_id, node["embedding"])
+        node["embedding"] = original or (arr.astype(np.float32).tobytes() if arr is not None else None)
+    connections = db.get_connections(galaxy_id)
+    size = archive.write_archive(file_path, galaxy, nodes, connections)
+    return {"file_path": file_path, "nodes": len(nodes), "connections": len(connections), "bytes": size}
+
+
+def handle_import_galaxy(data: dict) -> dict:
+    loaded = archive.read_archive(data["file_path"])
+    nodes = loaded["nodes"]
+    edges = loaded["edges"]
+    positions = nodes["positions"].tolist()
+    node_rows = [
+        (
+            nodes["content_type"][i], nodes["content"][i], nodes["label"][i], nodes["embeddings"][i],
+            positions[i][0], positions[i][1], positions[i][2],
+            nodes["thumbnail"][i], nodes["metadata"][i] or "{}", nodes["created_at"][i] or None,
+        )
+        for i in range(loaded["node_count"])
+    ]
+    edge_rows = zip(
+        edges["source"].tolist(), edges["target"].tolist(), edges["strength"].tolist(), edges["connection_type"]
+    )
+    name = data.get("name") or loaded["galaxy"].get("name") or "Imported Galaxy"
+    settings = loaded["galaxy"].get("settings") or "{}"
+    galaxy_id, _node_ids = db.import_galaxy(name, settings, node_rows, edge_rows)
+    backfill_embedding_spaces()
+    codec = space_codec(galaxy_settings(galaxy_id))
+    if codec != "float32":
+        migrate_embedding_storage(galaxy_id, codec)
+    return {"galaxy_id": galaxy_id, "nodes": loaded["node_count"], "connections": loaded["edge_count"]}
+
+
 def handle_get_nodes(data: dict) -> dict:
-    nodes = db.get_nodes(data["galaxy_id"])
+    nodes = db.get_nodes(data["galaxy_id"], NODE_PUBLIC_COLUMNS)
     return {"nodes": [serialize_node(n) for n in nodes]}
 
 
@@ -122,23 +912,35 @@ def handle_get_connections(data: dict) -> dict:
 
 
 def handle_create_text_node(data: dict) -> dict:
-    galaxy_id = data["galaxy_id"]
     content = data["content"]
-    metadata = data.get("metadata", {})
-    threshold = data.get("similarity_threshold", 0.5)
-
     try:
         embedding = embedder.generate_text_embedding(content)
-        emb_bytes = embedding.tobytes()
     except Exception as e:
         logger.warning(f"Embedding failed: {e}, creating node without embedding")
         embedding = None
-        emb_bytes = None
+    clip_embedding = cross_modal_embeddings(data["galaxy_id"], [content])[0] if embedding is not None else None
+    return create_text_node(
+        data["galaxy_id"],
+        content,
+        data.get("metadata", {}),
+        data.get("similarity_threshold", 0.5),
+        data.get("connection_policy"),
+        embedding,
+        clip_embedding,
+    )
+
+
+def create_text_node(
+    galaxy_id: int, content: str, metadata: dict, threshold: float, policy_options: Optional[dict],
+    embedding: Optional[np.ndarray], clip_embedding: Optional[np.ndarray] = None,
+) -> dict:
+    emb_bytes, emb_original = encode_embedding(galaxy_id, embedding, TEXT_MODEL)
+    clip_bytes = quantize.encode(clip_embedding, CROSS_EMBEDDING_CODEC) if clip_embedding is not None else None
 
     pos = (0.0, 0.0, 0.0)
     if embedding is not None:
         try:
-            pos = get_initial_position(galaxy_id, embedding)
+            pos = get_initial_position(galaxy_id, embedding, TEXT_MODEL)
         except Exception as e:
             logger.warning(f"Position computation failed: {e}")
 
@@ -153,100 +955,126 @@ def handle_create_text_node(data: dict) -> dict:
         position_y=pos[1],
         position_z=pos[2],
         metadata=metadata,
+        embedding_model=TEXT_MODEL if embedding is not None else None,
+        embedding_dim=embedding.shape[0] if embedding is not None else None,
+        clip_embedding=clip_bytes,
+        embedding_original=emb_original,
     )
+    record_signature(galaxy_id, node_id, content)
+    vector_index.add(galaxy_id, node_id, emb_bytes, TEXT_MODEL)
+    vector_index.add(galaxy_id, node_id, clip_bytes, CLIP_TEXT_SPACE)
 
+    evicted = []
     if embedding is not None:
         try:
-            create_connections_for_node(galaxy_id, node_id, embedding, threshold)
+            evicted = create_connections_for_node(
+                galaxy_id, node_id, embedding, threshold, policy_options, TEXT_MODEL, clip_embedding
+            )
         except Exception as e:
             logger.warning(f"Connection creation failed: {e}")
 
+    try:
+        add_connections_to_clusters(galaxy_id, evicted, sign=-1)
+        update_clusters_for_node(galaxy_id, node_id, embedding, pos)
+    except Exception as e:
+        logger.warning(f"Cluster update failed: {e}")
+
     return {"node_id": node_id, "position": list(pos)}
 
 
+def create_image_node(
+    galaxy_id: int, file_path: str, embedding: np.ndarray, threshold: float, policy_options: Optional[dict]
+) -> Optional[dict]:
+    thumbnail = embedder.generate_thumbnail(file_path)
+    emb_bytes, emb_original = encode_embedding(galaxy_id, embedding, CLIP_MODEL)
+    pos = get_initial_position(galaxy_id, embedding, CLIP_MODEL)
+    fname = os.path.basename(file_path)
+    node_id = db.create_node(
+        galaxy_id=galaxy_id,
+        content_type="image",
+        content=file_path,
+        label=fname,
+        embedding=emb_bytes,
+        position_x=pos[0],
+        position_y=pos[1],
+        position_z=pos[2],
+        thumbnail=thumbnail,
+        metadata={"filename": fname},
+        embedding_model=CLIP_MODEL,
+        embedding_dim=embedding.shape[0],
+        embedding_original=emb_original,
+    )
+    vector_index.add(galaxy_id, node_id, emb_bytes, CLIP_MODEL)
+    evicted = create_connections_for_node(galaxy_id, node_id, embedding, threshold, policy_options, CLIP_MODEL)
+    try:
+        add_connections_to_clusters(galaxy_id, evicted, sign=-1)
+        update_clusters_for_node(galaxy_id, node_id, embedding, pos)
+    except Exception as e:
+        logger.warning(f"Cluster update failed: {e}")
+    node = db.get_node(node_id)
+    return serialize_node(node) if node else None
+
+
 def handle_process_file(data: dict) -> dict:
     galaxy_id = data["galaxy_id"]
     file_path = data["file_path"]
     content_type = data.get("content_type") or fp.detect_content_type(file_path)
     threshold = data.get("similarity_threshold", 0.5)
+    policy_options = data.get("connection_policy")
+    ingest_options = {
+        "similarity_threshold": threshold,
+        "connection_policy": policy_options,
+        "dedup_policy": dedup.make_policy(data.get("dedup_policy")),
+        "dedup_max_distance": dedup.make_max_distance(data.get("dedup_max_distance")),
+    }
 
     if not content_type:
         raise ValueError(f"Unknown file type: {file_path}")
 
     created_nodes = []
     created_connections = []
+    duplicates = 0
+    if content_type in ("text", "pdf", "audio") and ingest_options["dedup_policy"] != "keep":
+        ensure_signatures(galaxy_id)
 
     if content_type == "text":
-        try:
-            with open(file_path, "r", encoding="utf-8", errors="replace") as f:
-                text = f.read()
-        except Exception as e:
-            raise ValueError(f"Cannot read file: {e}")
-        chunks = fp.split_text(text)
+        token_budget, count_tokens = text_token_budget()
+        chunks = fp.iter_file_chunks(file_path, token_budget=token_budget, count_tokens=count_tokens)
         fname = os.path.basename(file_path)
-        for chunk in chunks:
-            result = handle_create_text_node({
-                "galaxy_id": galaxy_id,
-                "content": chunk,
-                "metadata": {"source": fname},
-                "similarity_threshold": threshold,
-            })
-            node = db.get_node(result["node_id"])
-            if node:
-                created_nodes.append(serialize_node(node))
+        created_nodes, duplicates = ingest_text_chunks(
+            galaxy_id, chunks, {"source": fname}, ingest_options, os.path.getsize(file_path)
+        )
 
     elif content_type == "image":
         try:
-            embedding = embedder.generate_image_embedding(file_path)
-            thumbnail = embedder.generate_thumbnail(file_path)
-            emb_bytes = embedding.tobytes()
-            pos = get_initial_position(galaxy_id, embedding)
-            fname = os.path.basename(file_path)
-            node_id = db.create_node(
-                galaxy_id=galaxy_id,
-                content_type="image",
-                content=file_path,
-                label=fname,
-                embedding=emb_bytes,
-                position_x=pos[0],
-                position_y=pos[1],
-                position_z=pos[2],
-                thumbnail=thumbnail,
-                metadata={"filename": fname},
-            )
-            create_connections_for_node(galaxy_id, node_id, embedding, threshold)
-            node = db.get_node(node_id)
+            embedding = embed_images([file_path])[0]
+            node = create_image_node(galaxy_id, file_path, embedding, threshold, policy_options)
             if node:
-                created_nodes.append(serialize_node(node))
+                created_nodes.append(node)
         except Exception as e:
             raise ValueError(f"Image processing failed: {e}")
 
     elif content_type == "pdf":
         text = fp.extract_text_from_pdf(file_path)
-        chunks = fp.split_text(text) if text else []
+        token_budget, count_tokens = text_token_budget() if text else (None, None)
+        chunks = fp.iter_text_chunks([text], token_budget=token_budget, count_tokens=count_tokens) if text else []
         fname = os.path.basename(file_path)
-        for chunk in chunks:
-            result = handle_create_text_node({
-                "galaxy_id": galaxy_id,
-                "content": chunk,
-                "metadata": {"source": fname, "type": "pdf_text"},
-                "similarity_threshold": threshold,
-            })
-            node = db.get_node(result["node_id"])
-            if node:
-                created_nodes.append(serialize_node(node))
+        created_nodes, duplicates = ingest_text_chunks(
+            galaxy_id, chunks, {"source": fname, "type": "pdf_text"}, ingest_options, len(text or "")
+        )
 
         with tempfile.TemporaryDirectory() as tmpdir:
             image_paths = fp.extract_images_from_pdf(file_path, tmpdir)
-            for img_path in image_paths:
+            try:
+                image_embeddings = embed_images(image_paths)
+            except Exception as e:
+                logger.warning(f"PDF image embedding failed: {e}")
+                image_embeddings = []
+            for img_path, embedding in zip(image_paths, image_embeddings):
                 try:
-                    result = handle_process_file({
-                        "galaxy_id": galaxy_id,
-                        "file_path": img_path,
-                        "content_type": "image",
-                        "similarity_threshold": threshold,
-                    })
-                    created_nodes.extend(result.get("nodes", []))
+                    node = create_image_node(galaxy_id, img_path, embedding, threshold, policy_options)
+                    if node:
+                        created_nodes.append(node)
                 except Exception as e:
                     logger.warning(f"PDF image processing failed: {e}")
 
@@ -254,26 +1082,24 @@ def handle_process_file(data: dict) -> dict:
         try:
             text, duration = fp.transcribe_audio(file_path)
             fname = os.path.basename(file_path)
-            result = handle_create_text_node({
-                "galaxy_id": galaxy_id,
-                "content": text if text else f"[Audio: {fname}]",
-                "metadata": {"source": fname, "type": "audio_transcript", "duration": duration},
-                "similarity_threshold": threshold,
-            })
-            node = db.get_node(result["node_id"])
-            if node:
-                created_nodes.append(serialize_node(node))
+            created_nodes, duplicates = ingest_text_chunks(
+                galaxy_id,
+                [text if text else f"[Audio: {fname}]"],
+                {"source": fname, "type": "audio_transcript", "duration": duration},
+                ingest_options,
+            )
         except Exception as e:
             raise ValueError(f"Audio processing failed: {e}")
 
     connections = db.get_connections(galaxy_id)
     created_connections = [dict(c) for c in connections]
 
-    return {"nodes": created_nodes, "connections": created_connections}
+    return {"nodes": created_nodes, "connections": created_connections, "duplicates": duplicates}
 
 
 def handle_delete_node(data: dict) -> dict:
     db.delete_node(data["node_id"])
+    vector_index.remove([data["node_id"]])
     return {"success": True}
 
 
@@ -287,58 +1113,549 @@ def handle_update_node_position(data: dict) -> dict:
     return {"success": True}
 
 
+def handle_delete_nodes(data: dict) -> dict:
+    node_ids = data.get("node_ids", [])
+    deleted = db.delete_nodes(node_ids)
+    vector_index.remove(node_ids)
+    return {"success": True, "deleted": deleted}
+
+
+def handle_update_node_labels(data: dict) -> dict:
+    labels = [(item["label"], item["node_id"]) for item in data.get("labels", [])]
+    db.update_node_labels(labels)
+    return {"success": True, "updated": len(labels)}
+
+
+def handle_update_node_positions(data: dict) -> dict:
+    positions = [
+        (float(item["x"]), float(item["y"]), float(item["z"]), item["node_id"])
+        for item in data.get("positions", [])
+    ]
+    db.update_node_positions_bulk(positions)
+    return {"success": True, "updated": len(positions)}
+
+
 def handle_recompute_layout(data: dict) -> dict:
     galaxy_id = data["galaxy_id"]
-    params = data.get("params", {})
-    emb_rows = db.get_embeddings(galaxy_id)
+    params = data.get("params") or {}
+    if params:
+        projection = project_galaxy(_projection_inputs(working_set.get(galaxy_id, "embeddings")), params)
+    else:
+        scheduler.wait_for(galaxy_id, "layout")
+        projection = working_set.get(galaxy_id, "projection")
+
+    if projection is not None:
+        positions = projection["positions"]
+        bulk_updates = [
+            (float(x), float(y), float(z), nid)
+            for (x, y, z), nid in zip(positions.tolist(), projection["ids"].tolist())
+        ]
+        db.update_node_positions_bulk(bulk_updates)
+
+    nodes = db.get_nodes(galaxy_id, NODE_PUBLIC_COLUMNS)
+    return {"nodes": [serialize_node(n) for n in nodes]}
 
-    if len(emb_rows) < 2:
-        nodes = db.get_nodes(galaxy_id)
-        return {"nodes": [serialize_node(n) for n in nodes]}
 
-    valid_rows = []
-    embeddings_list = []
-    for row in emb_rows:
-        arr = embedder.bytes_to_array(row["embedding"])
-        if arr is not None:
-            valid_rows.append(row)
-            embeddings_list.append(arr)
+def handle_recompute_connections(data: dict) -> dict:
+    galaxy_id = data["galaxy_id"]
+    policy = linking.make_policy(data.get("similarity_threshold", 0.5), data.get("connection_policy"))
+    budget = data.get("memory_budget_mb", linking.DEFAULT_MEMORY_BUDGET_MB)
+
+    groups = working_set.get(galaxy_id, "embeddings")
+    legs = [(groups[space], None, policy) for space in primary_spaces(groups)]
+    if CLIP_TEXT_SPACE in groups and CLIP_MODEL in groups:
+        legs.append((groups[CLIP_TEXT_SPACE], groups[CLIP_MODEL], linking.cross_modal_policy(policy)))
+    total = sum(len(left[0]) for left, _right, _policy in legs) or 1
+    done = 0
+    new_edges = {}
+    for (ids, matrix), right, leg_policy in legs:
+        offset = done
+
+        def progress(rows_done, _rows_total, offset=offset):
+            emit_progress(
+                "recomputeConnections",
+                (offset + rows_done) / total,
+                f"Compared {offset + rows_done} of {total} nodes",
+            )
 
-    if len(embeddings_list) < 2:
-        nodes = db.get_nodes(galaxy_id)
-        return {"nodes": [serialize_node(n) for n in nodes]}
+        id_arr = np.asarray(ids, dtype=np.int64)
+        if right is None:
+            src, tgt, val = linking.blocked_edges(matrix, leg_policy, budget, progress)
+            tgt_arr = id_arr
+        else:
+            src, tgt, val = linking.blocked_cross_edges(matrix, right[1], leg_policy, budget, progress)
+            tgt_arr = np.asarray(right[0], dtype=np.int64)
+        for a, b, v in zip(id_arr[src].tolist(), tgt_arr[tgt].tolist(), val.tolist()):
+            new_edges[(min(a, b), max(a, b))] = v
+        done += len(ids)
+
+    existing = {}
+    duplicates = []
+    manual = set()
+    for conn in adjacency_rows(working_set.get(galaxy_id, "adjacency")):
+        key = (min(conn["source_id"], conn["target_id"]), max(conn["source_id"], conn["target_id"]))
+        if conn["connection_type"] != "semantic":
+            manual.add(key)
+        elif key in existing:
+            duplicates.append(conn["id"])
+        else:
+            existing[key] = conn
+
+    created = [(a, b, v) for (a, b), v in new_edges.items() if (a, b) not in existing and (a, b) not in manual]
+    deleted = [conn["id"] for key, conn in existing.items() if key not in new_edges] + duplicates
+    updated = [
+        (new_edges[key], conn["id"])
+        for key, conn in existing.items()
+        if key in new_edges and abs(new_edges[key] - conn["strength"]) > 1e-6
+    ]
+    db.apply_connection_diff(created, deleted, updated)
+    db.clear_cluster_hierarchy(galaxy_id)
+    emit_progress("recomputeConnections", 1.0, "Connections rebuilt")
+
+    return {
+        "created": len(created),
+        "deleted": len(deleted),
+        "updated": len(updated),
+        "total": len(new_edges),
+    }
+
+
+def _layout_inputs(galaxy_id: int) -> tuple:
+    nodes = working_set.get(galaxy_id, "nodes")
+    adjacency = working_set.get(galaxy_id, "adjacency")
+    index = nodes["index"]
+    count = adjacency["ids"].size
+    src = np.fromiter((index.get(n, -1) for n in adjacency["source"].tolist()), dtype=np.int64, count=count)
+    tgt = np.fromiter((index.get(n, -1) for n in adjacency["target"].tolist()), dtype=np.int64, count=count)
+    valid = (src >= 0) & (tgt >= 0)
+    return (
+        nodes["ids"].tolist(),
+        nodes["positions"].copy(),
+        src[valid],
+        tgt[valid],
+        adjacency["strength"][valid],
+    )
+
+
+def _run_layout(job_id: str, galaxy_id: int, inputs: tuple, iterations: int, params: dict,
+                pinned: list, stream_every: int, stop: threading.Event) -> list:
+    ids, positions, src, tgt, strength = inputs
+    index = {nid: i for i, nid in enumerate(ids)}
+    pinned_idx = np.array([index[nid] for nid in pinned if nid in index], dtype=np.int64)
 
-    embeddings = np.stack(embeddings_list)
-    positions = proj.project_embeddings(embeddings, params)
+    def on_step(step, pos, energy):
+        if job_id and stream_every and (step % stream_every == 0 or step == iterations):
+            emit_event("layoutFrame", {
+                "job_id": job_id,
+                "galaxy_id": galaxy_id,
+                "iteration": step,
+                "energy": energy,
+                "node_ids": ids,
+                "positions": pos.astype(np.float32).ravel().tolist(),
+            })
+        elif job_id and step % max(1, iterations // 20) == 0:
+            emit_progress("settleLayout", step / iterations, f"Iteration {step} of {iterations}")
 
-    bulk_updates = [
-        (float(positions[i][0]), float(positions[i][1]), float(positions[i][2]), valid_rows[i]["id"])
-        for i in range(len(valid_rows))
+    settled = layout.settle(
+        positions, src, tgt, strength, iterations, params,
+        pinned=pinned_idx, on_step=on_step, should_stop=stop.is_set,
+    )
+    updates = [
+        (float(settled[i][0]), float(settled[i][1]), float(settled[i][2]), nid)
+        for i, nid in enumerate(ids)
     ]
-    db.update_node_positions_bulk(bulk_updates)
+    if not stop.is_set():
+        with _backend_lock:
+            db.update_node_positions_bulk(updates)
+    return updates
+
+
+def _layout_worker(job_id: str, galaxy_id: int, *args):
+    stop = _layout_jobs[job_id]
+    try:
+        _run_layout(job_id, galaxy_id, *args, stop)
+        emit_event("layoutSettled", {"job_id": job_id, "galaxy_id": galaxy_id, "cancelled": stop.is_set()})
+    except Exception as e:
+        logger.exception(f"Layout job {job_id} failed: {e}")
+        emit_event("layoutSettled", {"job_id": job_id, "galaxy_id": galaxy_id, "error": str(e)})
+    finally:
+        _layout_jobs.pop(job_id, None)
+
+
+def handle_settle_layout(data: dict) -> dict:
+    galaxy_id = data["galaxy_id"]
+    iterations = int(data.get("iterations", 300))
+    params = data.get("params", {})
+    pinned = data.get("pinned", [])
+    stream_every = int(data.get("stream_every", 0))
+    inputs = _layout_inputs(galaxy_id)
+
+    if not data.get("background", True):
+        _run_layout(None, galaxy_id, inputs, iterations, params, pinned, 0, threading.Event())
+        nodes = db.get_nodes(galaxy_id, NODE_PUBLIC_COLUMNS)
+        return {"nodes": [serialize_node(n) for n in nodes]}
+
+    for job_id, stop in list(_layout_jobs.items()):
+        if job_id.startswith(f"{galaxy_id}-"):
+            stop.set()
+    job_id = f"{galaxy_id}-{os.urandom(4).hex()}"
+    _layout_jobs[job_id] = threading.Event()
+    threading.Thread(
+        target=_layout_worker,
+        args=(job_id, galaxy_id, inputs, iterations, params, pinned, stream_every),
+        daemon=True,
+    ).start()
+    return {"job_id": job_id}
 
-    nodes = db.get_nodes(galaxy_id)
-    return {"nodes": [serialize_node(n) for n in nodes]}
+
+def handle_cancel_layout(data: dict) -> dict:
+    stop = _layout_jobs.get(data["job_id"])
+    if stop:
+        stop.set()
+    return {"success": stop is not None}
 
 
 def handle_create_manual_connection(data: dict) -> dict:
     conn_id = db.create_connection(data["source_id"], data["target_id"], 0.8, "manual")
+    if conn_id:
+        source = db.get_node(data["source_id"])
+        if source:
+            try:
+                add_connections_to_clusters(source["galaxy_id"], [
+                    {"source_id": data["source_id"], "target_id": data["target_id"], "strength": 0.8}
+                ])
+            except Exception as e:
+                logger.warning(f"Cluster edge update failed: {e}")
     return {"connection_id": conn_id}
 
 
 def handle_delete_connection(data: dict) -> dict:
-    db.delete_connection(data["connection_id"])
+    conn = db.delete_connection(data["connection_id"])
+    if conn and conn["galaxy_id"] is not None:
+        try:
+            add_connections_to_clusters(conn["galaxy_id"], [conn], sign=-1)
+        except Exception as e:
+            logger.warning(f"Cluster edge update failed: {e}")
     return {"success": True}
 
 
 def handle_detect_communities(data: dict) -> dict:
     galaxy_id = data["galaxy_id"]
-    nodes = db.get_nodes(galaxy_id)
-    connections = db.get_connections(galaxy_id)
-    communities = comm.detect_communities(nodes, connections)
+    scheduler.wait_for(galaxy_id, "communities")
+    communities = working_set.get(galaxy_id, "communities")
+    if db.get_cluster_level_count(galaxy_id) == 0:
+        try:
+            build_cluster_hierarchy(galaxy_id, communities)
+        except Exception as e:
+            logger.warning(f"Cluster hierarchy rebuild failed: {e}")
     return {"communities": communities}
 
 
+def handle_get_cluster_level(data: dict) -> dict:
+    galaxy_id = data["galaxy_id"]
+    level_count = db.get_cluster_level_count(galaxy_id)
+    if level_count == 0:
+        level_count = build_cluster_hierarchy(galaxy_id)
+    if level_count == 0:
+        return {"level": 0, "levels": 0, "clusters": [], "edges": []}
+
+    level = max(1, min(int(data.get("level", 1)), level_count))
+    clusters = db.get_clusters(galaxy_id, level)
+    edges = db.get_cluster_edges(galaxy_id, level)
+    return {
+        "level": level,
+        "levels": level_count,
+        "clusters": [serialize_cluster(c) for c in clusters],
+        "edges": edges,
+    }
+
+
+def _galaxy_scope(galaxy_ids: Optional[list]) -> list:
+    known = [g["id"] for g in db.get_all_galaxies()]
+    if galaxy_ids is None:
+        return known
+    wanted = set(galaxy_ids)
+    return [gid for gid in known if gid in wanted]
+
+
+def _describe_hits(hits: list, node_key: str) -> list:
+    nodes = {
+        n["id"]: n for n in db.get_nodes_by_ids(
+            [h[node_key] for h in hits], ("id", "galaxy_id", "content_type", "label", "content")
+        )
+    }
+    names = {g["id"]: g["name"] for g in db.get_all_galaxies()}
+    described = []
+    for hit in hits:
+        node = nodes.get(hit[node_key])
+        if node is None:
+            continue
+        entry = dict(hit)
+        entry["label"] = node["label"] or (node["content"] or "")[:40]
+        entry["content_type"] = node["content_type"]
+        entry["galaxy_name"] = names.get(node["galaxy_id"], "")
+        described.append(entry)
+    return described
+
+
+def handle_search_all(data: dict) -> dict:
+    query = data["query"]
+    k = int(data.get("k", 10))
+    galaxy_ids = _galaxy_scope(data.get("galaxy_ids"))
+    embedding = embedder.generate_text_embedding(query)
+    hits = vector_index.search(embedding, k, galaxy_ids, TEXT_MODEL, int(data.get("rerank", 0)))
+    return {"results": _describe_hits(hits, "node_id")}
+
+
+def handle_search_hybrid(data: dict) -> dict:
+    query = data["query"]
+    k = int(data.get("k", 20))
+    depth = max(k, int(data.get("candidates", 100)))
+    rrf_k = float(data.get("rrf_k", RRF_K))
+    weights = {"lexical": 1.0, "semantic": 1.0}
+    weights.update(data.get("weights") or {})
+    scope = data.get("galaxy_ids")
+    if scope is None and data.get("galaxy_id") is not None:
+        scope = [data["galaxy_id"]]
+    galaxy_ids = _galaxy_scope(scope)
+
+    fused = {}
+
+    def entry_for(node_id: int, galaxy_id: int) -> dict:
+        return fused.setdefault(node_id, {"node_id": node_id, "galaxy_id": galaxy_id, "score": 0.0})
+
+    match = fts_match(query, data.get("require_all", False))
+    if match and weights["lexical"] > 0:
+        rows = db.search_text(match, galaxy_ids if scope is not None else None, depth)
+        for rank, row in enumerate(rows, start=1):
+            entry = entry_for(row["node_id"], row["galaxy_id"])
+            entry["score"] += weights["lexical"] / (rrf_k + rank)
+            entry["lexical_rank"] = rank
+            entry["bm25"] = -row["bm25"]
+            entry["snippet"] = row["snippet"]
+
+    if weights["semantic"] > 0:
+        try:
+            embedding = embedder.generate_text_embedding(query)
+            hits = vector_index.search(embedding, depth, galaxy_ids, TEXT_MODEL, int(data.get("rerank", 0)))
+        except Exception as e:
+            logger.warning(f"Semantic leg of hybrid search failed: {e}")
+            hits = []
+        for rank, hit in enumerate(hits, start=1):
+            entry = entry_for(hit["node_id"], hit["galaxy_id"])
+            entry["score"] += weights["semantic"] / (rrf_k + rank)
+            entry["semantic_rank"] = rank
+            entry["similarity"] = hit["score"]
+
+    ranked = sorted(fused.values(), key=lambda e: -e["score"])[:k]
+    return {"results": _describe_hits(ranked, "node_id")}
+
+
+def _link_worker(job_id: str, loaded: dict, sources: list, targets: list, k: int, threshold: float):
+    stop = _link_jobs[job_id]
+    total = 0
+    try:
+        for i, galaxy_id in enumerate(sources):
+            if stop.is_set():
+                break
+            suggestions = vector_index.cross_links(
+                loaded, galaxy_id, targets, k, threshold, should_stop=stop.is_set, skip_spaces=(CLIP_TEXT_SPACE,)
+            )
+            if stop.is_set():
+                break
+            with _backend_lock:
+                if db.get_galaxy(galaxy_id):
+                    ends = [node_id for s in suggestions for node_id in s[:2]]
+                    alive = {n["id"] for n in db.get_nodes_by_ids(ends, ("id",))}
+                    suggestions = [s for s in suggestions if s[0] in alive and s[1] in alive]
+                    db.replace_link_suggestions(galaxy_id, suggestions)
+            total += len(suggestions)
+            emit_progress("suggestCrossGalaxyLinks", (i + 1) / len(sources), f"Galaxy {i + 1} of {len(sources)}")
+        emit_event("crossLinksReady", {
+            "job_id": job_id, "galaxy_ids": sources, "suggestions": total, "cancelled": stop.is_set(),
+        })
+    except Exception as e:
+        logger.exception(f"Cross-galaxy link job {job_id} failed: {e}")
+        emit_event("crossLinksReady", {"job_id": job_id, "galaxy_ids": sources, "error": str(e)})
+    finally:
+        _link_jobs.pop(job_id, None)
+
+
+def handle_suggest_cross_galaxy_links(data: dict) -> dict:
+    targets = _galaxy_scope(data.get("galaxy_ids"))
+    sources = _galaxy_scope([data["galaxy_id"]]) if data.get("galaxy_id") is not None else targets
+    k = max(1, int(data.get("k", 5)))
+    threshold = float(data.get("threshold", 0.6))
+    loaded = vector_index.load(set(sources) | set(targets))
+
+    for stop in _link_jobs.values():
+        stop.set()
+    job_id = os.urandom(4).hex()
+    _link_jobs[job_id] = threading.Event()
+    threading.Thread(
+        target=_link_worker, args=(job_id, loaded, sources, targets, k, threshold), daemon=True
+    ).start()
+    return {"job_id": job_id}
+
+
+def handle_cancel_cross_galaxy_links(data: dict) -> dict:
+    stop = _link_jobs.get(data["job_id"])
+    if stop:
+        stop.set()
+    return {"success": stop is not None}
+
+
+def handle_get_cross_galaxy_links(data: dict) -> dict:
+    rows = db.get_link_suggestions(data["galaxy_id"], int(data.get("limit", 200)))
+    return {"links": _describe_hits(rows, "target_id")}
+
+
+def migrate_embedding_storage(galaxy_id: int, codec: str, keep_originals: Optional[bool] = None) -> dict:
+    galaxy = db.get_galaxy(galaxy_id)
+    if not galaxy:
+        raise ValueError(f"Galaxy not found: {galaxy_id}")
+    settings = serialize_galaxy(galaxy)["settings"]
+    if keep_originals is None:
+        keep_originals = bool(settings.get("keep_originals"))
+    before = db.get_embedding_storage(galaxy_id)
+    stored = {row["id"]: quantize.blob_info(row["embedding"])[0] for row in db.get_embeddings(galaxy_id)}
+    old_books = db.get_codebooks(galaxy_id)
+    rows = []
+    codebooks = {}
+    codecs = {}
+    groups = galaxy_embeddings(galaxy_id)
+    for space in primary_spaces(groups):
+        ids, matrix = groups[space]
+        dim = matrix.shape[1]
+        originals = db.get_embedding_originals(ids)
+        source = matrix.copy()
+        exact = np.zeros(len(ids), dtype=bool)
+        for i, node_id in enumerate(ids):
+            original = originals.get(node_id)
+            if original is not None and len(original) == dim * 4:
+                source[i] = np.frombuffer(original, dtype=np.float32)
+                exact[i] = True
+            elif stored[node_id] == "float32":
+                exact[i] = True
+        lossy = sorted({stored[node_id] for node_id, ok in zip(ids, exact) if not ok})
+        if any(c != codec for c in lossy) and codec != "float32":
+            raise ValueError(
+                f"{space} embeddings in galaxy {galaxy_id} are stored as {', '.join(lossy)} without float32 "
+                f"originals; converting them to {codec} would compound the quantisation error"
+            )
+
+        dim_codec = codec
+        codebook = None
+        if codec == "pq":
+            if dim in old_books and not exact.all():
+                codebook = quantize.codebook_from_bytes(old_books[dim])
+                codebooks[dim] = old_books[dim]
+            elif exact.sum() >= PQ_MIN_TRAIN and dim % quantize.PQ_SUBVECTOR_DIM == 0:
+                codebook = quantize.train_pq(source[exact])
+                codebooks[dim] = quantize.codebook_to_bytes(codebook)
+            else:
+                dim_codec = "int8"
+        codecs[space] = dim_codec
+
+        rewrite = exact if codec != "float32" else np.ones(len(ids), dtype=bool)
+        keep = keep_originals and dim_codec != "float32"
+        if rewrite.any():
+            blobs = quantize.encode_matrix(source[rewrite], dim_codec, codebook)
+            for blob, vector, node_id in zip(blobs, source[rewrite], np.asarray(ids)[rewrite].tolist()):
+                rows.append((blob, vector.tobytes() if keep else None, node_id))
+        if not rewrite.all():
+            logger.info(f"Galaxy {galaxy_id}: kept {int((~exact).sum())} {space} embeddings already stored as {codec}")
+
+    settings["embedding_codec"] = codec
+    settings["embedding_codecs"] = codecs
+    settings["keep_originals"] = keep_originals
+    db.rewrite_embeddings(galaxy_id, rows, codebooks, json.dumps(settings))
+    _codebooks.pop(galaxy_id, None)
+    vector_index.drop_galaxy(galaxy_id)
+    after = db.get_embedding_storage(galaxy_id)
+    return {
+        "codec": codec,
+        "codecs": codecs,
+        "nodes": after["nodes"],
+        "bytes_before": before["bytes"] + before["original_bytes"],
+        "bytes_after": after["bytes"] + after["original_bytes"],
+        "original_bytes": after["original_bytes"],
+    }
+
+
+def handle_set_embedding_storage(data: dict) -> dict:
+    codec = quantize.make_codec(data.get("codec"))
+    result = migrate_embedding_storage(data["galaxy_id"], codec, data.get("keep_originals"))
+    if data.get("vacuum", True):
+        db.vacuum()
+    return result
+
+
+def handle_get_embedding_storage(data: dict) -> dict:
+    galaxy_id = data["galaxy_id"]
+    settings = galaxy_settings(galaxy_id)
+    storage = db.get_embedding_storage(galaxy_id)
+    storage["codec"] = space_codec(settings)
+    storage["codecs"] = settings.get("embedding_codecs") or {}
+    storage["keep_originals"] = bool(settings.get("keep_originals"))
+    return storage
+
+
+def handle_benchmark_embedding_storage(data: dict) -> dict:
+    groups = galaxy_embeddings(data["galaxy_id"])
+    spaces = primary_spaces(groups)
+    if not spaces:
+        return {"results": []}
+    space = data.get("space") if data.get("space") in spaces else max(spaces, key=lambda s: len(groups[s][0]))
+    ids, matrix = groups[space]
+    originals = load_originals(space, ids)
+    matrix = matrix.copy()
+    for i, node_id in enumerate(ids):
+        original = originals.get(node_id)
+        if original is not None and original.size == matrix.shape[1]:
+            matrix[i] = original
+    rng = np.random.default_rng(0)
+    count = min(int(data.get("queries", 100)), matrix.shape[0])
+    queries = matrix[rng.choice(matrix.shape[0], count, replace=False)]
+    results = quantize.benchmark(matrix, queries, int(data.get("k", 10)), int(data.get("rerank", 4)))
+    return {
+        "space": space,
+        "dim": matrix.shape[1],
+        "vectors": matrix.shape[0],
+        "originals": len(originals),
+        "queries": count,
+        "results": results,
+    }
+
+
+def handle_configure_working_set(data: dict) -> dict:
+    working_set.configure(float(data.get("budget_mb", DEFAULT_BUDGET_MB)))
+    return working_set.stats()
+
+
+def handle_get_working_set_stats(_data: dict) -> dict:
+    return working_set.stats()
+
+
+def handle_configure_scheduler(data: dict) -> dict:
+    scheduler.configure(data.get("enabled"), data.get("idle_seconds"))
+    return scheduler.status()
+
+
+def handle_get_scheduler_status(_data: dict) -> dict:
+    return scheduler.status()
+
+
+def handle_configure_embedding_pool(data: dict) -> dict:
+    return configure_embedding_pool(int(data.get("workers", 0)), int(data.get("threads_per_worker", 1)))
+
+
+def handle_get_embedding_pool_status(_data: dict) -> dict:
+    if embedding_pool is None:
+        return {"workers": 0, "threads_per_worker": 0, "alive": 0}
+    return embedding_pool.status()
+
+
 def handle_get_model_status(_data: dict) -> dict:
     return embedder.check_models()
 
@@ -364,6 +1681,8 @@ HANDLERS = {
     "getGalaxies": handle_get_galaxies,
     "createGalaxy": handle_create_galaxy,
     "deleteGalaxy": handle_delete_galaxy,
+    "exportGalaxy": handle_export_galaxy,
+    "importGalaxy": handle_import_galaxy,
     "getNodes": handle_get_nodes,
     "getConnections": handle_get_connections,
     "createTextNode": handle_create_text_node,
@@ -371,10 +1690,31 @@ HANDLERS = {
     "deleteNode": handle_delete_node,
     "updateNodeLabel": handle_update_node_label,
     "updateNodePosition": handle_update_node_position,
+    "deleteNodes": handle_delete_nodes,
+    "updateNodeLabels": handle_update_node_labels,
+    "updateNodePositions": handle_update_node_positions,
     "recomputeLayout": handle_recompute_layout,
+    "recomputeConnections": handle_recompute_connections,
+    "settleLayout": handle_settle_layout,
+    "cancelLayout": handle_cancel_layout,
     "createManualConnection": handle_create_manual_connection,
     "deleteConnection": handle_delete_connection,
     "detectCommunities": handle_detect_communities,
+    "getClusterLevel": handle_get_cluster_level,
+    "searchAll": handle_search_all,
+    "searchHybrid": handle_search_hybrid,
+    "suggestCrossGalaxyLinks": handle_suggest_cross_galaxy_links,
+    "cancelCrossGalaxyLinks": handle_cancel_cross_galaxy_links,
+    "getCrossGalaxyLinks": handle_get_cross_galaxy_links,
+    "setEmbeddingStorage": handle_set_embedding_storage,
+    "getEmbeddingStorage": handle_get_embedding_storage,
+    "benchmarkEmbeddingStorage": handle_benchmark_embedding_storage,
+    "configureWorkingSet": handle_configure_working_set,
+    "getWorkingSetStats": handle_get_working_set_stats,
+    "configureScheduler": handle_configure_scheduler,
+    "getSchedulerStatus": handle_get_scheduler_status,
+    "configureEmbeddingPool": handle_configure_embedding_pool,
+    "getEmbeddingPoolStatus": handle_get_embedding_pool_status,
     "getModelStatus": handle_get_model_status,
     "downloadModels": handle_download_models,
 }
@@ -390,7 +1730,8 @@ def handle_request(request: dict) -> dict:
         return {"id": request_id, "error": f"Unknown channel: {channel}"}
 
     try:
-        result = handler(data)
+        with scheduler.foreground(), _backend_lock:
+            result = handler(data)
         return {"id": request_id, "result": result}
     except Exception as e:
         logger.exception(f"Handler error for {channel}: {e}")
@@ -399,6 +1740,18 @@ def handle_request(request: dict) -> dict:
 
 def main():
     logger.info("Semantic Galaxy Forge backend starting")
+    labelled = backfill_embedding_spaces()
+    if labelled:
+        logger.info(f"Recorded embedding model for {labelled} existing nodes")
+    workers = int(os.environ.get("EMBED_WORKERS", "0"))
+    if workers > 0:
+        try:
+            configure_embedding_pool(workers, int(os.environ.get("EMBED_THREADS_PER_WORKER", "1")))
+        except Exception as e:
+            logger.error(f"Embedding pool failed to start: {e}")
+    if os.environ.get("IDLE_PRECOMPUTE", "1") != "0":
+        scheduler.mark_dirty([g["id"] for g in db.get_all_galaxies()[:SCHEDULER_WARM_GALAXIES]])
+        scheduler.start()
     for line in sys.stdin:
         line = line.strip()
         if not line:
@@ -406,14 +1759,17 @@ def main():
         try:
             request = json.loads(line)
             response = handle_request(request)
-            print(json.dumps(response), flush=True)
+            write_message(response)
         except json.JSONDecodeError as e:
             err_response = {"id": None, "error": f"JSON parse error: {e}"}
-            print(json.dumps(err_response), flush=True)
+            write_message(err_response)
         except Exception as e:
             logger.exception(f"Unexpected error: {e}")
             err_response = {"id": None, "error": str(e)}
-            print(json.dumps(err_response), flush=True)
+            write_message(err_response)
+    scheduler.close()
+    if embedding_pool is not None:
+        embedding_pool.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,255 @@
+import logging
+import struct
+import time
+import numpy as np
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("float32", "float16", "int8", "pq")
+DEFAULT_CODEC = "float32"
+PQ_SUBVECTOR_DIM = 4
+PQ_CENTROIDS = 256
+PQ_TRAIN_SAMPLES = 8192
+PQ_ITERATIONS = 10
+SCORE_BLOCK = 4096
+PQ_ASSIGN_BUDGET = 16 * 1024 * 1024
+
+MAGIC = b"SGQ"
+_HEADER = struct.Struct("<3sBHH")
+_CODEC_IDS = {"float16": 1, "int8": 2, "pq": 3}
+_CODEC_NAMES = {v: k for k, v in _CODEC_IDS.items()}
+_INT8_PREFIX = _HEADER.size + 4
+
+
+def make_codec(codec: Optional[str]) -> str:
+    codec = codec or DEFAULT_CODEC
+    if codec not in CODECS:
+        raise ValueError(f"Unknown embedding codec: {codec}")
+    return codec
+
+
+def blob_info(blob: bytes) -> tuple:
+    if len(blob) >= _HEADER.size and blob[:3] == MAGIC:
+        _magic, codec_id, dim, m = _HEADER.unpack_from(blob, 0)
+        codec = _CODEC_NAMES.get(codec_id)
+        if codec is not None:
+            return codec, dim, m
+    return "float32", len(blob) // 4, 0
+
+
+def encode(vector: np.ndarray, codec: str, codebook: Optional[np.ndarray] = None) -> bytes:
+    return encode_matrix(np.asarray(vector, dtype=np.float32).reshape(1, -1), codec, codebook)[0]
+
+
+def encode_matrix(matrix: np.ndarray, codec: str, codebook: Optional[np.ndarray] = None) -> list:
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    n, dim = matrix.shape
+    if codec == "float32":
+        return [row.tobytes() for row in matrix]
+
+    if codec == "float16":
+        header = _HEADER.pack(MAGIC, _CODEC_IDS[codec], dim, 0)
+        body = matrix.astype(np.float16)
+    elif codec == "int8":
+        header = _HEADER.pack(MAGIC, _CODEC_IDS[codec], dim, 0)
+        scale = np.abs(matrix).max(axis=1) / 127.0
+        scale = np.where(scale == 0, 1.0, scale).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scale[:, None]), -127, 127).astype(np.int8)
+        body = np.concatenate([scale[:, None].view(np.uint8), codes.view(np.uint8)], axis=1)
+    elif codec == "pq":
+        if codebook is None:
+            raise ValueError("Product quantisation needs a trained codebook")
+        header = _HEADER.pack(MAGIC, _CODEC_IDS[codec], dim, codebook.shape[0])
+        body = pq_assign(matrix, codebook)
+    else:
+        raise ValueError(f"Unknown embedding codec: {codec}")
+
+    rows = np.ascontiguousarray(body).view(np.uint8).reshape(n, -1)
+    return [header + row.tobytes() for row in rows]
+
+
+def load_codes(blobs: list) -> tuple:
+    codec, dim, m = blob_info(blobs[0])
+    n = len(blobs)
+    raw = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    if raw.size % n:
+        raise ValueError("Embedding blobs differ in length")
+    raw = raw.reshape(n, -1)
+    scales = None
+    if codec == "float32":
+        codes = raw.view(np.float32)
+    elif codec == "float16":
+        codes = np.ascontiguousarray(raw[:, _HEADER.size:]).view(np.float16)
+    elif codec == "int8":
+        scales = np.ascontiguousarray(raw[:, _HEADER.size:_INT8_PREFIX]).view(np.float32).ravel()
+        codes = np.ascontiguousarray(raw[:, _INT8_PREFIX:]).view(np.int8)
+    else:
+        codes = np.ascontiguousarray(raw[:, _HEADER.size:])
+    return codec, dim, codes, scales
+
+
+def decode_codes(
+    codec: str, codes: np.ndarray, scales: Optional[np.ndarray], codebook: Optional[np.ndarray] = None
+) -> np.ndarray:
+    if codec == "float32":
+        return np.asarray(codes, dtype=np.float32)
+    if codec == "float16":
+        return codes.astype(np.float32)
+    if codec == "int8":
+        return codes.astype(np.float32) * scales[:, None]
+    if codebook is None:
+        raise ValueError("Product-quantised embeddings need their codebook")
+    m = codebook.shape[0]
+    return codebook[np.arange(m)[None, :], codes.astype(np.int64)].reshape(codes.shape[0], -1)
+
+
+def decode(blob: bytes, codebook: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    if not blob:
+        return None
+    codec, _dim, codes, scales = load_codes([blob])
+    return decode_codes(codec, codes, scales, codebook)[0]
+
+
+def decode_blobs(blobs: list, codebook: Optional[np.ndarray] = None) -> np.ndarray:
+    codec, _dim, codes, scales = load_codes(blobs)
+    return decode_codes(codec, codes, scales, codebook)
+
+
+def scores(
+    query: np.ndarray,
+    codec: str,
+    codes: np.ndarray,
+    scales: Optional[np.ndarray],
+    codebook: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    query = np.asarray(query, dtype=np.float32)
+    n = codes.shape[0]
+    if codec == "float32":
+        return codes @ query
+    if codec == "pq":
+        m = codebook.shape[0]
+        lut = np.einsum("mkd,md->mk", codebook, query.reshape(m, -1))
+        out = np.empty(n, dtype=np.float32)
+        cols = np.arange(m)[None, :]
+        for i0 in range(0, n, SCORE_BLOCK):
+            out[i0:i0 + SCORE_BLOCK] = lut[cols, codes[i0:i0 + SCORE_BLOCK]].sum(axis=1)
+        return out
+    out = np.empty(n, dtype=np.float32)
+    for i0 in range(0, n, SCORE_BLOCK):
+        out[i0:i0 + SCORE_BLOCK] = codes[i0:i0 + SCORE_BLOCK].astype(np.float32) @ query
+    if codec == "int8" and scales is not None:
+        out *= scales
+    return out
+
+
+def rerank(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    return (vectors @ query) / np.where(norms == 0, 1.0, norms)
+
+
+def train_pq(
+    matrix: np.ndarray,
+    subvector_dim: int = PQ_SUBVECTOR_DIM,
+    centroids: int = PQ_CENTROIDS,
+    iterations: int = PQ_ITERATIONS,
+    seed: int = 0,
+) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    n, dim = matrix.shape
+    if dim % subvector_dim:
+        raise ValueError(f"Dimension {dim} is not divisible by sub-vector size {subvector_dim}")
+    rng = np.random.default_rng(seed)
+    if n > PQ_TRAIN_SAMPLES:
+        matrix = matrix[rng.choice(n, PQ_TRAIN_SAMPLES, replace=False)]
+        n = PQ_TRAIN_SAMPLES
+    m = dim // subvector_dim
+    k = min(centroids, n)
+    subs = np.ascontiguousarray(matrix.reshape(n, m, subvector_dim).transpose(1, 0, 2))
+    centers = subs[:, rng.choice(n, k, replace=False)].copy()
+    offsets = (np.arange(m) * k)[:, None]
+    for _step in range(iterations):
+        assignment = _nearest_grouped(subs, centers) + offsets
+        counts = np.bincount(assignment.ravel(), minlength=m * k).reshape(m, k)
+        for axis in range(subvector_dim):
+            sums = np.bincount(assignment.ravel(), weights=subs[:, :, axis].ravel(), minlength=m * k).reshape(m, k)
+            centers[:, :, axis] = np.where(counts > 0, sums / np.maximum(counts, 1), centers[:, :, axis])
+
+    codebook = np.empty((m, centroids, subvector_dim), dtype=np.float32)
+    codebook[:, :k] = centers
+    codebook[:, k:] = centers[:, :1]
+    return codebook
+
+
+def pq_assign(matrix: np.ndarray, codebook: np.ndarray) -> np.ndarray:
+    m, _k, dsub = codebook.shape
+    n = matrix.shape[0]
+    subs = np.ascontiguousarray(np.asarray(matrix, dtype=np.float32).reshape(n, m, dsub).transpose(1, 0, 2))
+    return _nearest_grouped(subs, codebook).T.astype(np.uint8)
+
+
+def _nearest_grouped(subs: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    m, n, _dsub = subs.shape
+    k = centers.shape[1]
+    group = max(1, PQ_ASSIGN_BUDGET // max(1, n * k))
+    norms = (centers ** 2).sum(axis=2)[:, None, :]
+    scaled = np.ascontiguousarray((-2.0 * centers).transpose(0, 2, 1))
+    assignment = np.empty((m, n), dtype=np.int64)
+    for j0 in range(0, m, group):
+        j1 = min(m, j0 + group)
+        d = np.matmul(subs[j0:j1], scaled[j0:j1])
+        d += norms[j0:j1]
+        assignment[j0:j1] = np.argmin(d, axis=2)
+    return assignment
+
+
+def codebook_to_bytes(codebook: np.ndarray) -> bytes:
+    return struct.pack("<HHH", *codebook.shape) + np.ascontiguousarray(codebook, dtype=np.float32).tobytes()
+
+
+def codebook_from_bytes(data: bytes) -> np.ndarray:
+    shape = struct.unpack_from("<HHH", data, 0)
+    return np.frombuffer(data, dtype=np.float32, offset=6).reshape(shape)
+
+
+def benchmark(matrix: np.ndarray, queries: np.ndarray, k: int = 10, rerank_factor: int = 4) -> list:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1.0, norms)
+    queries = np.asarray(queries, dtype=np.float32)
+    k = min(k, matrix.shape[0])
+    truth = [set(np.argpartition(-(matrix @ q), k - 1)[:k].tolist()) for q in queries]
+
+    results = []
+    for codec in CODECS:
+        if codec == "pq" and (matrix.shape[1] % PQ_SUBVECTOR_DIM or matrix.shape[0] < 2):
+            continue
+        start = time.perf_counter()
+        codebook = train_pq(matrix) if codec == "pq" else None
+        blobs = encode_matrix(matrix, codec, codebook)
+        encode_seconds = time.perf_counter() - start
+        _codec, _dim, codes, scales = load_codes(blobs)
+
+        hits = 0
+        hits_reranked = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            sims = scores(q, codec, codes, scales, codebook)
+            hits += len(expected & set(np.argpartition(-sims, k - 1)[:k].tolist()))
+            wide = min(sims.size, k * rerank_factor)
+            pool = np.argpartition(-sims, wide - 1)[:wide]
+            exact = rerank(q, matrix[pool])
+            hits_reranked += len(expected & set(pool[np.argsort(-exact)[:k]].tolist()))
+        query_seconds = time.perf_counter() - start
+
+        size = sum(len(b) for b in blobs) / len(blobs)
+        results.append({
+            "codec": codec,
+            "bytes_per_vector": size,
+            "compression": matrix.shape[1] * 4 / size,
+            "recall": hits / (k * len(queries)),
+            "recall_reranked": hits_reranked / (k * len(queries)),
+            "encode_ms": encode_seconds * 1000,
+            "query_ms": query_seconds * 1000 / max(1, len(queries)),
+        })
+    return results
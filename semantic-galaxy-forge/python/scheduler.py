@@ -0,0 +1,176 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_SECONDS = 2.0
+BACKGROUND_NICE = 10
+
+Task = namedtuple("Task", "name events prepare compute commit")
+
+
+class IdleScheduler:
+    def __init__(self, backend_lock, tasks: list, idle_seconds: float = DEFAULT_IDLE_SECONDS, on_complete=None):
+        self._backend_lock = backend_lock
+        self._tasks = tasks
+        self._on_complete = on_complete
+        self.idle_seconds = idle_seconds
+        self.enabled = True
+        self._dirty: OrderedDict = OrderedDict()
+        self._cond = threading.Condition()
+        self._busy = 0
+        self._last_activity = time.monotonic()
+        self._running = None
+        self._active = None
+        self._thread = None
+        self._closed = False
+        self.completed = {task.name: 0 for task in tasks}
+        self.stale = 0
+        self.failed = 0
+        self.yielded = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="idle-scheduler", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def mark_dirty(self, galaxy_ids, names=None):
+        names = set(names) if names is not None else {task.name for task in self._tasks}
+        if not names:
+            return
+        with self._cond:
+            for galaxy_id in galaxy_ids:
+                pending = self._dirty.pop(galaxy_id, set())
+                self._dirty[galaxy_id] = pending | names
+            self._cond.notify_all()
+
+    def on_change(self, event: str, galaxy_ids=(), node_ids=(), connection_ids=(), payload=None):
+        if galaxy_ids:
+            self.mark_dirty(galaxy_ids, [task.name for task in self._tasks if event in task.events])
+
+    @contextmanager
+    def foreground(self):
+        with self._cond:
+            self._busy += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._busy -= 1
+                self._last_activity = time.monotonic()
+                self._cond.notify_all()
+
+    @contextmanager
+    def idle_lock(self):
+        with self._cond:
+            self._cond.wait_for(lambda: not self._busy or self._closed)
+        with self._backend_lock:
+            yield
+
+    def wait_for(self, galaxy_id: int, name: str, timeout: float = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._running != (galaxy_id, name), timeout)
+
+    def configure(self, enabled: bool = None, idle_seconds: float = None):
+        with self._cond:
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            if idle_seconds is not None:
+                self.idle_seconds = max(0.0, float(idle_seconds))
+            self._cond.notify_all()
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": self.enabled,
+                "idle_seconds": self.idle_seconds,
+                "dirty": {gid: sorted(names) for gid, names in self._dirty.items()},
+                "active": self._active,
+                "running": list(self._running) if self._running else None,
+                "completed": dict(self.completed),
+                "stale": self.stale,
+                "failed": self.failed,
+                "yielded": self.yielded,
+            }
+
+    def _idle_wait(self):
+        if not self.enabled or not self._dirty or self._busy:
+            return None
+        return self.idle_seconds - (time.monotonic() - self._last_activity)
+
+    def _run(self):
+        if sys.platform.startswith("linux"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKGROUND_NICE)
+            except (AttributeError, OSError) as e:
+                logger.info(f"Idle scheduler runs at normal priority: {e}")
+
+        while True:
+            with self._cond:
+                while not self._closed:
+                    wait = self._idle_wait()
+                    if wait is not None and wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+                galaxy_id, names = self._dirty.popitem(last=True)
+                self._active = galaxy_id
+            try:
+                self._process(galaxy_id, names)
+            finally:
+                with self._cond:
+                    self._active = None
+
+    def _requeue(self, galaxy_id: int, names: set):
+        self.yielded += 1
+        with self._cond:
+            self._dirty[galaxy_id] = self._dirty.get(galaxy_id, set()) | names
+            self._dirty.move_to_end(galaxy_id)
+
+    def _process(self, galaxy_id: int, names: set):
+        for task in self._tasks:
+            if task.name not in names:
+                continue
+            if self._busy or not self._backend_lock.acquire(blocking=False):
+                self._requeue(galaxy_id, names)
+                return
+            try:
+                job = task.prepare(galaxy_id)
+            except Exception as e:
+                logger.warning(f"Idle {task.name} for galaxy {galaxy_id} failed to prepare: {e}")
+                job = None
+                self.failed += 1
+            finally:
+                self._backend_lock.release()
+            names.discard(task.name)
+            if job is None:
+                continue
+
+            with self._cond:
+                self._running = (galaxy_id, task.name)
+            try:
+                result = task.compute(job)
+                if task.commit(galaxy_id, job, result):
+                    self.completed[task.name] += 1
+                    if self._on_complete:
+                        self._on_complete(galaxy_id, task.name)
+                else:
+                    self.stale += 1
+            except Exception as e:
+                logger.warning(f"Idle {task.name} for galaxy {galaxy_id} failed: {e}")
+                self.failed += 1
+            finally:
+                with self._cond:
+                    self._running = None
+                    self._cond.notify_all()
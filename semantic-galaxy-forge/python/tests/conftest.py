@@ -0,0 +1,13 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def backend(tmp_path_factory):
+    os.environ["DATA_DIR"] = str(tmp_path_factory.mktemp("data"))
+    return importlib.import_module("main")
@@ -0,0 +1,64 @@
+import numpy as np
+
+import clusters as clus
+
+
+def _galaxy(rng, groups: int, size: int):
+    nodes, embeddings, communities, connections = [], {}, [], []
+    centers = rng.normal(size=(groups, 8)) * 5
+    for g in range(groups):
+        members = []
+        for i in range(size):
+            node_id = g * size + i + 1
+            x, y, z = centers[g, :3] * 10 + rng.normal(size=3)
+            nodes.append({
+                "id": node_id, "position_x": x, "position_y": y, "position_z": z, "label": "", "content": f"n{node_id}",
+            })
+            embeddings[node_id] = (centers[g] + rng.normal(size=8) * 0.1).astype(np.float32)
+            members.append(node_id)
+        communities.append(members)
+        connections.extend(
+            {"source_id": a, "target_id": b, "strength": 0.5} for a, b in zip(members, members[1:])
+        )
+    connections.append({"source_id": 1, "target_id": size + 1, "strength": 0.25})
+    return nodes, embeddings, communities, connections
+
+
+def test_hierarchy_covers_every_node_and_shrinks_to_the_top_level():
+    rng = np.random.default_rng(0)
+    nodes, embeddings, communities, connections = _galaxy(rng, 40, 5)
+    nodes.append({"id": 999, "position_x": 0, "position_y": 0, "position_z": 0, "label": "stray", "content": ""})
+    hierarchy = clus.build_hierarchy(nodes, embeddings, communities, connections, branching=4, top_level_size=5)
+    levels = hierarchy["levels"]
+
+    assert set(hierarchy["membership"]) == {n["id"] for n in nodes}
+    assert len(levels[0]) == 41
+    assert len(levels[-1]) <= 5
+    assert all(len(upper) < len(lower) for lower, upper in zip(levels, levels[1:]))
+    for lower, upper in zip(levels, levels[1:]):
+        assert {c["parent_idx"] for c in lower} == {c["idx"] for c in upper}
+        assert sum(c["member_count"] for c in upper) == len(nodes)
+    assert all(c["parent_idx"] is None for c in levels[-1])
+
+
+def test_level_one_clusters_summarise_their_members():
+    rng = np.random.default_rng(1)
+    nodes, embeddings, communities, connections = _galaxy(rng, 3, 6)
+    hierarchy = clus.build_hierarchy(nodes, embeddings, communities, connections)
+    positions = {n["id"]: (n["position_x"], n["position_y"], n["position_z"]) for n in nodes}
+    for cluster, members in zip(hierarchy["levels"][0], communities):
+        assert cluster["member_count"] == len(members)
+        assert np.allclose(cluster["position"], np.mean([positions[m] for m in members], axis=0), atol=1e-4)
+        assert np.allclose(cluster["centroid"], np.mean([embeddings[m] for m in members], axis=0), atol=1e-5)
+        assert cluster["representative_id"] in members
+    assert hierarchy["edges"] == [{"level": 1, "source_idx": 0, "target_idx": 1, "strength": 0.25, "edge_count": 1}]
+
+
+def test_nearest_cluster_prefers_embeddings_over_position():
+    rng = np.random.default_rng(2)
+    nodes, embeddings, communities, connections = _galaxy(rng, 3, 6)
+    level = clus.build_hierarchy(nodes, embeddings, communities, connections)["levels"][0]
+    far_away = (1e6, 1e6, 1e6)
+    assert clus.nearest_cluster(level, embeddings[8], far_away) == 1
+    assert clus.nearest_cluster(level, None, tuple(level[2]["position"])) == 2
+    assert clus.nearest_cluster([], None, far_away) is None
@@ -0,0 +1,44 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import dedup
+import file_processors as fp
+
+
+def test_distinct_numeric_chunks_do_not_merge(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "numbers.csv"
+    path.write_text("\n".join(",".join(str(x) for x in rng.integers(0, 100000, 6)) for _ in range(2000)))
+    signatures = [dedup.simhash(chunk) for chunk in fp.iter_file_chunks(str(path))]
+    assert len(signatures) > 1
+    assert min(dedup.hamming(a, b) for a, b in itertools.combinations(signatures, 2)) > dedup.DEFAULT_MAX_DISTANCE
+
+
+def test_near_duplicate_text_is_matched_through_bands():
+    rng = np.random.default_rng(1)
+    words = [f"word{i}" for i in rng.integers(0, 50, 300)]
+    signature = dedup.simhash(" ".join(words))
+    words[150] = "changed"
+    near = dedup.simhash(" ".join(words))
+    assert dedup.hamming(signature, near) <= dedup.DEFAULT_MAX_DISTANCE
+    assert any(a == b for a, b in zip(dedup.bands(signature), dedup.bands(near)))
+    candidates = [(7, dedup.to_signed(near)), (8, dedup.to_signed(near ^ ((1 << 64) - 1)))]
+    assert dedup.best_match(signature, candidates) == 7
+
+
+def test_merging_is_opt_in():
+    assert dedup.make_policy(None) == "keep"
+    assert dedup.make_policy("merge") == "merge"
+    with pytest.raises(ValueError):
+        dedup.make_policy("drop")
+
+
+def test_max_distance_is_limited_by_banding():
+    assert dedup.make_max_distance(None) == dedup.DEFAULT_MAX_DISTANCE
+    assert dedup.make_max_distance(dedup.BANDS - 1) == dedup.BANDS - 1
+    with pytest.raises(ValueError):
+        dedup.make_max_distance(dedup.BANDS)
+    with pytest.raises(ValueError):
+        dedup.best_match(0, [], max_distance=10)
@@ -0,0 +1,96 @@
+import json
+
+import numpy as np
+import pytest
+
+import quantize
+
+
+def _galaxy(backend, matrix, edges=()):
+    rows = [
+        ("text", f"chunk {i}", f"label {i}", vector.tobytes(), float(i), -float(i), 0.5, None, "{}", None)
+        for i, vector in enumerate(np.asarray(matrix, dtype=np.float32))
+    ]
+    galaxy_id, node_ids = backend.db.import_galaxy("storage", "{}", rows, edges)
+    backend.backfill_embedding_spaces()
+    return galaxy_id, node_ids
+
+
+def _stored(backend, galaxy_id):
+    return {row["id"]: row["embedding"] for row in backend.db.get_embeddings(galaxy_id)}
+
+
+def _contents(backend, galaxy_id):
+    nodes = backend.db.get_nodes(galaxy_id)
+    content = {n["id"]: n["content"] for n in nodes}
+    edges = sorted(
+        (content[c["source_id"]], content[c["target_id"]], round(c["strength"], 5))
+        for c in backend.db.get_connections(galaxy_id)
+    )
+    return [(n["content"], n["label"], n["position_x"], n["position_y"], n["metadata"]) for n in nodes], edges
+
+
+def test_pq_falls_back_to_int8_below_the_training_minimum(backend):
+    matrix = np.random.default_rng(0).normal(size=(backend.PQ_MIN_TRAIN - 1, 32))
+    galaxy_id, _ids = _galaxy(backend, matrix)
+    result = backend.migrate_embedding_storage(galaxy_id, "pq")
+    assert set(result["codecs"].values()) == {"int8"}
+    assert backend.db.get_codebooks(galaxy_id) == {}
+    assert {quantize.blob_info(blob)[0] for blob in _stored(backend, galaxy_id).values()} == {"int8"}
+
+
+def test_pq_trains_a_codebook_once_enough_vectors_exist(backend):
+    matrix = np.random.default_rng(1).normal(size=(backend.PQ_MIN_TRAIN, 32)).astype(np.float32)
+    galaxy_id, node_ids = _galaxy(backend, matrix)
+    result = backend.migrate_embedding_storage(galaxy_id, "pq")
+    assert set(result["codecs"].values()) == {"pq"}
+    assert result["bytes_after"] < result["bytes_before"]
+    assert list(backend.db.get_codebooks(galaxy_id)) == [32]
+    hits = backend.vector_index.search(matrix[5], 1, [galaxy_id], next(iter(result["codecs"])))
+    assert hits[0]["node_id"] == node_ids[5]
+
+
+def test_lossy_to_lossy_conversion_needs_originals(backend):
+    matrix = np.random.default_rng(2).normal(size=(50, 32)).astype(np.float32)
+    galaxy_id, node_ids = _galaxy(backend, matrix)
+    backend.migrate_embedding_storage(galaxy_id, "int8")
+    with pytest.raises(ValueError):
+        backend.migrate_embedding_storage(galaxy_id, "float16")
+    backend.migrate_embedding_storage(galaxy_id, "float32")
+    assert {quantize.blob_info(blob)[0] for blob in _stored(backend, galaxy_id).values()} == {"float32"}
+
+    other_id, other_ids = _galaxy(backend, matrix)
+    backend.migrate_embedding_storage(other_id, "int8", keep_originals=True)
+    result = backend.migrate_embedding_storage(other_id, "float16")
+    assert result["original_bytes"] == matrix.nbytes
+    originals = backend.db.get_embedding_originals(other_ids)
+    assert all(np.array_equal(np.frombuffer(originals[nid], np.float32), matrix[i]) for i, nid in enumerate(other_ids))
+    assert json.loads(backend.db.get_galaxy(other_id)["settings"])["keep_originals"] is True
+
+
+def test_export_import_round_trip_restores_the_galaxy(backend, tmp_path):
+    rng = np.random.default_rng(3)
+    matrix = rng.normal(size=(40, 32)).astype(np.float32)
+    galaxy_id, node_ids = _galaxy(backend, matrix, [(i, i + 1, 0.5 + i / 100, "semantic") for i in range(39)])
+    backend.db.update_node_metadata(node_ids[3], {"source": "notes.txt"})
+    backend.migrate_embedding_storage(galaxy_id, "int8", keep_originals=True)
+    path = str(tmp_path / "galaxy.sgfx")
+
+    request = {"id": 1, "channel": "exportGalaxy", "data": {"galaxy_id": galaxy_id, "file_path": path}}
+    exported = backend.handle_request(request)["result"]
+    assert exported["nodes"] == 40 and exported["connections"] == 39
+    imported = backend.handle_request({"id": 2, "channel": "importGalaxy", "data": {"file_path": path}})["result"]
+    copy_id = imported["galaxy_id"]
+
+    assert _contents(backend, copy_id) == _contents(backend, galaxy_id)
+    copy_nodes = [n["id"] for n in backend.db.get_nodes(copy_id, ("id",))]
+    originals = backend.db.get_embedding_originals(copy_nodes)
+    assert [np.frombuffer(originals[nid], np.float32).tolist() for nid in copy_nodes] == matrix.tolist()
+    assert {quantize.blob_info(blob)[0] for blob in _stored(backend, copy_id).values()} == {"int8"}
+
+
+def test_import_rejects_files_that_are_not_archives(backend, tmp_path):
+    path = tmp_path / "broken.sgfx"
+    path.write_bytes(b"not an archive at all")
+    response = backend.handle_request({"id": 3, "channel": "importGalaxy", "data": {"file_path": str(path)}})
+    assert "Not a galaxy archive" in response["error"]
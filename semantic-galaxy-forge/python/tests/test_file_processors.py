@@ -0,0 +1,53 @@
+import random
+
+import file_processors as fp
+
+
+def _random_text(rng: random.Random, sentences: int) -> str:
+    parts = []
+    for _ in range(sentences):
+        length = rng.choice([rng.randint(5, 120), rng.randint(600, 800), rng.randint(1000, 3000)])
+        parts.append("".join(rng.choice("abcdefgh ") for _ in range(length)).strip() + rng.choice(".!?"))
+    return " ".join(parts)
+
+
+def test_chunks_never_exceed_max_length():
+    rng = random.Random(0)
+    for _ in range(50):
+        text = _random_text(rng, rng.randint(1, 20))
+        for max_length, overlap in ((600, 50), (200, 20), (100, 150)):
+            chunks = list(fp.iter_text_chunks([text], max_length, overlap))
+            assert chunks
+            assert max(len(c) for c in chunks) <= max_length
+
+
+def _count_words(text: str) -> int:
+    return len(text.split())
+
+
+def test_chunks_respect_token_budget_and_length_together():
+    rng = random.Random(1)
+    for _ in range(20):
+        text = _random_text(rng, rng.randint(1, 20))
+        chunks = list(fp.iter_text_chunks([text], token_budget=30, count_tokens=_count_words))
+        assert max(len(c) for c in chunks) <= 600
+        assert max(_count_words(c) for c in chunks) <= 30
+
+
+def test_sentence_between_max_length_and_long_limit_is_split():
+    sentence = "word " * 140 + "end."
+    chunks = fp.split_text(sentence)
+    assert len(sentence) > 600
+    assert len(chunks) == 2
+    assert max(len(c) for c in chunks) <= 600
+
+
+def test_streaming_blocks_match_single_pass():
+    rng = random.Random(2)
+    text = " ".join(
+        " ".join(rng.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(rng.randint(3, 40))) + "."
+        for _ in range(200)
+    )
+    whole = list(fp.iter_text_chunks([text]))
+    blocks = [text[i:i + 97] for i in range(0, len(text), 97)]
+    assert list(fp.iter_text_chunks(blocks)) == whole
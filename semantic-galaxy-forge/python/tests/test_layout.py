@@ -0,0 +1,41 @@
+import numpy as np
+
+import layout
+
+
+def test_grid_repulsion_approximates_exact_forces():
+    rng = np.random.default_rng(0)
+    pos = rng.normal(size=(3000, 3)) * 50
+    params = layout.make_params({"exact_limit": 10})
+    exact = layout._exact_repulsion(pos, params["repulsion_strength"], params["block_size"])
+    approx = layout.repulsion(pos, params)
+    cosine = (exact * approx).sum(axis=1) / (np.linalg.norm(exact, axis=1) * np.linalg.norm(approx, axis=1))
+    assert np.median(cosine) > 0.99
+    assert np.allclose(np.linalg.norm(approx, axis=1).sum(), np.linalg.norm(exact, axis=1).sum(), rtol=0.1)
+
+
+def test_springs_pull_connected_nodes_together():
+    rng = np.random.default_rng(1)
+    pos = rng.normal(size=(60, 3)) * 30
+    sources = np.arange(0, 30, 2)
+    targets = sources + 1
+    before = np.linalg.norm(pos[sources] - pos[targets], axis=1).mean()
+    settled = layout.settle(pos, sources, targets, np.full(sources.size, 0.9), 200)
+    after = np.linalg.norm(settled[sources] - settled[targets], axis=1).mean()
+    unlinked = np.linalg.norm(settled[30:45] - settled[45:60], axis=1).mean()
+    assert settled.shape == pos.shape and settled.dtype == np.float32
+    assert after < before and after < unlinked
+
+
+def test_pinned_nodes_stay_put_and_stop_ends_early():
+    rng = np.random.default_rng(2)
+    pos = rng.normal(size=(20, 3)) * 10
+    steps = []
+    settled = layout.settle(
+        pos, np.array([0, 1]), np.array([2, 3]), np.array([0.5, 0.5]), 50,
+        pinned=np.array([0, 5]), on_step=lambda step, _pos, _energy: steps.append(step),
+        should_stop=lambda: len(steps) >= 10,
+    )
+    assert np.allclose(settled[[0, 5]], pos[[0, 5]])
+    assert not np.allclose(settled[1], pos[1])
+    assert steps == list(range(1, 11))
@@ -0,0 +1,138 @@
+import tracemalloc
+
+import numpy as np
+
+import linking
+
+
+def test_incremental_mutual_knn_drops_one_sided_candidates():
+    policy = linking.make_policy(0.5, {"mode": "knn", "k": 2, "mutual": True})
+    kth = {1: 0.9, 2: 0.3}
+    created, evicted = linking.plan_edges(10, [1, 2, 3], [0.8, 0.7, 0.6], {}, policy, kth)
+    assert [(a, b) for a, b, _s in created] == [(10, 2), (10, 3)]
+    assert evicted == []
+
+
+def test_mutual_is_ignored_for_threshold_and_cross_modal_policies():
+    policy = linking.make_policy(0.5, {"mutual": True})
+    created, _ = linking.plan_edges(10, [1], [0.8], {}, policy, {1: 0.9})
+    assert len(created) == 1
+    cross = linking.cross_modal_policy(linking.make_policy(0.5, {"mode": "knn", "mutual": True}))
+    assert not linking.needs_mutual_check(cross)
+
+
+def test_kth_similarity_matches_recompute_neighbourhood():
+    policy = linking.make_policy(0.5, {"mode": "knn", "k": 2, "mutual": True})
+    assert linking.kth_similarity(np.array([0.9, -0.2, 0.4, 0.7], dtype=np.float32), policy) == np.float32(0.7)
+    assert linking.kth_similarity(np.array([0.9, -0.2], dtype=np.float32), policy) == -np.inf
+
+
+def _brute_force(matrix, policy):
+    x = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    sims = x @ x.T
+    n = len(x)
+    np.fill_diagonal(sims, -np.inf)
+    if policy["mode"] == "threshold":
+        pairs = {(i, j): sims[i, j] for i in range(n) for j in range(i + 1, n) if sims[i, j] >= policy["threshold"]}
+    else:
+        floor = policy["threshold"] if policy["mode"] == "hybrid" else np.nextafter(0, 1)
+        top = {}
+        for i in range(n):
+            order = [j for j in np.argsort(-sims[i], kind="stable")[:policy["k"]] if sims[i, j] >= floor]
+            top[i] = set(order)
+        pairs = {}
+        for i, neighbours in top.items():
+            for j in neighbours:
+                if policy["mutual"] and i not in top[j]:
+                    continue
+                pairs[(min(i, j), max(i, j))] = sims[i, j]
+
+    cap = linking.degree_cap(policy)
+    if cap is None:
+        return pairs
+    degree = np.zeros(n, dtype=int)
+    kept = {}
+    for (i, j), v in sorted(pairs.items(), key=lambda item: -item[1]):
+        if degree[i] < cap and degree[j] < cap:
+            kept[(i, j)] = v
+            degree[i] += 1
+            degree[j] += 1
+    return kept
+
+
+def _as_pairs(src, tgt, val):
+    return {(int(min(a, b)), int(max(a, b))): float(v) for a, b, v in zip(src, tgt, val)}
+
+
+def test_blocked_edges_match_brute_force_across_blocks():
+    rng = np.random.default_rng(3)
+    matrix = rng.normal(size=(150, 16)).astype(np.float32)
+    for options, budget_mb in (
+        ({"mode": "threshold"}, 0.4),
+        ({"mode": "threshold", "max_degree": 3}, 0.4),
+        ({"mode": "knn", "k": 4}, 0.05),
+        ({"mode": "knn", "k": 4, "mutual": True}, 0.05),
+        ({"mode": "hybrid", "k": 4}, 0.05),
+    ):
+        policy = linking.make_policy(0.3, options)
+        got = _as_pairs(*linking.blocked_edges(matrix, policy, memory_budget_mb=budget_mb))
+        expected = _brute_force(matrix, policy)
+        assert got.keys() == expected.keys(), options
+        assert np.allclose([got[key] for key in expected], list(expected.values()), atol=1e-5)
+
+
+def test_blocked_cross_edges_respect_threshold_and_k():
+    rng = np.random.default_rng(4)
+    left = rng.normal(size=(200, 8)).astype(np.float32)
+    right = rng.normal(size=(30, 8)).astype(np.float32)
+    unit_left = left / np.linalg.norm(left, axis=1, keepdims=True)
+    sims = unit_left @ (right / np.linalg.norm(right, axis=1, keepdims=True)).T
+    src, tgt, _val = linking.blocked_cross_edges(left, right, linking.make_policy(0.6), memory_budget_mb=0.1)
+    assert set(zip(src.tolist(), tgt.tolist())) == set(zip(*np.nonzero(sims >= 0.6)))
+    src, _tgt, _val = linking.blocked_cross_edges(left, right, linking.make_policy(0.6, {"mode": "knn", "k": 2}))
+    assert np.bincount(src).max() <= 2
+
+
+def test_threshold_edges_keep_the_strongest_when_over_budget():
+    rng = np.random.default_rng(7)
+    matrix = rng.normal(size=(300, 4)).astype(np.float32)
+    policy = linking.make_policy(0.0)
+    budget_mb = 0.1
+    max_edges = int(budget_mb * 1024 * 1024) // 2 // linking.EDGE_BYTES
+    src, tgt, val = linking.blocked_edges(matrix, policy, memory_budget_mb=budget_mb)
+    expected = _brute_force(matrix, policy)
+    strongest = sorted(expected.values(), reverse=True)[:max_edges]
+    assert src.size == max_edges
+    assert np.allclose(np.sort(val)[::-1], strongest, atol=1e-5)
+
+
+def test_degree_cap_matches_greedy():
+    rng = np.random.default_rng(5)
+    n = 60
+    src = rng.integers(0, n, 800)
+    tgt = (src + rng.integers(1, n, 800)) % n
+    val = rng.random(800).astype(np.float32)
+    degree = np.zeros(n, dtype=int)
+    expected = []
+    for e in np.argsort(-val, kind="stable"):
+        a, b = src[e], tgt[e]
+        if degree[a] < 3 and degree[b] < 3:
+            expected.append(e)
+            degree[a] += 1
+            degree[b] += 1
+    kept_src, kept_tgt, _ = linking._cap_degree(src, tgt, val, n, 3)
+    assert list(zip(kept_src, kept_tgt)) == [(src[e], tgt[e]) for e in sorted(expected)]
+
+
+def test_blocked_edges_peak_allocation_stays_within_budget():
+    rng = np.random.default_rng(6)
+    matrix = rng.normal(size=(3000, 32)).astype(np.float32)
+    budget_mb = 4
+    for options in ({"mode": "knn", "k": 8}, {"mode": "threshold"}, {"mode": "threshold", "max_degree": 8}):
+        tracemalloc.start()
+        try:
+            linking.blocked_edges(matrix, linking.make_policy(0.1, options), memory_budget_mb=budget_mb)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert peak <= budget_mb * 1024 * 1024, options
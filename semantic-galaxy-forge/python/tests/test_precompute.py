@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def _galaxy(backend, count=30):
+    matrix = np.random.default_rng(0).normal(size=(count, 16)).astype(np.float32)
+    rows = [
+        ("text", f"chunk {i} of a longer passage about topic {i} and its neighbours", "", v.tobytes(),
+         float(i), 0.0, 0.0, None, "{}", None)
+        for i, v in enumerate(matrix)
+    ]
+    galaxy_id, node_ids = backend.db.import_galaxy("precompute", "{}", rows, [(0, 1, 0.5, "semantic")])
+    backend.backfill_embedding_spaces()
+    backend.working_set.discard(galaxy_id, "index")
+    return galaxy_id, node_ids
+
+
+def _run(backend, galaxy_id, job):
+    return backend.commit_indexes(galaxy_id, job, backend.compute_indexes(job))
+
+
+def test_background_indexes_match_the_synchronous_loaders(backend):
+    galaxy_id, _node_ids = _galaxy(backend)
+    job = backend.prepare_indexes(galaxy_id)
+    assert set(job[0]) == set(backend.INDEX_PARTS)
+    assert _run(backend, galaxy_id, job)
+
+    ws = backend.working_set
+    assert np.array_equal(ws.peek(galaxy_id, "nodes")["ids"], backend.load_nodes_part(galaxy_id)["ids"])
+    assert np.array_equal(ws.peek(galaxy_id, "adjacency")["ids"], backend.load_adjacency_part(galaxy_id)["ids"])
+    cached, loaded = ws.peek(galaxy_id, "embeddings"), backend.galaxy_embeddings(galaxy_id)
+    for space, (ids, matrix) in loaded.items():
+        assert dict(zip(cached[space][0], cached[space][1].tolist())) == dict(zip(ids, matrix.tolist()))
+    assert backend.vector_index.stats()["partitions"][galaxy_id]
+    assert backend.db.get_unsigned_text_node_ids(galaxy_id) == []
+    assert backend.prepare_indexes(galaxy_id) is None
+
+
+def test_edits_between_prepare_and_commit_make_the_job_stale(backend):
+    galaxy_id, node_ids = _galaxy(backend)
+    job = backend.prepare_indexes(galaxy_id)
+    result = backend.compute_indexes(job)
+    backend.db.delete_nodes(node_ids[:2])
+    assert backend.commit_indexes(galaxy_id, job, result)
+    assert not any(backend.working_set.contains(galaxy_id, part) for part in backend.INDEX_PARTS)
+    assert backend.prepare_indexes(galaxy_id) is not None
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+import quantize
+
+
+def _unit_rows(rng, n, dim):
+    matrix = rng.normal(size=(n, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def test_scalar_codecs_round_trip_within_their_precision():
+    rng = np.random.default_rng(0)
+    matrix = _unit_rows(rng, 50, 64)
+    for codec, tolerance in (("float32", 0.0), ("float16", 1e-3), ("int8", 1e-2)):
+        blobs = quantize.encode_matrix(matrix, codec)
+        assert quantize.blob_info(blobs[0])[:2] == (codec, 64)
+        decoded = quantize.decode_blobs(blobs)
+        assert np.abs(decoded - matrix).max() <= tolerance, codec
+        assert np.allclose(quantize.decode(blobs[3]), decoded[3])
+
+
+def test_scores_match_decoded_dot_products():
+    rng = np.random.default_rng(1)
+    matrix = _unit_rows(rng, 300, 32)
+    query = matrix[0]
+    codebook = quantize.train_pq(matrix, iterations=4)
+    for codec, book in (("float32", None), ("float16", None), ("int8", None), ("pq", codebook)):
+        codec_name, _dim, codes, scales = quantize.load_codes(quantize.encode_matrix(matrix, codec, book))
+        expected = quantize.decode_codes(codec_name, codes, scales, book) @ query
+        assert np.allclose(quantize.scores(query, codec_name, codes, scales, book), expected, atol=1e-4), codec
+
+
+def test_pq_codebook_survives_serialisation_and_keeps_neighbours():
+    rng = np.random.default_rng(2)
+    matrix = _unit_rows(rng, 2000, 32)
+    codebook = quantize.train_pq(matrix)
+    restored = quantize.codebook_from_bytes(quantize.codebook_to_bytes(codebook))
+    assert np.array_equal(restored, codebook)
+    decoded = quantize.decode_blobs(quantize.encode_matrix(matrix, "pq", restored), restored)
+    error = np.linalg.norm(decoded - matrix, axis=1).mean()
+    assert error < 0.5
+    assert np.argmax(decoded @ matrix[7]) == 7
+
+
+def test_pq_needs_a_codebook_and_a_divisible_dimension():
+    rng = np.random.default_rng(3)
+    blob = quantize.encode(rng.normal(size=8), "pq", quantize.train_pq(rng.normal(size=(300, 8)), iterations=2))
+    with pytest.raises(ValueError):
+        quantize.decode(blob)
+    with pytest.raises(ValueError):
+        quantize.train_pq(rng.normal(size=(300, 10)))
+    with pytest.raises(ValueError):
+        quantize.make_codec("int4")
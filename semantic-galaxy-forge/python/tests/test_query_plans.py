@@ -0,0 +1,57 @@
+import pytest
+
+from database import Database, READ_QUERIES, check_query_plans
+
+EXPECTED_PLANS = {
+    "get_all_galaxies": ["SCAN galaxies USING INDEX idx_galaxies_modified"],
+    "get_nodes": ["SEARCH nodes USING INDEX idx_nodes_galaxy_created (galaxy_id=?)"],
+    "get_connections": ["SEARCH connections USING INDEX idx_conn_galaxy (galaxy_id=?)"],
+    "get_connection_ids": ["SEARCH connections USING COVERING INDEX idx_conn_galaxy (galaxy_id=?)"],
+    "get_embeddings": ["SEARCH nodes USING INDEX idx_nodes_galaxy_model (galaxy_id=?)"],
+    "has_embedding_model": [
+        "SEARCH nodes USING COVERING INDEX idx_nodes_galaxy_model (galaxy_id=? AND embedding_model=?)"
+    ],
+    "get_missing_clip_embeddings": ["SEARCH nodes USING INDEX idx_nodes_missing_clip (galaxy_id=?)"],
+    "get_unlabelled_embeddings": ["SCAN nodes USING INDEX idx_nodes_unlabelled"],
+    "find_signature_candidates": [
+        f"SEARCH chunk_signatures USING INDEX idx_sig_band{band} (galaxy_id=? AND band{band}=?)"
+        for band in range(4)
+    ],
+    "get_unsigned_text_node_ids": [
+        "SEARCH n USING INDEX idx_nodes_galaxy_model (galaxy_id=?)",
+        "SEARCH s USING INTEGER PRIMARY KEY (rowid=?)",
+    ],
+    "get_link_suggestions": [
+        "SEARCH link_suggestions USING INDEX idx_link_suggestions_source (source_galaxy_id=?)"
+    ],
+    "search_text": ["SEARCH n USING INTEGER PRIMARY KEY (rowid=?)"],
+}
+
+
+@pytest.fixture
+def db():
+    database = Database(":memory:")
+    yield database
+    database.close()
+
+
+def test_every_read_query_has_an_expected_plan():
+    assert set(EXPECTED_PLANS) == set(READ_QUERIES)
+
+
+@pytest.mark.parametrize("name", sorted(READ_QUERIES))
+def test_read_query_uses_index(db, name):
+    sql, params = READ_QUERIES[name]
+    plan = db.query_plan(sql, params)
+    for step in EXPECTED_PLANS[name]:
+        assert step in plan
+    assert not any("TEMP B-TREE" in detail for detail in plan)
+
+
+def test_search_text_starts_from_fts_index(db):
+    sql, params = READ_QUERIES["search_text"]
+    assert db.query_plan(sql, params)[0].startswith("SCAN f VIRTUAL TABLE INDEX")
+
+
+def test_check_query_plans_reports_no_regressions():
+    assert check_query_plans() == []
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from scheduler import IdleScheduler, Task
+
+
+def _settled(scheduler: IdleScheduler, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = scheduler.status()
+        if not status["dirty"] and status["active"] is None:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"scheduler did not settle: {scheduler.status()}")
+
+
+def _scheduler(lock, tasks, **kwargs):
+    scheduler = IdleScheduler(lock, tasks, idle_seconds=0.0, **kwargs)
+    scheduler.start()
+    return scheduler
+
+
+def test_dirty_galaxies_run_prepare_compute_and_commit():
+    calls = []
+    done = []
+    task = Task(
+        "layout", ("nodes",),
+        lambda gid: calls.append(("prepare", gid)) or gid * 10,
+        lambda job: calls.append(("compute", job)) or job + 1,
+        lambda gid, job, result: calls.append(("commit", gid, result)) or True,
+    )
+    scheduler = _scheduler(threading.RLock(), [task], on_complete=lambda gid, name: done.append((gid, name)))
+    try:
+        scheduler.on_change("connections", galaxy_ids=(3,))
+        scheduler.on_change("nodes", galaxy_ids=(3,))
+        status = _settled(scheduler)
+    finally:
+        scheduler.close()
+    assert calls == [("prepare", 3), ("compute", 30), ("commit", 3, 31)]
+    assert done == [(3, "layout")]
+    assert status["completed"] == {"layout": 1}
+
+
+def test_work_waits_for_foreground_requests_and_the_backend_lock():
+    lock = threading.RLock()
+    ran = []
+    task = Task(
+        "indexes", ("nodes",), lambda gid: gid, lambda job: job, lambda gid, job, result: ran.append(gid) or True,
+    )
+    scheduler = _scheduler(lock, [task])
+    try:
+        with scheduler.foreground():
+            scheduler.mark_dirty([1])
+            time.sleep(0.1)
+            assert ran == []
+        _settled(scheduler)
+        assert ran == [1]
+
+        holder = threading.Thread(target=lambda: (lock.acquire(), time.sleep(0.2), lock.release()))
+        holder.start()
+        time.sleep(0.02)
+        scheduler.mark_dirty([2])
+        holder.join()
+        status = _settled(scheduler)
+    finally:
+        scheduler.close()
+    assert ran == [1, 2]
+    assert status["yielded"] >= 1
+
+
+def test_stale_commits_and_failures_are_counted():
+    tasks = [
+        Task("communities", ("nodes",), lambda gid: gid, lambda job: job, lambda gid, job, result: False),
+        Task("clusters", ("nodes",), lambda gid: gid, lambda job: 1 / 0, lambda gid, job, result: True),
+        Task("layout", ("nodes",), lambda gid: None, lambda job: job, lambda gid, job, result: True),
+    ]
+    scheduler = _scheduler(threading.RLock(), tasks)
+    try:
+        scheduler.mark_dirty([1])
+        status = _settled(scheduler)
+    finally:
+        scheduler.close()
+    assert status["stale"] == 1
+    assert status["failed"] == 1
+    assert status["completed"] == {"communities": 0, "clusters": 0, "layout": 0}
+
+
+def test_idle_lock_waits_for_requests_in_flight():
+    lock = threading.RLock()
+    scheduler = IdleScheduler(lock, [])
+    acquired = []
+
+    def background():
+        with scheduler.idle_lock():
+            acquired.append(time.monotonic())
+
+    with scheduler.foreground():
+        worker = threading.Thread(target=background)
+        worker.start()
+        time.sleep(0.1)
+        assert acquired == []
+        released = time.monotonic()
+    worker.join(1.0)
+    assert acquired and acquired[0] >= released
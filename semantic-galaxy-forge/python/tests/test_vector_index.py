@@ -0,0 +1,96 @@
+import numpy as np
+
+import quantize
+from vector_index import VectorIndex
+from working_set import WorkingSet
+
+
+def _index(blobs: dict, budget_mb: float = 64):
+    def load(galaxy_id):
+        return ((node_id, "text", blob) for node_id, blob in blobs.get(galaxy_id, {}).items())
+
+    index = VectorIndex(load, lambda _galaxy_id: {})
+    store = WorkingSet({"index": index.build}, budget_mb, maintained=("index",))
+    index.attach(store)
+    return index, store
+
+
+def _galaxies(rng, sizes, dim=16, codec="float32"):
+    vectors, blobs, next_id = {}, {}, 1
+    for galaxy_id, size in enumerate(sizes, start=1):
+        matrix = rng.normal(size=(size, dim)).astype(np.float32)
+        ids = list(range(next_id, next_id + size))
+        next_id += size
+        vectors[galaxy_id] = (ids, matrix)
+        blobs[galaxy_id] = dict(zip(ids, quantize.encode_matrix(matrix, codec)))
+    return vectors, blobs
+
+
+def _brute_force(vectors, query, k):
+    scored = []
+    for galaxy_id, (ids, matrix) in vectors.items():
+        sims = quantize.rerank(query, matrix)
+        scored.extend((float(s), galaxy_id, node_id) for s, node_id in zip(sims, ids))
+    scored.sort(key=lambda hit: -hit[0])
+    return [(galaxy_id, node_id) for _s, galaxy_id, node_id in scored[:k]]
+
+
+def test_search_matches_brute_force_cosine_across_galaxies():
+    rng = np.random.default_rng(0)
+    vectors, blobs = _galaxies(rng, [40, 70, 25])
+    index, _store = _index(blobs)
+    query = rng.normal(size=16).astype(np.float32)
+    hits = index.search(query, 10, [1, 2, 3], "text")
+    assert [(h["galaxy_id"], h["node_id"]) for h in hits] == _brute_force(vectors, query, 10)
+    assert index.search(query, 10, [1, 2, 3], "image") == []
+
+
+def test_incremental_add_and_remove_match_a_rebuild():
+    rng = np.random.default_rng(1)
+    _vectors, blobs = _galaxies(rng, [30], codec="int8")
+    index, _store = _index(blobs)
+    query = rng.normal(size=16).astype(np.float32)
+    index.load([1])
+
+    extra = quantize.encode(rng.normal(size=16), "int8")
+    index.add(1, 500, extra, "text")
+    index.remove([3, 4])
+    blobs[1][500] = extra
+    del blobs[1][3], blobs[1][4]
+    rebuilt, _ = _index(blobs)
+
+    got = index.search(query, 31, [1], "text")
+    expected = rebuilt.search(query, 31, [1], "text")
+    assert [h["node_id"] for h in got] == [h["node_id"] for h in expected]
+    assert np.allclose([h["score"] for h in got], [h["score"] for h in expected])
+    assert index.stats()["vectors"] == 29
+
+
+def test_index_stays_resident_when_the_budget_is_exceeded():
+    rng = np.random.default_rng(2)
+    _vectors, blobs = _galaxies(rng, [200] * 4, dim=64)
+    index, store = _index(blobs, budget_mb=0.05)
+    query = rng.normal(size=64).astype(np.float32)
+    for _ in range(3):
+        index.search(query, 5, [1, 2, 3, 4], "text")
+    assert store.stats()["misses"]["index"] == 4
+    assert index.stats()["galaxies"] == 4
+
+
+def test_cross_links_use_the_loaded_snapshot():
+    rng = np.random.default_rng(3)
+    vectors, blobs = _galaxies(rng, [20, 30])
+    index, store = _index(blobs)
+    loaded = index.load([1, 2])
+    store.discard(2, "index")
+    blobs.clear()
+
+    links = index.cross_links(loaded, 1, [1, 2], 2, -1.0)
+    src_ids, src = vectors[1]
+    tgt_ids, tgt = vectors[2]
+    sims = (src / np.linalg.norm(src, axis=1, keepdims=True)) @ (tgt / np.linalg.norm(tgt, axis=1, keepdims=True)).T
+    expected = {
+        (src_ids[i], tgt_ids[j]) for i in range(len(src_ids)) for j in np.argsort(-sims[i])[:2]
+    }
+    assert {(a, b) for a, b, _g, _s in links} == expected
+    assert all(g == 2 for _a, _b, g, _s in links)
@@ -0,0 +1,91 @@
+import numpy as np
+
+from working_set import WorkingSet
+
+
+def _store(budget_mb: float = 1, **kwargs):
+    loads = []
+
+    def loader(part):
+        def load(galaxy_id):
+            loads.append((galaxy_id, part))
+            return np.zeros(32 * 1024, dtype=np.float32)
+        return load
+
+    def load_nodes(galaxy_id):
+        loads.append((galaxy_id, "nodes"))
+        ids = np.arange(galaxy_id * 100, galaxy_id * 100 + 3, dtype=np.int64)
+        return {"ids": ids, "index": {nid: i for i, nid in enumerate(ids.tolist())}, "positions": np.zeros((3, 3))}
+
+    parts = {part: loader(part) for part in ("embeddings", "projection", "index")}
+    parts["nodes"] = load_nodes
+    return WorkingSet(parts, budget_mb, **kwargs), loads
+
+
+def test_least_recently_used_galaxy_is_evicted_first():
+    store, loads = _store(budget_mb=0.3)
+    store.get(1, "embeddings")
+    store.get(2, "embeddings")
+    store.get(1, "embeddings")
+    store.get(3, "embeddings")
+    assert set(store.stats()["galaxies"]) == {1, 3}
+    assert store.stats()["used_bytes"] <= store.budget
+    store.get(1, "embeddings")
+    assert loads.count((1, "embeddings")) == 1
+
+
+def test_maintained_parts_survive_eviction_and_events():
+    store, loads = _store(budget_mb=0.3, maintained=("index",))
+    for galaxy_id in (1, 2, 3):
+        store.get(galaxy_id, "index")
+        store.get(galaxy_id, "embeddings")
+    assert {gid: sorted(parts) for gid, parts in store.stats()["galaxies"].items()} == {
+        1: ["index"], 2: ["index"], 3: ["embeddings", "index"],
+    }
+    store.on_change("embeddings", galaxy_ids=(3,))
+    assert store.contains(3, "index") and not store.contains(3, "embeddings")
+    store.on_change("galaxy", galaxy_ids=(3,))
+    assert not store.contains(3, "index")
+    assert loads.count((1, "index")) == 1
+
+
+def test_put_rejects_results_computed_before_a_change():
+    store, _loads = _store()
+    generation = store.generation(1, "projection")
+    store.on_change("nodes", galaxy_ids=(1,), node_ids=(7,), payload="created")
+    assert not store.put(1, "projection", np.zeros(3), generation)
+    generation = store.generation(1, "projection")
+    assert store.put(1, "projection", np.zeros(3), generation)
+    assert store.peek(1, "projection") is not None
+    assert not store.put(1, "projection", np.ones(3), generation)
+
+
+def test_forgetting_one_galaxy_leaves_other_jobs_current():
+    store, _loads = _store()
+    other = store.generation(2, "projection")
+    forgotten = store.generation(1, "projection")
+    store.on_change("galaxy", galaxy_ids=(1,))
+    assert store.put(2, "projection", np.zeros(3), other)
+    assert not store.put(1, "projection", np.zeros(3), forgotten)
+
+
+def test_node_events_reach_the_owning_galaxy_without_its_id():
+    store, _loads = _store()
+    nodes = store.get(1, "nodes")
+    store.get(1, "projection")
+    store.on_change("positions", node_ids=(101,), payload=[(1.0, 2.0, 3.0, 101)])
+    assert nodes["positions"][1].tolist() == [1.0, 2.0, 3.0]
+    store.on_change("nodes", node_ids=(101,), payload="deleted")
+    assert not store.contains(1, "nodes") and not store.contains(1, "projection")
+
+
+def test_appenders_extend_cached_parts_for_created_nodes():
+    store, _loads = _store(appenders={
+        "embeddings": lambda _gid, value, node_ids: np.concatenate([value, np.ones(len(node_ids))]),
+    })
+    size = store.get(1, "embeddings").size
+    store.get(1, "projection")
+    store.on_change("embeddings", galaxy_ids=(1,), node_ids=(9, 10), payload="created")
+    assert store.peek(1, "embeddings").size == size + 2
+    assert not store.contains(1, "projection")
+    assert store.stats()["appended"] == 1
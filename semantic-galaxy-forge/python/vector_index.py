@@ -0,0 +1,314 @@
+import logging
+import sys
+import threading
+import numpy as np
+from typing import Optional
+import quantize
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 256
+DEFAULT_BLOCK_SIZE = 1024
+
+
+class Partition:
+    def __init__(self, space: str, dim: int, codec: str, codes: np.ndarray, codebook: Optional[np.ndarray] = None):
+        self.space = space
+        self.dim = dim
+        self.codec = codec
+        self.codebook = codebook
+        self.size = 0
+        self.ids = np.empty(INITIAL_CAPACITY, dtype=np.int64)
+        self.codes = np.empty((INITIAL_CAPACITY, codes.shape[1]), dtype=codes.dtype)
+        self.weights = np.empty(INITIAL_CAPACITY, dtype=np.float32)
+        self.rows = {}
+
+    def add(self, node_id: int, codes: np.ndarray, weight: float):
+        row = self.rows.get(node_id)
+        if row is None:
+            if self.size == self.ids.size:
+                self._grow(self.size * 2)
+            row = self.size
+            self.size += 1
+            self.rows[node_id] = row
+            self.ids[row] = node_id
+        self.codes[row] = codes
+        self.weights[row] = weight
+
+    def remove(self, node_id: int) -> bool:
+        row = self.rows.pop(node_id, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if row != last:
+            moved = int(self.ids[last])
+            self.ids[row] = moved
+            self.codes[row] = self.codes[last]
+            self.weights[row] = self.weights[last]
+            self.rows[moved] = row
+        self.size = last
+        return True
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        n = self.size
+        return quantize.scores(query, self.codec, self.codes[:n], None, self.codebook) * self.weights[:n]
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.codes.nbytes + self.weights.nbytes + sys.getsizeof(self.rows)
+
+    def vectors(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if rows is None:
+            rows = np.arange(self.size)
+        weights = self.weights[rows]
+        unit = np.ones_like(weights) if self.codec == "int8" else None
+        return quantize.decode_codes(self.codec, self.codes[rows], unit, self.codebook) * weights[:, None]
+
+    def _grow(self, capacity: int):
+        ids = np.empty(capacity, dtype=np.int64)
+        codes = np.empty((capacity, self.codes.shape[1]), dtype=self.codes.dtype)
+        weights = np.empty(capacity, dtype=np.float32)
+        ids[:self.size] = self.ids[:self.size]
+        codes[:self.size] = self.codes[:self.size]
+        weights[:self.size] = self.weights[:self.size]
+        self.ids, self.codes, self.weights = ids, codes, weights
+
+
+class VectorIndex:
+    def __init__(self, loader, codebooks, originals=None):
+        self._loader = loader
+        self._codebooks = codebooks
+        self._originals = originals
+        self._store = None
+        self._lock = threading.RLock()
+
+    def attach(self, store):
+        self._store = store
+
+    def build(self, galaxy_id: int) -> dict:
+        return self.build_from(galaxy_id, self._loader(galaxy_id), self._codebooks(galaxy_id))
+
+    def build_from(self, galaxy_id: int, entries, codebooks: dict) -> dict:
+        partitions = {}
+        for node_id, space, blob in entries:
+            _add(partitions, node_id, space, blob, codebooks)
+        logger.info(f"Vector index loaded galaxy {galaxy_id}: {_count(partitions)} vectors")
+        return partitions
+
+    def _ensure(self, galaxy_id: int) -> dict:
+        return self._store.get(galaxy_id, "index")
+
+    def add(self, galaxy_id: int, node_id: int, blob: Optional[bytes], space: str):
+        if not blob:
+            return
+        with self._lock:
+            partitions = self._store.peek(galaxy_id, "index")
+            if partitions is not None:
+                _add(partitions, node_id, space, blob, self._codebooks(galaxy_id))
+                self._store.resize(galaxy_id, "index")
+
+    def remove(self, node_ids: list):
+        with self._lock:
+            for galaxy_id, partitions in self._store.resident("index").items():
+                removed = [p.remove(node_id) for p in partitions.values() for node_id in node_ids]
+                if any(removed):
+                    self._store.resize(galaxy_id, "index")
+
+    def drop_galaxy(self, galaxy_id: int):
+        with self._lock:
+            self._store.discard(galaxy_id, "index")
+
+    def stats(self) -> dict:
+        with self._lock:
+            resident = self._store.resident("index")
+            return {
+                "galaxies": len(resident),
+                "vectors": sum(_count(p) for p in resident.values()),
+                "bytes": sum(p.nbytes for parts in resident.values() for p in parts.values()),
+                "partitions": {
+                    gid: {f"{space}/{codec}": p.size for (space, codec, _w), p in parts.items()}
+                    for gid, parts in resident.items()
+                },
+            }
+
+    def load(self, galaxy_ids: list) -> dict:
+        with self._lock:
+            return {galaxy_id: self._ensure(galaxy_id) for galaxy_id in galaxy_ids}
+
+    def snapshot(self, galaxy_id: int, space: str) -> tuple:
+        with self._lock:
+            return _dense(self._ensure(galaxy_id), space)
+
+    def lookup(self, galaxy_id: int, space: str, node_ids: list) -> dict:
+        found = {}
+        with self._lock:
+            for key, partition in self._ensure(galaxy_id).items():
+                if key[0] != space:
+                    continue
+                hits = [(node_id, partition.rows[node_id]) for node_id in node_ids if node_id in partition.rows]
+                if hits:
+                    vectors = partition.vectors(np.array([row for _, row in hits]))
+                    found.update(zip([node_id for node_id, _ in hits], vectors))
+        return found
+
+    def spaces(self, galaxy_id: int) -> list:
+        with self._lock:
+            return _spaces(self._ensure(galaxy_id))
+
+    def similarities(self, galaxy_id: int, query: np.ndarray, space: str) -> tuple:
+        query = np.asarray(query, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(query))
+        if norm == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = query / norm
+        ids, sims = [], []
+        with self._lock:
+            for key, partition in self._ensure(galaxy_id).items():
+                if key[0] != space or partition.dim != query.shape[0] or partition.size == 0:
+                    continue
+                ids.append(partition.ids[:partition.size].copy())
+                sims.append(partition.scores(query))
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        return np.concatenate(ids), np.concatenate(sims)
+
+    def search(self, query: np.ndarray, k: int, galaxy_ids: list, space: str, rerank: int = 0) -> list:
+        query = np.asarray(query, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(query))
+        if norm == 0 or k <= 0:
+            return []
+        query = query / norm
+        dim = query.shape[0]
+        wide = k * rerank if rerank > 1 else k
+
+        hits = []
+        with self._lock:
+            for galaxy_id in galaxy_ids:
+                for key, partition in self._ensure(galaxy_id).items():
+                    if key[0] != space or partition.dim != dim or partition.size == 0:
+                        continue
+                    sims = partition.scores(query)
+                    top = _top_k(sims, wide)
+                    if rerank > 1 and partition.codec != "float32":
+                        self._rerank(query, space, partition, top, sims)
+                    hits.extend((float(sims[i]), galaxy_id, int(partition.ids[i])) for i in top)
+
+        hits.sort(key=lambda h: -h[0])
+        return [{"galaxy_id": g, "node_id": nid, "score": s} for s, g, nid in hits[:k]]
+
+    def _rerank(self, query: np.ndarray, space: str, partition: Partition, top: np.ndarray, sims: np.ndarray):
+        if self._originals is None or top.size == 0:
+            return
+        originals = self._originals(space, partition.ids[top].tolist())
+        found = [
+            (row, originals[node_id])
+            for row, node_id in zip(top.tolist(), partition.ids[top].tolist())
+            if node_id in originals and originals[node_id].size == query.shape[0]
+        ]
+        if found:
+            rows = np.array([row for row, _ in found])
+            sims[rows] = quantize.rerank(query, np.stack([vector for _, vector in found]))
+
+    def cross_links(
+        self,
+        loaded: dict,
+        galaxy_id: int,
+        other_ids: list,
+        k: int,
+        threshold: float,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        should_stop=None,
+        skip_spaces=(),
+    ) -> list:
+        suggestions = []
+        with self._lock:
+            spaces = _spaces(loaded[galaxy_id])
+        for space in spaces:
+            if space in skip_spaces:
+                continue
+            with self._lock:
+                src_ids, src = _dense(loaded[galaxy_id], space)
+            if src_ids.size == 0:
+                continue
+            best_val = np.full((src_ids.size, k), -np.inf, dtype=np.float32)
+            best_node = np.full((src_ids.size, k), -1, dtype=np.int64)
+            best_galaxy = np.full((src_ids.size, k), -1, dtype=np.int64)
+
+            for other in other_ids:
+                if other == galaxy_id or other not in loaded:
+                    continue
+                if should_stop and should_stop():
+                    return []
+                with self._lock:
+                    tgt_ids, tgt = _dense(loaded[other], space)
+                if tgt_ids.size == 0 or tgt.shape[1] != src.shape[1]:
+                    continue
+                for i0 in range(0, src_ids.size, block_size):
+                    i1 = min(src_ids.size, i0 + block_size)
+                    sims = src[i0:i1] @ tgt.T
+                    kk = min(k, tgt_ids.size)
+                    part = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+                    vals = np.take_along_axis(sims, part, axis=1)
+                    merged_val = np.concatenate([best_val[i0:i1], vals], axis=1)
+                    merged_node = np.concatenate([best_node[i0:i1], tgt_ids[part]], axis=1)
+                    merged_galaxy = np.concatenate(
+                        [best_galaxy[i0:i1], np.full(part.shape, other, dtype=np.int64)], axis=1
+                    )
+                    keep = np.argpartition(-merged_val, k - 1, axis=1)[:, :k]
+                    best_val[i0:i1] = np.take_along_axis(merged_val, keep, axis=1)
+                    best_node[i0:i1] = np.take_along_axis(merged_node, keep, axis=1)
+                    best_galaxy[i0:i1] = np.take_along_axis(merged_galaxy, keep, axis=1)
+
+            rows, cols = np.nonzero(best_val >= threshold)
+            suggestions.extend(
+                (int(src_ids[r]), int(best_node[r, c]), int(best_galaxy[r, c]), float(best_val[r, c]))
+                for r, c in zip(rows, cols)
+            )
+        suggestions.sort(key=lambda s: -s[3])
+        return suggestions
+
+
+def _add(partitions: dict, node_id: int, space: str, blob: bytes, codebooks: dict):
+    codec, dim, codes, scales = quantize.load_codes([blob])
+    codebook = codebooks.get(dim) if codec == "pq" else None
+    if codec == "pq" and codebook is None:
+        return
+    vector = quantize.decode_codes(codec, codes, scales, codebook)[0]
+    norm = float(np.linalg.norm(vector))
+    if norm == 0:
+        return
+    weight = (scales[0] if scales is not None else 1.0) / norm
+    key = (space, codec, codes.shape[1])
+    for other_key, other in partitions.items():
+        if other_key[0] == space and other_key != key:
+            other.remove(node_id)
+    partition = partitions.get(key)
+    if partition is None:
+        partition = partitions[key] = Partition(space, dim, codec, codes, codebook)
+    partition.add(node_id, codes[0], weight)
+
+
+def _spaces(partitions: dict) -> list:
+    return sorted({key[0] for key, p in partitions.items() if p.size})
+
+
+def _dense(partitions: dict, space: str) -> tuple:
+    parts = [p for key, p in partitions.items() if key[0] == space and p.size]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    return (
+        np.concatenate([p.ids[:p.size] for p in parts]),
+        np.concatenate([p.vectors() for p in parts]).astype(np.float32),
+    )
+
+
+def _count(partitions: dict) -> int:
+    return sum(p.size for p in partitions.values())
+
+
+def _top_k(sims: np.ndarray, k: int) -> np.ndarray:
+    if sims.size > k:
+        top = np.argpartition(-sims, k - 1)[:k]
+    else:
+        top = np.arange(sims.size)
+    return top[np.argsort(-sims[top], kind="stable")]
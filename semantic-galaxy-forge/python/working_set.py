@@ -0,0 +1,281 @@
+import itertools
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGET_MB = 512
+
+EVENT_PARTS = {
+    "nodes": ("nodes", "communities", "projection", "index"),
+    "embeddings": ("embeddings", "projection", "index"),
+    "cross_embeddings": ("embeddings", "index"),
+    "connections": ("adjacency", "communities"),
+}
+
+
+class WorkingSet:
+    def __init__(
+        self, loaders: dict, budget_mb: float = DEFAULT_BUDGET_MB, appenders: dict = None, maintained=(),
+    ):
+        self._loaders = loaders
+        self._appenders = appenders or {}
+        self._maintained = set(maintained)
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._entries: OrderedDict = OrderedDict()
+        self._node_owner = {}
+        self._conn_owner = {}
+        self._generations = {}
+        self._clock = itertools.count(1)
+        self._floors = {}
+        self._lock = threading.RLock()
+        self.hits = {part: 0 for part in loaders}
+        self.misses = {part: 0 for part in loaders}
+        self.evictions = 0
+        self.invalidations = 0
+        self.precomputed = 0
+        self.appended = 0
+
+    def get(self, galaxy_id: int, part: str):
+        with self._lock:
+            entry = self._entry(galaxy_id)
+            if part in entry["parts"]:
+                self.hits[part] += 1
+                return entry["parts"][part][0]
+            self.misses[part] += 1
+            value = self._loaders[part](galaxy_id)
+            self._store(galaxy_id, entry, part, value)
+            return value
+
+    def contains(self, galaxy_id: int, part: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(galaxy_id)
+            return entry is not None and part in entry["parts"]
+
+    def peek(self, galaxy_id: int, part: str):
+        with self._lock:
+            entry = self._entries.get(galaxy_id)
+            cached = entry["parts"].get(part) if entry is not None else None
+            return cached[0] if cached is not None else None
+
+    def resident(self, part: str) -> dict:
+        with self._lock:
+            return {gid: e["parts"][part][0] for gid, e in self._entries.items() if part in e["parts"]}
+
+    def resize(self, galaxy_id: int, part: str):
+        with self._lock:
+            entry = self._entries.get(galaxy_id)
+            cached = entry["parts"].get(part) if entry is not None else None
+            if cached is None:
+                return
+            size = _sizeof(cached[0])
+            entry["parts"][part] = (cached[0], size)
+            entry["size"] += size - cached[1]
+            self._evict(keep=galaxy_id)
+
+    def discard(self, galaxy_id: int, part: str):
+        with self._lock:
+            self._invalidate(galaxy_id, (part,))
+
+    def generation(self, galaxy_id: int, part: str) -> int:
+        with self._lock:
+            return self._generations.get((galaxy_id, part), self._floors.get(galaxy_id, 0))
+
+    def put(self, galaxy_id: int, part: str, value, generation: int) -> bool:
+        with self._lock:
+            if self.generation(galaxy_id, part) != generation:
+                return False
+            entry = self._entry(galaxy_id)
+            if part in entry["parts"] or not self._store(galaxy_id, entry, part, value):
+                return False
+            self.precomputed += 1
+            return True
+
+    def _bump(self, galaxy_id: int, parts):
+        for part in parts:
+            self._generations[(galaxy_id, part)] = next(self._clock)
+
+    def _forget(self, galaxy_id: int):
+        for key in [key for key in self._generations if key[0] == galaxy_id]:
+            del self._generations[key]
+        self._floors[galaxy_id] = next(self._clock)
+
+    def _entry(self, galaxy_id: int) -> dict:
+        entry = self._entries.get(galaxy_id)
+        if entry is None:
+            entry = self._entries[galaxy_id] = {"parts": {}, "size": 0, "nodes": set(), "connections": set()}
+        self._entries.move_to_end(galaxy_id)
+        return entry
+
+    def _store(self, galaxy_id: int, entry: dict, part: str, value) -> bool:
+        size = _sizeof(value)
+        if size > self.budget and part not in self._maintained:
+            logger.info(f"Working set: galaxy {galaxy_id} {part} ({size} bytes) exceeds budget, not cached")
+            return False
+        entry["parts"][part] = (value, size)
+        entry["size"] += size
+        if part == "nodes":
+            self._own(entry["nodes"], self._node_owner, galaxy_id, value["ids"].tolist())
+        elif part == "adjacency":
+            self._own(entry["connections"], self._conn_owner, galaxy_id, value["ids"].tolist())
+        self._evict(keep=galaxy_id)
+        return True
+
+    def _append(self, galaxy_id: int, part: str, node_ids) -> bool:
+        entry = self._entries.get(galaxy_id)
+        cached = entry["parts"].get(part) if entry is not None else None
+        if cached is None or part not in self._appenders:
+            return False
+        value = self._appenders[part](galaxy_id, cached[0], list(node_ids))
+        if value is None:
+            return False
+        size = _sizeof(value)
+        entry["parts"][part] = (value, size)
+        entry["size"] += size - cached[1]
+        self.appended += 1
+        self._evict(keep=galaxy_id)
+        return True
+
+    @staticmethod
+    def _own(owned: set, owners: dict, galaxy_id: int, ids: list):
+        owned.update(ids)
+        for item in ids:
+            owners[item] = galaxy_id
+
+    def _evict(self, keep: int):
+        for galaxy_id in list(self._entries):
+            if self.total_size() <= self.budget:
+                return
+            if galaxy_id != keep and self._shed(galaxy_id):
+                self.evictions += 1
+
+    def _shed(self, galaxy_id: int) -> bool:
+        entry = self._entries[galaxy_id]
+        kept = {part: cached for part, cached in entry["parts"].items() if part in self._maintained}
+        if len(kept) == len(entry["parts"]):
+            return False
+        self._drop(galaxy_id)
+        if kept:
+            size = sum(size for _value, size in kept.values())
+            self._entries[galaxy_id] = {"parts": kept, "size": size, "nodes": set(), "connections": set()}
+            self._entries.move_to_end(galaxy_id, last=False)
+        return True
+
+    def _drop(self, galaxy_id: int):
+        entry = self._entries.pop(galaxy_id, None)
+        if entry is None:
+            return
+        for node_id in entry["nodes"]:
+            self._node_owner.pop(node_id, None)
+        for conn_id in entry["connections"]:
+            self._conn_owner.pop(conn_id, None)
+
+    def _invalidate(self, galaxy_id: int, parts: tuple):
+        entry = self._entries.get(galaxy_id)
+        if entry is None:
+            return
+        for part in parts:
+            cached = entry["parts"].pop(part, None)
+            if cached is not None:
+                entry["size"] -= cached[1]
+                self.invalidations += 1
+        if "adjacency" in parts:
+            for conn_id in entry["connections"]:
+                self._conn_owner.pop(conn_id, None)
+            entry["connections"] = set()
+
+    def total_size(self) -> int:
+        return sum(e["size"] for e in self._entries.values())
+
+    def on_change(self, event: str, galaxy_ids=(), node_ids=(), connection_ids=(), payload=None):
+        with self._lock:
+            owners = set(galaxy_ids)
+            owners.update(self._node_owner[n] for n in node_ids if n in self._node_owner)
+            owners.update(self._conn_owner[c] for c in connection_ids if c in self._conn_owner)
+            if event == "galaxy":
+                for galaxy_id in owners:
+                    self._forget(galaxy_id)
+            elif event != "positions":
+                for galaxy_id in owners:
+                    self._bump(galaxy_id, EVENT_PARTS[event])
+            owners &= set(self._entries)
+            if not owners:
+                return
+
+            if event == "galaxy":
+                for galaxy_id in owners:
+                    self._drop(galaxy_id)
+                    self.invalidations += 1
+            elif event == "positions":
+                for galaxy_id in owners:
+                    self._patch_positions(galaxy_id, payload)
+            else:
+                for galaxy_id in owners:
+                    parts = tuple(part for part in EVENT_PARTS[event] if part not in self._maintained)
+                    if payload == "created" and node_ids:
+                        parts = tuple(part for part in parts if not self._append(galaxy_id, part, node_ids))
+                    self._invalidate(galaxy_id, parts)
+                    if event == "nodes":
+                        self._track_nodes(galaxy_id, node_ids, payload)
+
+    def _track_nodes(self, galaxy_id: int, node_ids, payload):
+        entry = self._entries[galaxy_id]
+        if payload == "deleted":
+            for node_id in node_ids:
+                if self._node_owner.get(node_id) == galaxy_id:
+                    self._node_owner.pop(node_id)
+                entry["nodes"].discard(node_id)
+        else:
+            self._own(entry["nodes"], self._node_owner, galaxy_id, list(node_ids))
+
+    def _patch_positions(self, galaxy_id: int, updates: list):
+        cached = self._entries[galaxy_id]["parts"].get("nodes")
+        if cached is None:
+            return
+        nodes = cached[0]
+        index = nodes["index"]
+        for x, y, z, node_id in updates:
+            row = index.get(node_id)
+            if row is not None:
+                nodes["positions"][row] = (x, y, z)
+
+    def configure(self, budget_mb: float):
+        with self._lock:
+            self.budget = int(budget_mb * 1024 * 1024)
+            if self._entries:
+                self._evict(keep=next(reversed(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._node_owner.clear()
+            self._conn_owner.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "budget_bytes": self.budget,
+                "used_bytes": self.total_size(),
+                "galaxies": {
+                    gid: {part: size for part, (_value, size) in e["parts"].items()}
+                    for gid, e in self._entries.items()
+                },
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "precomputed": self.precomputed,
+                "appended": self.appended,
+            }
+
+
+def _sizeof(value) -> int:
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
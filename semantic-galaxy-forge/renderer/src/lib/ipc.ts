@@ -1,8 +1,9 @@
-import type { Galaxy, Node, Connection, PhysicsConfig, ModelStatus } from '../../../shared/types'
+import type { Galaxy, Node, Connection, PhysicsConfig, ModelStatus, EmbeddingPoolStatus, ClusterLevel, ConnectionPolicy, ProcessFileOptions, ProcessingProgress, LayoutFrame, LayoutSettled, SearchHit, HybridHit, HybridSearchOptions, CrossGalaxyLink, CrossLinksReady, EmbeddingCodec, EmbeddingStorage, EmbeddingMigration, EmbeddingBenchmarkResult, WorkingSetStats, SchedulerStatus, Precomputed } from '../../../shared/types'
 
 interface ElectronAPI {
   pythonInvoke: (channel: string, data?: unknown) => Promise<unknown>
   selectFiles: (filters?: unknown[]) => Promise<string[]>
+  selectSaveFile: (defaultPath?: string) => Promise<string | null>
   selectDirectory: () => Promise<string | null>
   openExternal: (url: string) => Promise<void>
   getDataPath: () => Promise<string>
@@ -29,24 +30,51 @@ export const ipc = {
   getGalaxies: () => invoke<{ galaxies: Galaxy[] }>('getGalaxies'),
   createGalaxy: (name: string) => invoke<{ galaxy_id: number }>('createGalaxy', { name }),
   deleteGalaxy: (galaxy_id: number) => invoke<{ success: boolean }>('deleteGalaxy', { galaxy_id }),
+  exportGalaxy: (galaxy_id: number, file_path: string) =>
+    invoke<{ file_path: string; nodes: number; connections: number; bytes: number }>('exportGalaxy', {
+      galaxy_id,
+      file_path,
+    }),
+  importGalaxy: (file_path: string, name?: string) =>
+    invoke<{ galaxy_id: number; nodes: number; connections: number }>('importGalaxy', { file_path, name }),
   updateGalaxySettings: (galaxy_id: number, settings: Partial<PhysicsConfig>) =>
     invoke<{ success: boolean }>('updateGalaxySettings', { galaxy_id, settings }),
 
   getNodes: (galaxy_id: number) => invoke<{ nodes: Node[] }>('getNodes', { galaxy_id }),
-  createTextNode: (galaxy_id: number, content: string, metadata?: Record<string, unknown>) =>
+  createTextNode: (
+    galaxy_id: number,
+    content: string,
+    metadata?: Record<string, unknown>,
+    connection_policy?: ConnectionPolicy
+  ) =>
     invoke<{ node_id: number; position: [number, number, number] }>('createTextNode', {
       galaxy_id,
       content,
       metadata: metadata || {},
+      connection_policy,
     }),
   deleteNode: (node_id: number) => invoke<{ success: boolean }>('deleteNode', { node_id }),
   updateNodeLabel: (node_id: number, label: string) =>
     invoke<{ success: boolean }>('updateNodeLabel', { node_id, label }),
   updateNodePosition: (node_id: number, x: number, y: number, z: number) =>
     invoke<{ success: boolean }>('updateNodePosition', { node_id, x, y, z }),
+  deleteNodes: (node_ids: number[]) =>
+    invoke<{ success: boolean; deleted: number }>('deleteNodes', { node_ids }),
+  updateNodeLabels: (labels: { node_id: number; label: string }[]) =>
+    invoke<{ success: boolean; updated: number }>('updateNodeLabels', { labels }),
+  updateNodePositions: (positions: { node_id: number; x: number; y: number; z: number }[]) =>
+    invoke<{ success: boolean; updated: number }>('updateNodePositions', { positions }),
 
   getConnections: (galaxy_id: number) =>
     invoke<{ connections: Connection[] }>('getConnections', { galaxy_id }),
+  recomputeConnections: (
+    galaxy_id: number,
+    options?: { similarity_threshold?: number; connection_policy?: ConnectionPolicy; memory_budget_mb?: number }
+  ) =>
+    invoke<{ created: number; deleted: number; updated: number; total: number }>('recomputeConnections', {
+      galaxy_id,
+      ...options,
+    }),
   createManualConnection: (source_id: number, target_id: number) =>
     invoke<{ connection_id: number }>('createManualConnection', { source_id, target_id }),
   deleteConnection: (connection_id: number) =>
@@ -55,25 +83,102 @@ export const ipc = {
   processFile: (
     galaxy_id: number,
     file_path: string,
-    content_type: string
+    content_type: string,
+    options?: ProcessFileOptions
   ) =>
-    invoke<{ nodes: Node[]; connections: Connection[] }>('processFile', {
+    invoke<{ nodes: Node[]; connections: Connection[]; duplicates: number }>('processFile', {
       galaxy_id,
       file_path,
       content_type,
+      ...options,
     }),
 
   recomputeLayout: (galaxy_id: number, params?: Record<string, unknown>) =>
     invoke<{ nodes: Node[] }>('recomputeLayout', { galaxy_id, params: params || {} }),
 
+  settleLayout: (
+    galaxy_id: number,
+    options?: {
+      iterations?: number
+      params?: Partial<PhysicsConfig> & Record<string, unknown>
+      pinned?: number[]
+      stream_every?: number
+      background?: boolean
+    }
+  ) => invoke<{ job_id?: string; nodes?: Node[] }>('settleLayout', { galaxy_id, ...options }),
+  cancelLayout: (job_id: string) => invoke<{ success: boolean }>('cancelLayout', { job_id }),
+
   detectCommunities: (galaxy_id: number) =>
     invoke<{ communities: number[][] }>('detectCommunities', { galaxy_id }),
+  getClusterLevel: (galaxy_id: number, level: number) =>
+    invoke<ClusterLevel>('getClusterLevel', { galaxy_id, level }),
+
+  searchAll: (query: string, k = 10, galaxy_ids?: number[], rerank?: number) =>
+    invoke<{ results: SearchHit[] }>('searchAll', { query, k, galaxy_ids, rerank }),
+  searchHybrid: (query: string, options?: HybridSearchOptions) =>
+    invoke<{ results: HybridHit[] }>('searchHybrid', { query, ...options }),
+  suggestCrossGalaxyLinks: (options?: { galaxy_id?: number; galaxy_ids?: number[]; k?: number; threshold?: number }) =>
+    invoke<{ job_id: string }>('suggestCrossGalaxyLinks', { ...options }),
+  cancelCrossGalaxyLinks: (job_id: string) => invoke<{ success: boolean }>('cancelCrossGalaxyLinks', { job_id }),
+  getCrossGalaxyLinks: (galaxy_id: number, limit?: number) =>
+    invoke<{ links: CrossGalaxyLink[] }>('getCrossGalaxyLinks', { galaxy_id, limit }),
+
+  getEmbeddingStorage: (galaxy_id: number) => invoke<EmbeddingStorage>('getEmbeddingStorage', { galaxy_id }),
+  setEmbeddingStorage: (galaxy_id: number, codec: EmbeddingCodec, vacuum = true, keep_originals?: boolean) =>
+    invoke<EmbeddingMigration>('setEmbeddingStorage', { galaxy_id, codec, vacuum, keep_originals }),
+  benchmarkEmbeddingStorage: (
+    galaxy_id: number,
+    options?: { k?: number; queries?: number; rerank?: number; space?: string }
+  ) =>
+    invoke<{
+      space: string
+      dim: number
+      vectors: number
+      originals: number
+      queries: number
+      results: EmbeddingBenchmarkResult[]
+    }>('benchmarkEmbeddingStorage', { galaxy_id, ...options }),
+
+  getWorkingSetStats: () => invoke<WorkingSetStats>('getWorkingSetStats'),
+  configureWorkingSet: (budget_mb: number) => invoke<WorkingSetStats>('configureWorkingSet', { budget_mb }),
+  getSchedulerStatus: () => invoke<SchedulerStatus>('getSchedulerStatus'),
+  configureScheduler: (options: { enabled?: boolean; idle_seconds?: number }) =>
+    invoke<SchedulerStatus>('configureScheduler', options),
 
   getModelStatus: () => invoke<ModelStatus>('getModelStatus'),
+  configureEmbeddingPool: (workers: number, threads_per_worker = 1) =>
+    invoke<EmbeddingPoolStatus>('configureEmbeddingPool', { workers, threads_per_worker }),
+  getEmbeddingPoolStatus: () => invoke<EmbeddingPoolStatus>('getEmbeddingPoolStatus'),
   downloadModels: () => invoke<{ success: boolean }>('downloadModels'),
 
+  onProgress: (callback: (progress: ProcessingProgress) => void) => {
+    if (!window.electronAPI) return () => {}
+    return window.electronAPI.onPythonEvent('progress', (data) => callback(data as ProcessingProgress))
+  },
+
+  onLayoutFrame: (callback: (frame: LayoutFrame) => void) => {
+    if (!window.electronAPI) return () => {}
+    return window.electronAPI.onPythonEvent('layoutFrame', (data) => callback(data as LayoutFrame))
+  },
+  onLayoutSettled: (callback: (result: LayoutSettled) => void) => {
+    if (!window.electronAPI) return () => {}
+    return window.electronAPI.onPythonEvent('layoutSettled', (data) => callback(data as LayoutSettled))
+  },
+  onCrossLinksReady: (callback: (result: CrossLinksReady) => void) => {
+    if (!window.electronAPI) return () => {}
+    return window.electronAPI.onPythonEvent('crossLinksReady', (data) => callback(data as CrossLinksReady))
+  },
+  onPrecomputed: (callback: (result: Precomputed) => void) => {
+    if (!window.electronAPI) return () => {}
+    return window.electronAPI.onPythonEvent('precomputed', (data) => callback(data as Precomputed))
+  },
+
   selectFiles: (filters?: unknown[]) => {
     if (!window.electronAPI) return Promise.resolve([])
     return window.electronAPI.selectFiles(filters)
   },
+  selectSaveFile: (defaultPath?: string) => {
+    if (!window.electronAPI) return Promise.resolve(null)
+    return window.electronAPI.selectSaveFile(defaultPath)
+  },
 }
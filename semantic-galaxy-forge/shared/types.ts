@@ -26,6 +26,8 @@ export interface Node {
   thumbnail?: string
   metadata: Record<string, unknown>
   created_at: string
+  embedding_model?: string | null
+  embedding_dim?: number | null
 }
 
 export interface Connection {
@@ -36,6 +38,35 @@ export interface Connection {
   connection_type: 'semantic' | 'manual'
 }
 
+export interface ClusterSummary {
+  galaxy_id: number
+  level: number
+  idx: number
+  parent_idx: number | null
+  member_count: number
+  label: string
+  representative_id: number | null
+  position_x: number
+  position_y: number
+  position_z: number
+}
+
+export interface ClusterEdge {
+  galaxy_id: number
+  level: number
+  source_idx: number
+  target_idx: number
+  strength: number
+  edge_count: number
+}
+
+export interface ClusterLevel {
+  level: number
+  levels: number
+  clusters: ClusterSummary[]
+  edges: ClusterEdge[]
+}
+
 export type ViewMode = 'default' | 'clustered' | 'orbits' | 'timeline' | 'nebulae'
 
 export interface PhysicsConfig {
@@ -47,12 +78,167 @@ export interface PhysicsConfig {
   enabled: boolean
 }
 
+export type ConnectionMode = 'threshold' | 'knn' | 'hybrid'
+
+export interface ConnectionPolicy {
+  mode: ConnectionMode
+  k?: number
+  mutual?: boolean
+  max_degree?: number | null
+  cross_modal_threshold?: number
+}
+
+export interface LayoutFrame {
+  job_id: string
+  galaxy_id: number
+  iteration: number
+  energy: number
+  node_ids: number[]
+  positions: number[]
+}
+
+export interface LayoutSettled {
+  job_id: string
+  galaxy_id: number
+  cancelled?: boolean
+  error?: string
+}
+
+export interface SearchHit {
+  galaxy_id: number
+  node_id: number
+  score: number
+  label: string
+  content_type: ContentType
+  galaxy_name: string
+}
+
+export interface HybridHit extends SearchHit {
+  lexical_rank?: number
+  semantic_rank?: number
+  bm25?: number
+  similarity?: number
+  snippet?: string
+}
+
+export interface HybridSearchOptions {
+  galaxy_id?: number
+  galaxy_ids?: number[]
+  k?: number
+  candidates?: number
+  rrf_k?: number
+  weights?: { lexical?: number; semantic?: number }
+  require_all?: boolean
+  rerank?: number
+}
+
+export interface CrossGalaxyLink {
+  source_id: number
+  target_id: number
+  source_galaxy_id: number
+  target_galaxy_id: number
+  strength: number
+  created_at: string
+  label: string
+  content_type: ContentType
+  galaxy_name: string
+}
+
+export interface CrossLinksReady {
+  job_id: string
+  galaxy_ids: number[]
+  suggestions?: number
+  cancelled?: boolean
+  error?: string
+}
+
+export type EmbeddingCodec = 'float32' | 'float16' | 'int8' | 'pq'
+
+export interface EmbeddingStorage {
+  codec: EmbeddingCodec
+  codecs: Record<string, EmbeddingCodec>
+  keep_originals: boolean
+  nodes: number
+  bytes: number
+  originals: number
+  original_bytes: number
+}
+
+export interface EmbeddingMigration {
+  codec: EmbeddingCodec
+  codecs: Record<string, EmbeddingCodec>
+  nodes: number
+  bytes_before: number
+  bytes_after: number
+  original_bytes: number
+}
+
+export interface EmbeddingBenchmarkResult {
+  codec: EmbeddingCodec
+  bytes_per_vector: number
+  compression: number
+  recall: number
+  recall_reranked: number
+  encode_ms: number
+  query_ms: number
+}
+
+export type WorkingSetPart = 'nodes' | 'embeddings' | 'adjacency' | 'communities' | 'projection' | 'index'
+
+export interface WorkingSetStats {
+  budget_bytes: number
+  used_bytes: number
+  galaxies: Record<number, Partial<Record<WorkingSetPart, number>>>
+  hits: Record<WorkingSetPart, number>
+  misses: Record<WorkingSetPart, number>
+  evictions: number
+  invalidations: number
+  precomputed: number
+  appended: number
+}
+
+export type PrecomputeTask = 'indexes' | 'cross_modal' | 'communities' | 'clusters' | 'layout'
+
+export interface SchedulerStatus {
+  enabled: boolean
+  idle_seconds: number
+  dirty: Record<number, PrecomputeTask[]>
+  active: number | null
+  running: [number, PrecomputeTask] | null
+  completed: Record<PrecomputeTask, number>
+  stale: number
+  failed: number
+  yielded: number
+}
+
+export interface Precomputed {
+  galaxy_id: number
+  task: PrecomputeTask
+}
+
+export type DedupPolicy = 'skip' | 'merge' | 'keep'
+
+export interface ProcessFileOptions {
+  similarity_threshold?: number
+  connection_policy?: ConnectionPolicy
+  dedup_policy?: DedupPolicy
+  dedup_max_distance?: number
+}
+
 export interface ProcessingProgress {
   stage: string
   progress: number
   message: string
 }
 
+export interface EmbeddingPoolStatus {
+  workers: number
+  threads_per_worker: number
+  alive: number
+  broken?: boolean
+  assigned_cost?: number[]
+}
+
 export interface ModelStatus {
   sentence_transformers: boolean
   clip: boolean